@@ -8,17 +8,87 @@ class Settings(BaseSettings):
     data_dir: str = str(Path(__file__).resolve().parent / "data")
     db_path: str = str(Path(__file__).resolve().parent / "data" / "weighbridge.db")
     attachments_dir: str = str(Path(__file__).resolve().parent / "data" / "attachments")
+    # Ticket attachments (deck-camera photos, delivery-note scans). Thumbnails and
+    # compressed copies of images are rendered in this many worker processes (needs Pillow).
+    attachment_max_bytes: int = 25 * 1024 * 1024
+    attachment_workers: int = 2
+    attachment_thumbnail_px: int = 320
+    attachment_web_px: int = 1600
+    attachment_jpeg_quality: int = 80
+
+    # SQLite storage profile, applied to every pooled connection
+    sqlite_journal_mode: str = "wal"
+    sqlite_synchronous: str = "normal"
+    sqlite_busy_timeout_ms: int = 5000
+    # The page cache is per connection: at most (pool size + overflow) x cache_size in total.
+    sqlite_cache_size_kib: int = 8192
+    sqlite_mmap_size_mb: int = 128
+    sqlite_temp_store: str = "memory"
+    # WAL allows a single writer at a time, so more connections only add readers (and cache).
+    db_pool_size: int = 4
+    db_max_overflow: int = 4
+    db_pool_timeout_seconds: float = 30.0
+    # How often the WAL is checkpointed/truncated and `PRAGMA optimize` runs; 0 disables.
+    db_maintenance_interval_seconds: int = 900
+    # Finalized tickets fully synced to Odoo move to monthly archive files (data_dir/archive)
+    # once older than this; 0 disables archiving.
+    archive_after_days: int = 180
+    archive_interval_seconds: int = 86400
+    archive_batch_size: int = 2000
+
+    # Ticket numbers: str.format fields {date} (datetime, UTC), {lane} and {seq}. The
+    # counter restarts for every distinct rendering of the non-{seq} parts (per day here).
+    ticket_number_format: str = "WB{date:%Y%m%d}-{seq:04d}"
+
+    # Stored tare: a learned tare is trusted for this many days. A new weighed tare that
+    # differs from the stored one by more than the tolerance must be confirmed by another
+    # weighing before stored-tare tickets are allowed again.
+    stored_tare_validity_days: float = 30.0
+    stored_tare_tolerance_pct: float = 2.0
 
     # Odoo connectivity
     odoo_base_url: str | None = None
     odoo_api_key: str | None = None
     odoo_db: str | None = None
     odoo_username: str | None = None
+    odoo_timeout_seconds: float = 15.0
+    odoo_max_concurrency: int = 4
+    odoo_rate_limit_per_second: float = 0.0
+    odoo_keepalive_seconds: float = 30.0
 
     # Sync cadence and serial behavior
     sync_interval_seconds: int = 20
+    # Tickets per bulk request to Odoo; 1 sends tickets one at a time.
+    sync_batch_size: int = 25
+    # Failed sends are retried after base * 2^(attempts-1) seconds (jittered, capped at max);
+    # after sync_max_attempts a queue row is parked as "dead" until retried by hand.
+    sync_retry_base_seconds: float = 15.0
+    sync_retry_max_seconds: float = 3600.0
+    sync_max_attempts: int = 10
+    # Sent queue rows are deleted this long after they were sent (0 keeps them forever).
+    sync_sent_retention_days: float = 30.0
+    sync_prune_interval_seconds: int = 3600
     serial_read_timeout: float = 0.2
+    serial_poll_interval: float = 0.2
+    # "auto" reads ports from the event loop on POSIX and falls back to threads elsewhere.
+    serial_reader_mode: str = "auto"
+    # Lanes connected when the app stopped are reconnected after startup; a port that is not
+    # there yet (USB adapter still enumerating) is retried, backing off up to the max.
+    serial_reconnect_interval_seconds: float = 2.0
+    serial_reconnect_max_interval_seconds: float = 60.0
+    max_lanes: int = 8
     allow_weight_simulation: bool = True
+    weight_history_capacity: int = 36000
+    weight_history_max_buckets: int = 2000
+
+    # Stable-weight detection (capture-on-stable weighing)
+    stable_window_seconds: float = 1.5
+    stable_tolerance_kg: float = 10.0
+    stable_filter: str = "median"
+    stable_filter_size: int = 5
+    stable_min_samples: int = 3
+    stable_min_weight_kg: float = 0.0
+    stable_timeout_seconds: float = 15.0
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
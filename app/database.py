@@ -1,16 +1,254 @@
+import logging
+import time
+import zlib
+from typing import Optional, Sequence
+
+from sqlalchemy import Table, event, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import SQLModel, Session, create_engine
 
-from .config import get_settings
+from . import models  # noqa: F401  (registers every table on SQLModel.metadata)
+from .config import Settings, get_settings
+from .metrics import metrics
+
+logger = logging.getLogger("database")
+
+JOURNAL_MODES = ("delete", "truncate", "persist", "memory", "wal", "off")
+SYNCHRONOUS_MODES = ("off", "normal", "full", "extra")
+TEMP_STORES = ("default", "file", "memory")
+
+_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+_COUNT_ENTER = f"""
+    INSERT INTO syncqueuecount (status, row_count, last_entered_at) VALUES (NEW.status, 1, {_NOW})
+    ON CONFLICT(status) DO UPDATE SET row_count = row_count + 1, last_entered_at = excluded.last_entered_at;"""
+_COUNT_LEAVE = """
+    UPDATE syncqueuecount SET row_count = row_count - 1 WHERE status = OLD.status;"""
+
+# Triggers keeping syncqueuecount in step with syncqueue, whichever code path writes it.
+SYNC_COUNTER_TRIGGERS = {
+    "syncqueue_count_insert": (
+        f"CREATE TRIGGER syncqueue_count_insert AFTER INSERT ON syncqueue BEGIN{_COUNT_ENTER}\nEND"
+    ),
+    "syncqueue_count_update": (
+        "CREATE TRIGGER syncqueue_count_update AFTER UPDATE OF status ON syncqueue"
+        f" WHEN OLD.status IS NOT NEW.status BEGIN{_COUNT_LEAVE}{_COUNT_ENTER}\nEND"
+    ),
+    "syncqueue_count_delete": (
+        f"CREATE TRIGGER syncqueue_count_delete AFTER DELETE ON syncqueue BEGIN{_COUNT_LEAVE}\nEND"
+    ),
+}
+
+
+def storage_pragmas(settings: Settings) -> list[str]:
+    """
+    PRAGMAs for the configured storage profile. WAL lets the sync thread write while
+    operators read, and synchronous=NORMAL is still crash-safe in WAL mode (only the
+    last commits can roll back on power loss, the file never corrupts).
+    """
+    for value, allowed, name in (
+        (settings.sqlite_journal_mode, JOURNAL_MODES, "SQLITE_JOURNAL_MODE"),
+        (settings.sqlite_synchronous, SYNCHRONOUS_MODES, "SQLITE_SYNCHRONOUS"),
+        (settings.sqlite_temp_store, TEMP_STORES, "SQLITE_TEMP_STORE"),
+    ):
+        if value.lower() not in allowed:
+            raise ValueError(f"Invalid {name} '{value}'; expected one of {', '.join(allowed)}")
+    return [
+        # Only takes effect on a new file (or after VACUUM); lets archiving hand space back.
+        "PRAGMA auto_vacuum=incremental",
+        f"PRAGMA journal_mode={settings.sqlite_journal_mode.lower()}",
+        f"PRAGMA synchronous={settings.sqlite_synchronous.lower()}",
+        f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}",
+        # Negative cache_size is in KiB rather than pages.
+        f"PRAGMA cache_size=-{int(settings.sqlite_cache_size_kib)}",
+        f"PRAGMA mmap_size={int(settings.sqlite_mmap_size_mb) * 1024 * 1024}",
+        f"PRAGMA temp_store={settings.sqlite_temp_store.lower()}",
+    ]
+
+
+COMMIT_SECONDS = metrics.histogram("weighbridge_sqlite_commit_seconds", "Time spent in SQLite COMMIT.")
+
+
+def time_commits(target: Engine) -> None:
+    """Record how long each COMMIT on `target` takes (the fsync-bound part of a write)."""
+    do_commit = target.dialect.do_commit
+    observe = COMMIT_SECONDS.labels().observe
+
+    def timed_commit(dbapi_connection) -> None:
+        started = time.perf_counter()
+        try:
+            do_commit(dbapi_connection)
+        finally:
+            observe(time.perf_counter() - started)
+
+    target.dialect.do_commit = timed_commit
+
+
+def configure_storage(target: Engine, settings: Settings) -> None:
+    pragmas = storage_pragmas(settings)
+
+    @event.listens_for(target, "connect")
+    def _apply_storage_profile(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
 
 
 settings = get_settings()
 engine = create_engine(
-    f"sqlite:///{settings.db_path}", connect_args={"check_same_thread": False}, echo=False
+    f"sqlite:///{settings.db_path}",
+    connect_args={"check_same_thread": False, "timeout": settings.sqlite_busy_timeout_ms / 1000},
+    # Routes run in Starlette's threadpool; size the pool so they rarely queue for a connection.
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout_seconds,
+    echo=False,
+)
+configure_storage(engine, settings)
+time_commits(engine)
+
+
+def init_db(force: bool = False) -> None:
+    """
+    Bring the database up to the current models. The schema fingerprint is stored in
+    `PRAGMA user_version` afterwards, so later starts with unchanged models skip the
+    (comparatively slow) inspection entirely.
+    """
+    fingerprint = schema_fingerprint()
+    with engine.connect() as conn:
+        stored = conn.exec_driver_sql("PRAGMA user_version").scalar()
+    if stored == fingerprint and not force:
+        return
+    migrate_schema(engine)
+    complete = upgrade_data(engine)
+    install_sync_counters(engine)
+    if not complete:
+        return
+    with engine.connect() as conn:
+        conn.exec_driver_sql(f"PRAGMA user_version = {fingerprint}")
+    logger.info("Database schema updated (version %s)", fingerprint)
+
+
+def schema_fingerprint() -> int:
+    """Checksum of the tables, columns, indexes and triggers the models expect."""
+    parts = []
+    for table in SQLModel.metadata.sorted_tables:
+        parts.append(f"table {table.name}")
+        for column in table.columns:
+            parts.append(f"column {column.name} {column.type!r} {column.nullable} {column.primary_key}")
+        for index in sorted(table.indexes, key=lambda index: index.name or ""):
+            parts.append(f"index {index.name} {[column.name for column in index.columns]} {index.unique}")
+    parts.extend(SYNC_COUNTER_TRIGGERS.values())
+    parts.append(OPEN_PLATE_INDEX)
+    # user_version is a signed 32-bit integer.
+    return zlib.crc32("\n".join(parts).encode()) & 0x7FFFFFFF
+
+
+def migrate_schema(target: Engine, tables: Optional[Sequence[Table]] = None) -> None:
+    """Create missing tables in `target`, then add columns/indexes they are missing."""
+    SQLModel.metadata.create_all(target, tables=tables)
+    _add_missing_columns(target, tables)
+
+
+# Indexes replaced by newer ones; dropped from existing database files on upgrade.
+SUPERSEDED_INDEXES = ("ix_ticket_vehicle_plate_created_at",)
+# A vehicle can have one open weigh-in. Created after the plate keys are filled in, which
+# is why it is not declared on the model.
+OPEN_PLATE_INDEX = (
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_ticket_open_plate_key ON ticket (plate_key) WHERE status = 'weigh_in'"
 )
 
 
-def init_db() -> None:
-    SQLModel.metadata.create_all(engine)
+def upgrade_data(target: Engine) -> bool:
+    """
+    Fill columns added since `target` was created, drop superseded indexes and create the
+    open-plate index. Returns False if that index could not be created yet.
+    """
+    # Imported here: app.services imports this module.
+    from app.services.plate_index import backfill_plate_keys
+
+    filled = backfill_plate_keys(target)
+    if filled:
+        logger.info("Filled plate keys for %d tickets", filled)
+    with target.begin() as conn:
+        for name in SUPERSEDED_INDEXES:
+            conn.exec_driver_sql(f'DROP INDEX IF EXISTS "{name}"')
+    try:
+        with target.begin() as conn:
+            conn.exec_driver_sql(OPEN_PLATE_INDEX)
+    except IntegrityError:
+        # Left over from before the check was enforced; retried on every start until fixed.
+        logger.warning("Some vehicles have several open weigh-ins; finalize or delete the extras")
+        return False
+    return True
+
+
+def install_sync_counters(target: Engine) -> None:
+    """
+    Create the syncqueuecount triggers if any are missing. The counters are seeded from
+    the queue in the same transaction, so no write can slip in between.
+    """
+    with target.begin() as conn:
+        existing = {
+            name for (name,) in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        }
+        missing = [name for name in SYNC_COUNTER_TRIGGERS if name not in existing]
+        if not missing:
+            return
+        for name in SYNC_COUNTER_TRIGGERS:
+            conn.exec_driver_sql(f'DROP TRIGGER IF EXISTS "{name}"')
+        conn.exec_driver_sql("DELETE FROM syncqueuecount")
+        conn.exec_driver_sql(
+            "INSERT INTO syncqueuecount (status, row_count, last_entered_at)"
+            " SELECT status, COUNT(*), MAX(COALESCE(last_attempt_at, created_at)) FROM syncqueue GROUP BY status"
+        )
+        for ddl in SYNC_COUNTER_TRIGGERS.values():
+            conn.exec_driver_sql(ddl)
+        logger.info("Installed sync queue counters")
+
+
+def run_maintenance() -> None:
+    """Fold the WAL back into the database file (and shrink it), then refresh planner stats."""
+    with engine.connect() as conn:
+        busy, log_pages, checkpointed = conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)").one()
+        conn.exec_driver_sql("PRAGMA optimize")
+    if busy:
+        logger.info("WAL checkpoint incomplete (%s/%s pages); readers were active", checkpointed, log_pages)
+
+
+def _add_missing_columns(target: Engine, tables: Optional[Sequence[Table]] = None) -> None:
+    """
+    `create_all` only creates missing tables. Bring tables in an existing database file
+    up to date with columns and indexes added to the models since it was created.
+    """
+    inspector = inspect(target)
+    with target.begin() as conn:
+        for table in tables or SQLModel.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column.type.compile(target.dialect)}'
+                default = column.default.arg if column.default is not None and column.default.is_scalar else None
+                if default is not None:
+                    ddl += f" DEFAULT {_sql_literal(default)}"
+                conn.exec_driver_sql(ddl)
+                if column.default is not None and column.default.is_callable:
+                    # SQLite only accepts constant defaults; evaluate factories (timestamps) once.
+                    conn.execute(table.update().values({column.name: column.default.arg(None)}))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+
+def _sql_literal(value) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
 
 
 def get_session():
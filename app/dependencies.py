@@ -0,0 +1,24 @@
+from typing import Optional
+
+from fastapi import HTTPException, Query
+
+from app.schemas import StabilityStats
+from app.services.serial_manager import DEFAULT_LANE, LaneNotConnected, LaneReader, serial_manager
+
+
+def get_lane(lane: int = Query(default=DEFAULT_LANE, description="Weighbridge lane id")) -> LaneReader:
+    try:
+        return serial_manager.lane(lane)
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail=str(exc.args[0]))
+
+
+def wait_for_stable_weight(reader: LaneReader, timeout: Optional[float]) -> StabilityStats:
+    try:
+        stats = reader.wait_for_stable(timeout)
+    except LaneNotConnected as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+    if stats is None:
+        # 504, not 408: the scale was slow, not the client, and clients may resend a 408.
+        raise HTTPException(status_code=504, detail="Weight did not stabilise before the timeout")
+    return stats
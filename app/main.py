@@ -1,15 +1,30 @@
+import time
+
+# Taken before anything else is imported, so the import phase shows up in the startup profile.
+_IMPORT_STARTED = time.perf_counter()
+
 import asyncio
+import json
 import logging
+from contextlib import contextmanager
 from pathlib import Path
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 from fastapi.staticfiles import StaticFiles
+from sqlmodel import Session
 
 from app.config import get_settings
-from app.database import init_db
-from app.routers import serial, sync, tickets, weight
+from app.database import engine, init_db
+from app.metrics import CONTENT_TYPE, metrics
+from app.routers import attachments, reports, serial, sync, tickets, vehicles, weight
+from app.services.attachment_service import variant_pool
+from app.services.loop_monitor import loop_monitor
+from app.services.maintenance import maintenance_service
+from app.services.plate_index import plate_index
+from app.services.serial_manager import serial_manager
+from app.services.tare_register import tare_register
 from app.services.sync_service import sync_service
 
 logging.basicConfig(
@@ -21,31 +36,111 @@ app = FastAPI(title="Topcell Weighbridge")
 settings = get_settings()
 static_dir = Path(__file__).resolve().parent / "static"
 
+# Seconds spent in each startup phase, in order (`--profile-startup`, `GET /api/health`).
+startup_phases: dict[str, float] = {"imports": round(time.perf_counter() - _IMPORT_STARTED, 4)}
+
+
+@contextmanager
+def _startup_phase(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_phases[name] = round(time.perf_counter() - started, 4)
+
+
+HTTP_SECONDS = metrics.histogram(
+    "weighbridge_http_request_seconds", "HTTP request latency by route and status.", ("method", "route", "status")
+)
+
+
+class RouteMetricsMiddleware:
+    """
+    Times each HTTP request until its last body byte is sent. Plain ASGI rather than
+    `@app.middleware`, so responses are not re-buffered; requests are labelled with the
+    route template (`/api/tickets/{ticket_id}`), which keeps the series count bounded.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the (shared) scope.
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_SECONDS.labels(scope["method"], route, status).observe(time.perf_counter() - started)
+
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
+app.add_middleware(RouteMetricsMiddleware)
 
 app.include_router(tickets.router)
 app.include_router(serial.router)
 app.include_router(weight.router)
 app.include_router(sync.router)
+app.include_router(vehicles.router)
+app.include_router(reports.router)
+app.include_router(attachments.router)
 
 app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
 
 @app.on_event("startup")
 async def on_startup() -> None:
-    init_db()
-    sync_service.start()
+    with _startup_phase("init_db"):
+        init_db()
+    with _startup_phase("caches"), Session(engine) as session:
+        plate_index.rebuild(session)
+        tare_register.load(session)
+        variant_pool.resume(session)
+    with _startup_phase("services"):
+        loop_monitor.start()
+        serial_manager.attach_loop(asyncio.get_running_loop())
+        sync_service.start()
+    # Not needed to serve the UI: opening ports and loading the scheduler happen in the
+    # background once the server is accepting requests.
+    serial_manager.start_restore()
+    maintenance_service.start_deferred()
 
 
 @app.on_event("shutdown")
 async def on_shutdown() -> None:
     await sync_service.shutdown()
+    serial_manager.disconnect_all()
+    maintenance_service.shutdown()
+    variant_pool.shutdown()
+    await loop_monitor.stop()
+
+
+@app.get("/api/health")
+async def health() -> dict:
+    return {"status": "ok", "event_loop": loop_monitor.stats(), "startup_seconds": startup_phases}
+
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics() -> Response:
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
 
 
 @app.get("/", include_in_schema=False)
@@ -54,7 +149,46 @@ async def serve_ui() -> FileResponse:
     return FileResponse(index)
 
 
-if __name__ == "__main__":
-    import uvicorn
+def profile_startup() -> dict:
+    """Run startup and shutdown once, without serving, and report the seconds per phase."""
+
+    async def run() -> float:
+        await on_startup()
+        started = time.perf_counter()
+        await on_shutdown()
+        return time.perf_counter() - started
 
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
+    shutdown = asyncio.run(run())
+    return {
+        **startup_phases,
+        "total": round(sum(startup_phases.values()), 4),
+        "shutdown": round(shutdown, 4),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import multiprocessing
+
+    # Attachment variants are rendered in spawned worker processes (needed when frozen).
+    multiprocessing.freeze_support()
+
+    parser = argparse.ArgumentParser(description="Topcell Weighbridge server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--reload", action="store_true", help="restart on code changes (development)")
+    parser.add_argument(
+        "--profile-startup", action="store_true", help="print the seconds spent per startup phase as JSON and exit"
+    )
+    args = parser.parse_args()
+
+    if args.profile_startup:
+        print(json.dumps(profile_startup()))
+    else:
+        import uvicorn
+
+        if args.reload:
+            uvicorn.run("app.main:app", host=args.host, port=args.port, reload=True)
+        else:
+            # Hand over the app already imported here instead of importing it a second time.
+            uvicorn.run(app, host=args.host, port=args.port)
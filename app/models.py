@@ -1,15 +1,31 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
 
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 
 class Ticket(SQLModel, table=True):
+    # Listing filters on one column and pages by (created_at, id). SQLite appends the
+    # rowid (id) to every index, so each of these serves a filtered page as a range scan.
+    __table_args__ = (
+        Index("ix_ticket_status_created_at", "status", "created_at"),
+        Index("ix_ticket_direction_created_at", "direction", "created_at"),
+        Index("ix_ticket_lane_id_created_at", "lane_id", "created_at"),
+        Index("ix_ticket_plate_key_created_at", "plate_key", "created_at"),
+        Index("ix_ticket_partner_name_created_at", "partner_name", "created_at"),
+        Index("ix_ticket_product_name_created_at", "product_name", "created_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     ticket_no: Optional[str] = Field(default=None, index=True, unique=True)
-    status: str = Field(default="weigh_in", index=True)
-    direction: str = Field(index=True)
-    vehicle_plate: str = Field(index=True)
+    lane_id: int = 1
+    status: str = "weigh_in"
+    direction: str
+    vehicle_plate: str
+    # vehicle_plate as plate_index.normalize_plate sees it (upper case, letters and digits
+    # only); the plate filter and the open weigh-in check compare this, not what was typed.
+    plate_key: Optional[str] = None
     partner_name: str
     product_name: str
     delivery_reference: Optional[str] = None
@@ -18,6 +34,8 @@ class Ticket(SQLModel, table=True):
     operator_name: str
     gross_kg: float = 0
     tare_kg: float = 0
+    # "weighed" (physical weigh-out) or "stored" (taken from the vehicle tare register).
+    tare_source: Optional[str] = None
     net_kg: float = 0
     weight_in_time: Optional[datetime] = None
     weight_out_time: Optional[datetime] = None
@@ -26,22 +44,89 @@ class Ticket(SQLModel, table=True):
     remarks: Optional[str] = None
     attachment_path: Optional[str] = None
     odoo_external_id: Optional[str] = Field(default=None, index=True)
+    # Hash of the last payload Odoo accepted; re-queueing identical content is a no-op.
+    synced_payload_hash: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 
+class Attachment(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    ticket_id: int = Field(foreign_key="ticket.id", index=True)
+    # "camera" (deck-camera snapshot), "delivery_note" (scan) or "other".
+    kind: str = "other"
+    filename: str
+    content_type: str
+    size_bytes: int
+    # Hex SHA-256 of the content. Files are stored by hash, so identical uploads share one.
+    sha256: str = Field(index=True)
+    # Thumbnail/compressed copies: "pending", "ready", "failed" or "none" (not an image).
+    variant_status: str = "none"
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
 class SyncQueue(SQLModel, table=True):
+    # The sync loop only ever looks up rows that are due: status + next attempt time.
+    __table_args__ = (Index("ix_syncqueue_status_next_attempt_at", "status", "next_attempt_at"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     ticket_id: int = Field(foreign_key="ticket.id", index=True)
     payload: str
+    # SHA-256 of the canonical payload JSON, and the key Odoo deduplicates uploads by
+    # (ticket number + hash). A ticket has at most one row that is not "sent".
+    payload_hash: Optional[str] = None
+    idempotency_key: Optional[str] = None
     status: str = Field(default="pending", index=True)
     attempts: int = 0
     last_error: Optional[str] = None
     last_attempt_at: Optional[datetime] = None
+    next_attempt_at: Optional[datetime] = Field(default_factory=datetime.utcnow)
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
+class SyncQueueCount(SQLModel, table=True):
+    # Rows per queue status, kept current by triggers on syncqueue (see database.py),
+    # so the sync status page never has to count the queue.
+    status: str = Field(primary_key=True)
+    row_count: int = 0
+    # When a row last entered this status; for "sent" this is the last successful upload.
+    last_entered_at: Optional[datetime] = None
+
+
+class VehicleTare(SQLModel, table=True):
+    # Keyed by normalized plate (see plate_index.normalize_plate).
+    plate_key: str = Field(primary_key=True)
+    vehicle_plate: str
+    tare_kg: float
+    captured_at: datetime
+    # After this the vehicle must be weighed empty again before stored tare is accepted.
+    expires_at: datetime
+    source_ticket_id: Optional[int] = Field(default=None, foreign_key="ticket.id")
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class DailySummary(SQLModel, table=True):
+    # One row per (day, product, partner, direction), updated as tickets are finalized.
+    day: date = Field(primary_key=True)
+    product_name: str = Field(primary_key=True)
+    partner_name: str = Field(primary_key=True)
+    direction: str = Field(primary_key=True)
+    ticket_count: int = 0
+    net_kg_total: float = 0
+    net_kg_min: float = 0
+    net_kg_max: float = 0
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class TicketSequence(SQLModel, table=True):
+    # Last ticket number handed out per numbering scope, e.g. "WB20240101-{seq}".
+    scope: str = Field(primary_key=True)
+    last_value: int = 0
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
 class SerialSettings(SQLModel, table=True):
+    # One row per weighbridge lane; the primary key is the lane id.
     id: Optional[int] = Field(default=1, primary_key=True)
     port: Optional[str] = None
     baudrate: int = 9600
@@ -49,4 +134,13 @@ class SerialSettings(SQLModel, table=True):
     parity: str = "N"
     stopbits: float = 1
     simulate: bool = False
+    protocol: str = "continuous"
+    frame_length: Optional[int] = None
+    poll_command: Optional[str] = None
+    capture: bool = False
+    replay_file: Optional[str] = None
+    replay_speed: float = 1.0
+    replay_loop: bool = True
     last_connected_at: Optional[datetime] = None
+    # Set by connect, cleared by disconnect: reconnect this lane when the app starts.
+    auto_connect: bool = False
@@ -0,0 +1,185 @@
+import os
+from typing import Iterator, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.config import get_settings
+from app.database import engine, get_session
+from app.models import Attachment, Ticket
+from app.schemas import AttachmentRead
+from app.services import attachment_service
+from app.services.sync_service import sync_service
+
+router = APIRouter(prefix="/api", tags=["attachments"])
+
+READ_CHUNK_BYTES = 256 * 1024
+# Stored files never change (the name is the content hash), so clients may cache forever.
+CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+
+def _get_attachment(attachment_id: int, session: Session) -> Attachment:
+    attachment = session.get(Attachment, attachment_id)
+    if not attachment:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    return attachment
+
+
+def _ticket_exists(ticket_id: int) -> bool:
+    # Live tickets only: archived tickets are read-only.
+    with Session(engine) as session:
+        return session.get(Ticket, ticket_id) is not None
+
+
+def _save_upload(
+    ticket_id: int, blob: attachment_service.StoredBlob, kind: str, filename: str, content_type: str
+) -> Attachment:
+    with Session(engine) as session:
+        ticket = session.get(Ticket, ticket_id)
+        attachment = attachment_service.add_attachment(session, ticket, blob, kind, filename, content_type)
+        if _resync(session, ticket):
+            session.refresh(attachment)
+        return attachment
+
+
+def _resync(session: Session, ticket: Optional[Ticket]) -> bool:
+    # Finalized tickets are already queued or in Odoo; send the new attachment list.
+    if ticket is None or ticket.status != "finalized":
+        return False
+    sync_service.enqueue_ticket(session, ticket)
+    return True
+
+
+@router.post("/tickets/{ticket_id}/attachments", response_model=AttachmentRead)
+async def upload_attachment(
+    ticket_id: int,
+    request: Request,
+    kind: str = Query(default="other"),
+    filename: Optional[str] = None,
+) -> AttachmentRead:
+    """
+    The request body is the raw file (`Content-Type: image/jpeg`, `application/pdf`, ...),
+    not a multipart form, so it can be streamed straight to disk.
+    """
+    if kind not in attachment_service.ATTACHMENT_KINDS:
+        raise HTTPException(
+            status_code=400, detail=f"kind must be one of {', '.join(attachment_service.ATTACHMENT_KINDS)}"
+        )
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type not in attachment_service.CONTENT_TYPES:
+        raise HTTPException(
+            status_code=415, detail=f"Content-Type must be one of {', '.join(attachment_service.CONTENT_TYPES)}"
+        )
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > get_settings().attachment_max_bytes:
+        raise HTTPException(status_code=413, detail="Attachment is too large")
+    if not await run_in_threadpool(_ticket_exists, ticket_id):
+        raise HTTPException(status_code=404, detail="Ticket not found")
+
+    try:
+        blob = await attachment_service.store_stream(request.stream())
+    except attachment_service.AttachmentTooLarge as exc:
+        raise HTTPException(status_code=413, detail=str(exc))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    name = os.path.basename(filename or "") or f"{kind}-{blob.sha256[:12]}"
+    return await run_in_threadpool(_save_upload, ticket_id, blob, kind, name, content_type)
+
+
+@router.get("/tickets/{ticket_id}/attachments", response_model=list[AttachmentRead])
+def list_ticket_attachments(ticket_id: int, session: Session = Depends(get_session)) -> list[AttachmentRead]:
+    return attachment_service.list_attachments(session, ticket_id)
+
+
+@router.get("/attachments/{attachment_id}/meta", response_model=AttachmentRead)
+def get_attachment_meta(attachment_id: int, session: Session = Depends(get_session)) -> AttachmentRead:
+    return _get_attachment(attachment_id, session)
+
+
+@router.delete("/attachments/{attachment_id}")
+def delete_attachment(attachment_id: int, session: Session = Depends(get_session)) -> dict:
+    attachment = _get_attachment(attachment_id, session)
+    ticket_id = attachment.ticket_id
+    attachment_service.delete_attachment(session, attachment)
+    _resync(session, session.get(Ticket, ticket_id))
+    return {"id": attachment_id, "deleted": True}
+
+
+def _read_range(path: str, start: int, length: int) -> Iterator[bytes]:
+    with open(path, "rb") as handle:
+        handle.seek(start)
+        while length > 0:
+            chunk = handle.read(min(READ_CHUNK_BYTES, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+def _parse_range(header: str, size: int) -> Optional[tuple[int, int]]:
+    """(start, end inclusive) for a single `bytes=` range; None if it cannot be served."""
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            # Suffix range: the last N bytes.
+            start, end = max(0, size - int(last)), size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        return None
+    return start, min(end, size - 1)
+
+
+@router.get("/attachments/{attachment_id}")
+def download_attachment(
+    attachment_id: int,
+    request: Request,
+    variant: str = Query(default="original", pattern="^(original|thumb|web)$"),
+    session: Session = Depends(get_session),
+) -> Response:
+    """
+    The file itself, or its `thumb`/`web` JPEG variant. Supports `Range` (resumable and
+    partial downloads) and `If-None-Match`; the ETag is the content hash.
+    """
+    attachment = _get_attachment(attachment_id, session)
+    if variant == "original":
+        path, media_type = attachment_service.object_path(attachment.sha256), attachment.content_type
+        etag = attachment.sha256
+    else:
+        if attachment.variant_status != "ready":
+            raise HTTPException(status_code=404, detail=f"No {variant} variant (status: {attachment.variant_status})")
+        path, media_type = attachment_service.variant_path(attachment.sha256, variant), "image/jpeg"
+        etag = f"{attachment.sha256}.{variant}"
+    try:
+        size = path.stat().st_size
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Attachment file is missing")
+
+    etag = f'"{etag}"'
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Accept-Ranges": "bytes"}
+    if variant == "original":
+        headers["Content-Disposition"] = 'inline; filename="{}"'.format(attachment.filename.replace('"', ""))
+    if etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+        return Response(status_code=304, headers=headers)
+
+    start, end, status = 0, size - 1, 200
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range == etag):
+        requested = _parse_range(range_header, size)
+        if requested is None:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        (start, end), status = requested, 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        _read_range(str(path), start, end - start + 1), status_code=status, media_type=media_type, headers=headers
+    )
@@ -0,0 +1,41 @@
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlmodel import Session
+
+from app.database import get_session
+from app.schemas import SummaryResponse
+from app.services import report_service
+
+router = APIRouter(prefix="/api/reports", tags=["reports"])
+
+
+@router.get("/summary", response_model=SummaryResponse)
+def get_summary(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    group_by: str = "day,product,partner,direction",
+    product: Optional[str] = None,
+    partner: Optional[str] = None,
+    direction: Optional[str] = None,
+    session: Session = Depends(get_session),
+) -> SummaryResponse:
+    """Net tonnage for finalized tickets; defaults to the last 31 days (UTC)."""
+    date_to = date_to or datetime.utcnow().date()
+    date_from = date_from or date_to - timedelta(days=30)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+    fields = [field.strip() for field in group_by.split(",") if field.strip()]
+    try:
+        rows = report_service.summarize(session, date_from, date_to, fields, product, partner, direction)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return SummaryResponse(
+        date_from=date_from,
+        date_to=date_to,
+        group_by=fields,
+        rows=rows,
+        ticket_count=sum(row["ticket_count"] for row in rows),
+        net_kg_total=sum(row["net_kg_total"] for row in rows),
+    )
@@ -1,54 +1,89 @@
 from datetime import datetime
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session
+from sqlmodel import Session, select
 
 from app.config import get_settings
 from app.database import get_session
+from app.dependencies import get_lane
 from app.models import SerialSettings
-from app.schemas import SerialSettingsPayload, SerialSettingsResponse
-from app.services.serial_manager import serial_manager
+from app.schemas import CaptureFileRead, SerialSettingsPayload, SerialSettingsResponse
+from app.services.serial_capture import list_captures
+from app.services.serial_manager import LaneReader, serial_manager
 
 router = APIRouter(prefix="/api/serial", tags=["serial"])
 
 
-def _get_or_create_serial_settings(session: Session) -> SerialSettings:
-    settings = session.get(SerialSettings, 1)
+def _get_or_create_serial_settings(session: Session, lane_id: int) -> SerialSettings:
+    settings = session.get(SerialSettings, lane_id)
     if not settings:
         app_settings = get_settings()
-        settings = SerialSettings(id=1, simulate=app_settings.allow_weight_simulation)
+        settings = SerialSettings(id=lane_id, simulate=app_settings.allow_weight_simulation)
         session.add(settings)
         session.commit()
         session.refresh(settings)
     return settings
 
 
-@router.get("/settings", response_model=SerialSettingsResponse)
-def get_serial_settings(session: Session = Depends(get_session)) -> SerialSettingsResponse:
-    stored = _get_or_create_serial_settings(session)
-    reading = serial_manager.get_reading()
+def _settings_response(stored: SerialSettings, reader: LaneReader) -> SerialSettingsResponse:
+    reading = reader.get_reading()
     return SerialSettingsResponse(
+        lane_id=reader.lane_id,
         port=stored.port,
         baudrate=stored.baudrate,
         bytesize=stored.bytesize,
         parity=stored.parity,
         stopbits=stored.stopbits,
         simulate=stored.simulate,
+        protocol=stored.protocol,
+        frame_length=stored.frame_length,
+        poll_command=stored.poll_command,
+        capture=stored.capture,
+        replay_file=stored.replay_file,
+        replay_speed=stored.replay_speed,
+        replay_loop=stored.replay_loop,
         last_connected_at=stored.last_connected_at,
+        auto_connect=bool(stored.auto_connect),
         connected=reading.connected,
         last_weight_kg=reading.weight_kg,
         last_weight_time=reading.captured_at,
     )
 
 
+@router.get("/lanes", response_model=list[SerialSettingsResponse])
+def list_lanes(session: Session = Depends(get_session)) -> list[SerialSettingsResponse]:
+    stored = {row.id: row for row in session.exec(select(SerialSettings)).all()}
+    active = {reader.lane_id for reader in serial_manager.lanes()}
+    return [
+        _settings_response(stored.get(lane_id) or SerialSettings(id=lane_id), serial_manager.lane(lane_id))
+        for lane_id in sorted(set(stored) | active)
+        if lane_id <= get_settings().max_lanes
+    ]
+
+
+@router.get("/captures", response_model=list[CaptureFileRead])
+def list_capture_files() -> list[CaptureFileRead]:
+    return list_captures()
+
+
+@router.get("/settings", response_model=SerialSettingsResponse)
+def get_serial_settings(
+    reader: LaneReader = Depends(get_lane), session: Session = Depends(get_session)
+) -> SerialSettingsResponse:
+    stored = _get_or_create_serial_settings(session, reader.lane_id)
+    return _settings_response(stored, reader)
+
+
 @router.post("/connect", response_model=SerialSettingsResponse)
 def connect_serial(
-    payload: SerialSettingsPayload, session: Session = Depends(get_session)
+    payload: SerialSettingsPayload,
+    reader: LaneReader = Depends(get_lane),
+    session: Session = Depends(get_session),
 ) -> SerialSettingsResponse:
-    stored = _get_or_create_serial_settings(session)
-    serial_manager.configure(payload)
+    stored = _get_or_create_serial_settings(session, reader.lane_id)
+    reader.configure(payload)
     try:
-        serial_manager.connect()
+        reader.connect()
     except Exception as exc:
         raise HTTPException(status_code=400, detail=str(exc))
 
@@ -58,26 +93,27 @@ def connect_serial(
     stored.parity = payload.parity
     stored.stopbits = payload.stopbits
     stored.simulate = payload.simulate
-    stored.last_connected_at = datetime.utcnow() if not payload.simulate else None
+    stored.protocol = payload.protocol
+    stored.frame_length = payload.frame_length
+    stored.poll_command = payload.poll_command
+    stored.capture = payload.capture
+    stored.replay_file = payload.replay_file
+    stored.replay_speed = payload.replay_speed
+    stored.replay_loop = payload.replay_loop
+    stored.last_connected_at = datetime.utcnow() if not (payload.simulate or payload.replay_file) else None
+    stored.auto_connect = True
     session.add(stored)
     session.commit()
     session.refresh(stored)
-
-    reading = serial_manager.get_reading()
-    return SerialSettingsResponse(
-        **payload.model_dump(),
-        last_connected_at=stored.last_connected_at,
-        connected=reading.connected,
-        last_weight_kg=reading.weight_kg,
-        last_weight_time=reading.captured_at,
-    )
+    return _settings_response(stored, reader)
 
 
 @router.post("/disconnect")
-def disconnect_serial(session: Session = Depends(get_session)) -> dict:
-    serial_manager.disconnect()
-    stored = _get_or_create_serial_settings(session)
+def disconnect_serial(reader: LaneReader = Depends(get_lane), session: Session = Depends(get_session)) -> dict:
+    reader.disconnect()
+    stored = _get_or_create_serial_settings(session, reader.lane_id)
     stored.last_connected_at = None
+    stored.auto_connect = False
     session.add(stored)
     session.commit()
-    return {"connected": False}
+    return {"lane_id": reader.lane_id, "connected": False}
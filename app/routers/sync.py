@@ -1,22 +1,52 @@
-import asyncio
+from typing import Optional
 
-from fastapi import APIRouter, Depends
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlmodel import Session
 
 from app.database import get_session
 from app.models import SyncQueue
-from app.schemas import SyncQueueRead
-from app.services.sync_service import sync_service
+from app.schemas import SyncQueueRead, SyncStats
+from app.services.sync_service import QUEUE_STATUSES, sync_service
 
 router = APIRouter(prefix="/api/sync", tags=["sync"])
 
 
 @router.get("/queue", response_model=list[SyncQueueRead])
-def list_queue(session: Session = Depends(get_session)) -> list[SyncQueueRead]:
-    return session.exec(select(SyncQueue).order_by(SyncQueue.created_at.desc())).all()
+def list_queue(
+    response: Response,
+    status: Optional[str] = None,
+    limit: int = Query(default=50, ge=1, le=500),
+    cursor: Optional[int] = Query(default=None, ge=1),
+    session: Session = Depends(get_session),
+) -> list[SyncQueueRead]:
+    """Newest first. When more rows match, `X-Next-Cursor` holds the cursor for the next page."""
+    if status and status not in QUEUE_STATUSES:
+        raise HTTPException(status_code=400, detail=f"status must be one of {', '.join(QUEUE_STATUSES)}")
+    # One row past the page tells whether another page exists.
+    items = sync_service.list_queue(session, limit=limit + 1, status=status, before_id=cursor)
+    page = items[:limit]
+    if len(items) > limit:
+        response.headers["X-Next-Cursor"] = str(page[-1].id)
+    return page
+
+
+@router.get("/stats", response_model=SyncStats)
+def queue_stats(session: Session = Depends(get_session)) -> SyncStats:
+    return sync_service.stats(session)
+
+
+@router.post("/queue/{item_id}/retry", response_model=SyncQueueRead)
+def retry_queue_item(item_id: int, session: Session = Depends(get_session)) -> SyncQueueRead:
+    item = session.get(SyncQueue, item_id)
+    if not item:
+        raise HTTPException(status_code=404, detail="Queue item not found")
+    if item.status == "sent":
+        raise HTTPException(status_code=400, detail="Queue item was already sent")
+    return sync_service.retry(session, item)
 
 
 @router.post("/run")
 async def run_sync_now() -> dict:
-    await sync_service.sync_pending()
+    # Manual run: also retry rows still waiting out their backoff.
+    await sync_service.sync_pending(force=True)
     return {"status": "ok"}
@@ -1,24 +1,101 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session, select
 
 from app.database import get_session
+from app.dependencies import wait_for_stable_weight
 from app.models import Ticket
-from app.schemas import TicketFinalizeRequest, TicketRead, WeighInRequest, WeighOutRequest
+from app.schemas import (
+    OpenTicketRead,
+    StabilityStats,
+    TicketFilters,
+    TicketFinalizeRequest,
+    TicketRead,
+    WeighInRequest,
+    WeighOutRequest,
+)
 from app.services import ticket_service
-from app.services.serial_manager import serial_manager
+from app.services.export_service import EXPORT_FORMATS, stream_tickets
+from app.services.plate_index import plate_index
+from app.services.serial_manager import LaneReader, serial_manager
 from app.services.sync_service import sync_service
 
 router = APIRouter(prefix="/api/tickets", tags=["tickets"])
 
 
+def _lane_reader(lane_id: int) -> LaneReader:
+    try:
+        return serial_manager.lane(lane_id)
+    except KeyError as exc:
+        raise HTTPException(status_code=400, detail=str(exc.args[0]))
+
+
+def _capture_live_weight(
+    reader: LaneReader, capture_mode: str, timeout: Optional[float]
+) -> tuple[float, Optional[StabilityStats]]:
+    if capture_mode == "stable":
+        stats = wait_for_stable_weight(reader, timeout)
+        return stats.weight_kg, stats
+
+    live = reader.get_reading()
+    if live.weight_kg is None:
+        raise HTTPException(status_code=400, detail="No live weight available from indicator")
+    return live.weight_kg, None
+
+
+def _with_stability(ticket: Ticket, stats: Optional[StabilityStats]) -> TicketRead:
+    read = TicketRead.model_validate(ticket)
+    if stats is not None:
+        read.stability = stats
+    return read
+
+
 @router.get("", response_model=list[TicketRead])
-def list_recent_tickets(limit: int = 50, session: Session = Depends(get_session)) -> list[TicketRead]:
-    return ticket_service.list_tickets(session, limit=limit)
+def list_recent_tickets(
+    response: Response,
+    limit: int = Query(default=50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    filters: TicketFilters = Depends(),
+    session: Session = Depends(get_session),
+) -> list[TicketRead]:
+    """Newest first. When more tickets match, `X-Next-Cursor` holds the cursor for the next page."""
+    try:
+        after = ticket_service.decode_cursor(cursor) if cursor else None
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    # One ticket past the page (live and archived merged) tells whether another page exists.
+    tickets = ticket_service.list_tickets(session, limit=limit + 1, filters=filters, cursor=after)
+    page = tickets[:limit]
+    if len(tickets) > limit:
+        response.headers["X-Next-Cursor"] = ticket_service.encode_cursor(page[-1])
+    return page
+
+
+@router.get("/export")
+def export_tickets(format: str = "csv", filters: TicketFilters = Depends()) -> StreamingResponse:
+    """Stream every matching ticket, oldest first, as CSV or newline-delimited JSON."""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    filename = f"tickets-{datetime.utcnow():%Y%m%d-%H%M%S}.{format}"
+    return StreamingResponse(
+        stream_tickets(filters, format),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/open", response_model=list[OpenTicketRead])
+def list_open_tickets(plate: str = "", limit: int = Query(default=20, ge=1, le=200)) -> list[OpenTicketRead]:
+    """Open tickets whose plate starts with `plate` (spaces, dashes and case ignored)."""
+    return [ticket._asdict() for ticket in plate_index.search(plate, limit)]
 
 
 @router.get("/{ticket_id}", response_model=TicketRead)
 def get_ticket(ticket_id: int, session: Session = Depends(get_session)) -> TicketRead:
-    ticket = session.get(Ticket, ticket_id)
+    ticket = ticket_service.get_ticket(session, ticket_id)
     if not ticket:
         raise HTTPException(status_code=404, detail="Ticket not found")
     return ticket
@@ -26,22 +103,39 @@ def get_ticket(ticket_id: int, session: Session = Depends(get_session)) -> Ticke
 
 @router.post("/weigh-in", response_model=TicketRead)
 def create_weigh_in_ticket(payload: WeighInRequest, session: Session = Depends(get_session)) -> TicketRead:
-    weight = payload.gross_kg
+    reader = _lane_reader(payload.lane_id)
+    # Before capturing, so a stable capture does not make the operator wait for a rejection.
+    on_site = plate_index.lookup(payload.vehicle_plate, status="weigh_in")
+    if on_site:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Vehicle {payload.vehicle_plate} already has an open weigh-in (ticket {on_site[0].id})",
+        )
+
+    weight, stats = payload.gross_kg, None
     if weight is None:
-        live = serial_manager.get_reading()
-        if live.weight_kg is None:
-            raise HTTPException(status_code=400, detail="No live weight available from indicator")
-        weight = live.weight_kg
+        weight, stats = _capture_live_weight(reader, payload.capture_mode, payload.stable_timeout_seconds)
 
-    data = payload.model_dump()
-    data.pop("gross_kg", None)
-    data.pop("weight_in_time", None)
+    data = payload.model_dump(
+        exclude={"gross_kg", "weight_in_time", "capture_mode", "stable_timeout_seconds", "tare_mode"}
+    )
 
     if weight <= 0:
         raise HTTPException(status_code=400, detail="Gross weight must be greater than zero")
 
-    ticket = ticket_service.create_weigh_in(session, data, weight, payload.weight_in_time)
-    return ticket
+    if payload.tare_mode == "stored":
+        try:
+            ticket = ticket_service.create_stored_tare_ticket(session, data, weight, payload.weight_in_time)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        sync_service.enqueue_ticket(session, ticket)
+        return _with_stability(ticket, stats)
+
+    try:
+        ticket = ticket_service.create_weigh_in(session, data, weight, payload.weight_in_time)
+    except ticket_service.OpenWeighInExists as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    return _with_stability(ticket, stats)
 
 
 @router.post("/{ticket_id}/weigh-out", response_model=TicketRead)
@@ -51,19 +145,36 @@ def add_tare_weight(
     ticket = session.get(Ticket, ticket_id)
     if not ticket:
         raise HTTPException(status_code=404, detail="Ticket not found")
+    return _weigh_out(session, ticket, payload)
+
 
-    tare = payload.tare_kg
+@router.post("/by-plate/{plate}/weigh-out", response_model=TicketRead)
+def add_tare_weight_by_plate(
+    plate: str, payload: WeighOutRequest, session: Session = Depends(get_session)
+) -> TicketRead:
+    matches = plate_index.lookup(plate, status="weigh_in")
+    if not matches:
+        raise HTTPException(status_code=404, detail=f"No open weigh-in for vehicle {plate}")
+    if len(matches) > 1:
+        ids = ", ".join(str(match.id) for match in matches)
+        raise HTTPException(status_code=409, detail=f"Several open weigh-ins for vehicle {plate}: tickets {ids}")
+    ticket = session.get(Ticket, matches[0].id)
+    if not ticket:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    return _weigh_out(session, ticket, payload)
+
+
+def _weigh_out(session: Session, ticket: Ticket, payload: WeighOutRequest) -> TicketRead:
+    tare, stats = payload.tare_kg, None
     if tare is None:
-        live = serial_manager.get_reading()
-        if live.weight_kg is None:
-            raise HTTPException(status_code=400, detail="No live weight available from indicator")
-        tare = live.weight_kg
+        reader = _lane_reader(payload.lane_id or ticket.lane_id)
+        tare, stats = _capture_live_weight(reader, payload.capture_mode, payload.stable_timeout_seconds)
 
     if tare <= 0:
         raise HTTPException(status_code=400, detail="Tare weight must be greater than zero")
 
     ticket = ticket_service.record_weigh_out(session, ticket, tare, payload.weight_out_time)
-    return ticket
+    return _with_stability(ticket, stats)
 
 
 @router.post("/{ticket_id}/finalize", response_model=TicketRead)
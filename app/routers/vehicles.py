@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlmodel import Session
+
+from app.database import get_session
+from app.schemas import VehicleTareRead
+from app.services.tare_register import StoredTare, tare_register
+
+router = APIRouter(prefix="/api/vehicles", tags=["vehicles"])
+
+
+def _tare_response(stored: StoredTare) -> VehicleTareRead:
+    return VehicleTareRead(**stored._asdict(), valid=stored.valid())
+
+
+@router.get("/tares", response_model=list[VehicleTareRead])
+def list_stored_tares() -> list[VehicleTareRead]:
+    return [_tare_response(stored) for stored in tare_register.all()]
+
+
+@router.get("/{plate}/tare", response_model=VehicleTareRead)
+def get_stored_tare(plate: str) -> VehicleTareRead:
+    stored = tare_register.get(plate)
+    if stored is None:
+        raise HTTPException(status_code=404, detail=f"No stored tare for vehicle {plate}")
+    return _tare_response(stored)
+
+
+@router.delete("/{plate}/tare")
+def delete_stored_tare(plate: str, session: Session = Depends(get_session)) -> dict:
+    """Drop a stored tare so the vehicle has to be weighed empty again."""
+    if not tare_register.forget(session, plate):
+        raise HTTPException(status_code=404, detail=f"No stored tare for vehicle {plate}")
+    return {"vehicle_plate": plate, "deleted": True}
@@ -1,11 +1,123 @@
-from fastapi import APIRouter
+import asyncio
+import math
+import time
+from datetime import datetime
+from typing import Optional
 
-from app.schemas import WeightReading
-from app.services.serial_manager import serial_manager
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from app.config import get_settings
+from app.dependencies import get_lane, wait_for_stable_weight
+from app.schemas import (
+    MAX_STABLE_TIMEOUT_SECONDS,
+    StabilityStats,
+    WeightHistoryBucket,
+    WeightHistoryResponse,
+    WeightReading,
+)
+from app.services.serial_manager import DEFAULT_LANE, LaneReader, serial_manager
+from app.services.weight_broadcaster import WeightSubscription
 
 router = APIRouter(prefix="/api/weight", tags=["weight"])
 
+# Idle SSE connections get a comment line this often so proxies keep them open.
+SSE_KEEPALIVE_SECONDS = 15
+
 
 @router.get("/live", response_model=WeightReading)
-def get_live_weight() -> WeightReading:
-    return serial_manager.get_reading()
+def get_live_weight(reader: LaneReader = Depends(get_lane)) -> WeightReading:
+    return reader.get_reading()
+
+
+@router.get("/stable", response_model=StabilityStats)
+def get_stable_weight(
+    timeout: Optional[float] = Query(default=None, gt=0, le=MAX_STABLE_TIMEOUT_SECONDS),
+    reader: LaneReader = Depends(get_lane),
+) -> StabilityStats:
+    """Wait (up to `timeout` seconds) for the load to settle and return the stable weight."""
+    return wait_for_stable_weight(reader, timeout)
+
+
+@router.get("/history", response_model=WeightHistoryResponse)
+def get_weight_history(
+    window: float = Query(default=300, gt=0, description="Seconds of history to return"),
+    resolution: float = Query(default=1, gt=0, description="Bucket width in seconds"),
+    reader: LaneReader = Depends(get_lane),
+) -> WeightHistoryResponse:
+    max_buckets = get_settings().weight_history_max_buckets
+    if window / resolution > max_buckets:
+        raise HTTPException(
+            status_code=400, detail=f"window/resolution exceeds {max_buckets} buckets; use a coarser resolution"
+        )
+
+    # Align buckets to multiples of the resolution so repeated polls line up.
+    since = math.floor((time.time() - window) / resolution) * resolution
+    buckets = [
+        WeightHistoryBucket(
+            start=datetime.utcfromtimestamp(bucket.start),
+            min_kg=bucket.min_kg,
+            max_kg=bucket.max_kg,
+            mean_kg=bucket.mean_kg,
+            samples=bucket.samples,
+            motion_samples=bucket.motion_samples,
+        )
+        for bucket in reader.history.buckets(since, resolution)
+    ]
+    return WeightHistoryResponse(window_seconds=window, resolution_seconds=resolution, buckets=buckets)
+
+
+@router.get("/stream")
+async def stream_live_weight(reader: LaneReader = Depends(get_lane)) -> StreamingResponse:
+    """Server-Sent Events feed of live readings; only changed readings are sent."""
+    broadcaster = reader.broadcaster
+
+    async def events():
+        subscription = broadcaster.subscribe()
+        try:
+            while not subscription.closed:
+                reading = await subscription.get(timeout=SSE_KEEPALIVE_SECONDS)
+                if reading is None:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {reading.model_dump_json()}\n\n"
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/ws")
+async def stream_live_weight_ws(websocket: WebSocket, lane: int = DEFAULT_LANE) -> None:
+    """WebSocket feed of live readings; only changed readings are sent."""
+    try:
+        broadcaster = serial_manager.lane(lane).broadcaster
+    except KeyError:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    subscription = broadcaster.subscribe()
+    watcher = asyncio.create_task(_close_on_disconnect(websocket, subscription))
+    try:
+        while not subscription.closed:
+            reading = await subscription.get()
+            if reading is not None:
+                await websocket.send_text(reading.model_dump_json())
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        watcher.cancel()
+        broadcaster.unsubscribe(subscription)
+
+
+async def _close_on_disconnect(websocket: WebSocket, subscription: WeightSubscription) -> None:
+    # The feed is one-way; anything the client sends is ignored until it goes away.
+    try:
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+    finally:
+        subscription.close()
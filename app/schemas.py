@@ -1,8 +1,11 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
 
 from pydantic import BaseModel, Field
 
+# Upper bound for a client-supplied stable-capture wait; each wait holds a worker thread.
+MAX_STABLE_TIMEOUT_SECONDS = 60.0
+
 
 class SerialSettingsPayload(BaseModel):
     port: Optional[str] = None
@@ -11,22 +14,44 @@ class SerialSettingsPayload(BaseModel):
     parity: str = Field(default="N", pattern="^[NOEMS]$")
     stopbits: float = 1
     simulate: bool = False
+    protocol: str = "continuous"
+    frame_length: Optional[int] = Field(default=None, gt=1)
+    poll_command: Optional[str] = None
+    # Record raw port traffic to data_dir/captures while connected.
+    capture: bool = False
+    # Replay a capture file through the parser instead of opening a port.
+    replay_file: Optional[str] = None
+    replay_speed: float = Field(default=1.0, ge=0, description="1 = real time, N = N times faster, 0 = full speed")
+    replay_loop: bool = True
 
 
 class SerialSettingsResponse(SerialSettingsPayload):
+    lane_id: int = 1
     last_connected_at: Optional[datetime] = None
+    auto_connect: bool = False
     connected: bool = False
     last_weight_kg: Optional[float] = None
     last_weight_time: Optional[datetime] = None
 
 
+class CaptureFileRead(BaseModel):
+    name: str
+    size_bytes: int
+    modified_at: datetime
+
+
 class WeighInRequest(BaseModel):
+    lane_id: int = 1
     vehicle_plate: str
     direction: str
     partner_name: str
     product_name: str
     operator_name: str
     gross_kg: Optional[float] = None
+    capture_mode: str = Field(default="instant", pattern="^(instant|stable)$")
+    stable_timeout_seconds: Optional[float] = Field(default=None, gt=0, le=MAX_STABLE_TIMEOUT_SECONDS)
+    # "stored" takes the tare from the vehicle register and finalizes in one pass.
+    tare_mode: str = Field(default="weighed", pattern="^(weighed|stored)$")
     weight_in_time: Optional[datetime] = None
     delivery_reference: Optional[str] = None
     driver_name: Optional[str] = None
@@ -35,20 +60,59 @@ class WeighInRequest(BaseModel):
 
 
 class WeighOutRequest(BaseModel):
+    lane_id: Optional[int] = None
     tare_kg: Optional[float] = None
+    capture_mode: str = Field(default="instant", pattern="^(instant|stable)$")
+    stable_timeout_seconds: Optional[float] = Field(default=None, gt=0, le=MAX_STABLE_TIMEOUT_SECONDS)
     weight_out_time: Optional[datetime] = None
     remarks: Optional[str] = None
 
 
+class OpenTicketRead(BaseModel):
+    id: int
+    vehicle_plate: str
+    status: str
+    lane_id: int
+    direction: str
+    partner_name: str
+    product_name: str
+    gross_kg: float
+    weight_in_time: Optional[datetime]
+
+
 class TicketFinalizeRequest(BaseModel):
     qc_status: Optional[str] = None
     qc_note: Optional[str] = None
     remarks: Optional[str] = None
 
 
+class StabilityStats(BaseModel):
+    weight_kg: float
+    mean_kg: float
+    spread_kg: float
+    stddev_kg: float
+    samples: int
+    window_seconds: float
+    waited_seconds: float
+    captured_at: datetime
+
+
+class TicketFilters(BaseModel):
+    status: Optional[str] = None
+    direction: Optional[str] = None
+    lane_id: Optional[int] = None
+    # Prefix of the vehicle plate; case, spaces and dashes are ignored.
+    plate: Optional[str] = None
+    partner: Optional[str] = None
+    product: Optional[str] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+
+
 class TicketRead(BaseModel):
     id: int
     ticket_no: Optional[str]
+    lane_id: int
     status: str
     direction: str
     vehicle_plate: str
@@ -60,6 +124,7 @@ class TicketRead(BaseModel):
     operator_name: str
     gross_kg: float
     tare_kg: float
+    tare_source: Optional[str] = None
     net_kg: float
     weight_in_time: Optional[datetime]
     weight_out_time: Optional[datetime]
@@ -68,26 +133,97 @@ class TicketRead(BaseModel):
     remarks: Optional[str]
     created_at: datetime
     updated_at: datetime
+    stability: Optional[StabilityStats] = None
 
     class Config:
         from_attributes = True
 
 
+class VehicleTareRead(BaseModel):
+    vehicle_plate: str
+    tare_kg: float
+    captured_at: datetime
+    expires_at: datetime
+    source_ticket_id: Optional[int]
+    valid: bool
+
+
+class SummaryRow(BaseModel):
+    day: Optional[date] = None
+    product_name: Optional[str] = None
+    partner_name: Optional[str] = None
+    direction: Optional[str] = None
+    ticket_count: int
+    net_kg_total: float
+    net_kg_min: float
+    net_kg_max: float
+
+
+class SummaryResponse(BaseModel):
+    date_from: date
+    date_to: date
+    group_by: list[str]
+    rows: list[SummaryRow]
+    ticket_count: int
+    net_kg_total: float
+
+
 class SyncQueueRead(BaseModel):
     id: int
     ticket_id: int
     status: str
+    idempotency_key: Optional[str] = None
     attempts: int
     last_error: Optional[str]
     last_attempt_at: Optional[datetime]
+    next_attempt_at: Optional[datetime]
     created_at: datetime
 
     class Config:
         from_attributes = True
 
 
+class AttachmentRead(BaseModel):
+    id: int
+    ticket_id: int
+    kind: str
+    filename: str
+    content_type: str
+    size_bytes: int
+    sha256: str
+    variant_status: str
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class SyncStats(BaseModel):
+    counts: dict[str, int]
+    total: int
+    oldest_pending_at: Optional[datetime]
+    oldest_pending_age_seconds: Optional[float]
+    last_sent_at: Optional[datetime]
+
+
 class WeightReading(BaseModel):
     weight_kg: Optional[float]
     captured_at: Optional[datetime]
     connected: bool
     source: str
+    stable: bool = False
+
+
+class WeightHistoryBucket(BaseModel):
+    start: datetime
+    min_kg: float
+    max_kg: float
+    mean_kg: float
+    samples: int
+    motion_samples: int
+
+
+class WeightHistoryResponse(BaseModel):
+    window_seconds: float
+    resolution_seconds: float
+    buckets: list[WeightHistoryBucket]
@@ -0,0 +1,270 @@
+"""
+Monthly archive databases for old tickets.
+
+Finalized tickets whose queue rows have all been sent to Odoo, and those queue rows,
+move out of the live database into `data_dir/archive/weighbridge-YYYY-MM.db` (by ticket
+creation month) once they are older than `archive_after_days`. The copy and delete
+happen in one transaction with the archive ATTACHed, then freed pages are returned
+to the filesystem with an incremental vacuum.
+
+Reads that reach back past the live data ATTACH the months they need, one at a time.
+
+    python -m app.services.archive_service [--before 2024-01-01]
+"""
+import argparse
+import heapq
+import logging
+import re
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator, Optional
+
+from sqlalchemy import Select, create_engine, exists, func
+from sqlalchemy.engine import Connection, Row
+from sqlmodel import Session, select
+from sqlmodel.sql.expression import SelectOfScalar
+
+from app.config import get_settings
+from app.database import engine, migrate_schema, upgrade_data
+from app.models import SyncQueue, Ticket
+from app.schemas import TicketFilters
+
+logger = logging.getLogger("archive_service")
+
+ARCHIVE_TABLES = (Ticket.__table__, SyncQueue.__table__)
+_FILE_NAME = re.compile(r"^weighbridge-(\d{4})-(\d{2})\.db$")
+# Serializes archive runs (scheduler and command line share the process-wide engine).
+_run_lock = threading.Lock()
+# Archive files brought up to the current models by this process.
+_upgraded: set[datetime] = set()
+_upgrade_lock = threading.Lock()
+
+
+def archive_dir() -> Path:
+    path = Path(get_settings().data_dir) / "archive"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def archive_path(month: datetime) -> Path:
+    return archive_dir() / f"weighbridge-{month:%Y-%m}.db"
+
+
+def archive_months() -> list[datetime]:
+    """First day of every month that has an archive file, newest first."""
+    months = []
+    for path in archive_dir().glob("weighbridge-*.db"):
+        match = _FILE_NAME.match(path.name)
+        if match:
+            months.append(datetime(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months, reverse=True)
+
+
+def _next_month(month: datetime) -> datetime:
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def months_in_range(created_from: Optional[datetime], created_to: Optional[datetime]) -> list[datetime]:
+    """Archive months that can hold tickets created in [created_from, created_to), newest first."""
+    return [
+        month
+        for month in archive_months()
+        if (created_from is None or _next_month(month) > created_from) and (created_to is None or month < created_to)
+    ]
+
+
+@contextmanager
+def attached(conn: Connection, month: datetime) -> Iterator[str]:
+    """ATTACH one month's archive to `conn` and yield its schema name."""
+    _upgrade_archive(month)
+    schema = f"archive_{month:%Y_%m}"
+    conn.exec_driver_sql(f"ATTACH DATABASE ? AS {schema}", (str(archive_path(month)),))
+    try:
+        yield schema
+    finally:
+        conn.exec_driver_sql(f"DETACH DATABASE {schema}")
+
+
+# --- archiving -------------------------------------------------------------------------
+
+
+def _archivable(cutoff: datetime):
+    # Sent rows may already have been pruned, so "nothing left to send" is the test.
+    unsent = exists().where(SyncQueue.ticket_id == Ticket.id, SyncQueue.status != "sent")
+    # The newest ticket always stays live so SQLite never hands its id out again.
+    newest = select(func.max(Ticket.id)).scalar_subquery()
+    return (
+        select(Ticket.id, Ticket.created_at)
+        .where(Ticket.status == "finalized", Ticket.created_at < cutoff, Ticket.id < newest)
+        .where(~unsent)
+        .order_by(Ticket.created_at)
+    )
+
+
+def archive_before(cutoff: datetime) -> int:
+    """Move archivable tickets created before `cutoff`; returns how many were moved."""
+    with _run_lock:
+        with Session(engine) as session:
+            candidates = session.exec(_archivable(cutoff)).all()
+        by_month: dict[datetime, list[int]] = {}
+        for ticket_id, created_at in candidates:
+            by_month.setdefault(created_at.replace(day=1, hour=0, minute=0, second=0, microsecond=0), []).append(
+                ticket_id
+            )
+
+        moved = 0
+        batch_size = max(1, get_settings().archive_batch_size)
+        for month, ticket_ids in sorted(by_month.items()):
+            _prepare_archive(month)
+            for start in range(0, len(ticket_ids), batch_size):
+                moved += _move(month, ticket_ids[start : start + batch_size])
+        if moved:
+            _reclaim_space()
+            logger.info("Archived %d tickets created before %s", moved, cutoff.date())
+        return moved
+
+
+def run_archive() -> int:
+    days = get_settings().archive_after_days
+    if days <= 0:
+        return 0
+    return archive_before(datetime.utcnow() - timedelta(days=days))
+
+
+def _prepare_archive(month: datetime) -> None:
+    archive_engine = create_engine(f"sqlite:///{archive_path(month)}")
+    try:
+        migrate_schema(archive_engine, ARCHIVE_TABLES)
+        upgrade_data(archive_engine)
+    finally:
+        archive_engine.dispose()
+    _upgraded.add(month)
+
+
+def _upgrade_archive(month: datetime) -> None:
+    """
+    Files written by an older release lack newer columns, which every SELECT of the
+    models names. Upgrade each file the first time this process attaches it.
+    """
+    with _upgrade_lock:
+        if month in _upgraded:
+            return
+        if archive_path(month).exists():
+            _prepare_archive(month)
+
+
+def _move(month: datetime, ticket_ids: list[int]) -> int:
+    marks = ", ".join("?" * len(ticket_ids))
+    with engine.connect() as conn:
+        with attached(conn, month) as schema:
+            for table, key in ((Ticket.__table__, "id"), (SyncQueue.__table__, "ticket_id")):
+                columns = ", ".join(f'"{column.name}"' for column in table.columns)
+                conn.exec_driver_sql(
+                    f'INSERT OR REPLACE INTO {schema}."{table.name}" ({columns}) '
+                    f'SELECT {columns} FROM main."{table.name}" WHERE "{key}" IN ({marks})',
+                    tuple(ticket_ids),
+                )
+            conn.exec_driver_sql(f'DELETE FROM main."syncqueue" WHERE "ticket_id" IN ({marks})', tuple(ticket_ids))
+            moved = conn.exec_driver_sql(f'DELETE FROM main."ticket" WHERE "id" IN ({marks})', tuple(ticket_ids))
+            conn.commit()
+    return moved.rowcount
+
+
+def _reclaim_space() -> None:
+    with engine.connect() as conn:
+        mode = conn.exec_driver_sql("PRAGMA auto_vacuum").scalar()
+        if mode != 2:
+            # Databases created before the storage profile set auto_vacuum need one full
+            # VACUUM to switch modes; afterwards the incremental form is enough.
+            logger.info("Switching database to incremental auto-vacuum (one-time full VACUUM)")
+            conn.exec_driver_sql("PRAGMA auto_vacuum=incremental")
+            conn.exec_driver_sql("VACUUM")
+        else:
+            # Each step of the statement frees one page, so run it as a script to completion.
+            conn.connection.driver_connection.executescript("PRAGMA incremental_vacuum")
+
+
+# --- reads -----------------------------------------------------------------------------
+
+
+def list_archived_tickets(
+    session: Session,
+    live: list[Ticket],
+    query: SelectOfScalar,
+    limit: int,
+    filters: Optional[TicketFilters],
+    cursor: Optional[tuple[datetime, int]],
+) -> list[Ticket]:
+    """
+    Merge archived tickets into a page of live ones (newest first). `query` is the page
+    query already run against the live tables. Months are visited newest first and the
+    walk stops once the page is full of tickets newer than anything older months hold.
+    """
+    created_to = filters.created_to if filters else None
+    if cursor is not None and (created_to is None or cursor[0] < created_to):
+        created_to = cursor[0] + timedelta(microseconds=1)
+    months = months_in_range(filters.created_from if filters else None, created_to)
+
+    page = list(live)
+    conn = session.connection()
+    for month in months:
+        if len(page) >= limit and page[limit - 1].created_at >= _next_month(month):
+            break
+        with attached(conn, month) as schema:
+            rows = session.exec(query, execution_options={"schema_translate_map": {None: schema}}).all()
+        page = heapq.nlargest(limit, page + list(rows), key=lambda ticket: (ticket.created_at, ticket.id))
+    return page
+
+
+def get_archived_ticket(session: Session, ticket_id: int) -> Optional[Ticket]:
+    conn = session.connection()
+    for month in archive_months():
+        with attached(conn, month) as schema:
+            ticket = session.exec(
+                select(Ticket).where(Ticket.id == ticket_id),
+                execution_options={"schema_translate_map": {None: schema}},
+            ).first()
+        if ticket is not None:
+            return ticket
+    return None
+
+
+def stream_archived_rows(query: Select, filters: Optional[TicketFilters], yield_per: int) -> Iterator[Row]:
+    """
+    Run a Core `query` (ordered by created_at ascending) against every archive month the
+    filters reach, oldest month first. Months do not overlap, so the output stays ordered.
+    """
+    months = months_in_range(filters.created_from if filters else None, filters.created_to if filters else None)
+    if not months:
+        return
+    with engine.connect() as conn:
+        for month in reversed(months):
+            with attached(conn, month) as schema:
+                result = conn.execution_options(
+                    schema_translate_map={None: schema}, stream_results=True, yield_per=yield_per
+                ).execute(query)
+                try:
+                    yield from result
+                finally:
+                    result.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Move old synced tickets into monthly archive files")
+    parser.add_argument("--before", type=datetime.fromisoformat, help="archive tickets created before this date")
+    args = parser.parse_args()
+
+    from app.database import init_db
+
+    init_db()
+    if args.before:
+        moved = archive_before(args.before)
+    else:
+        moved = run_archive()
+    print(f"Archived {moved} tickets")
+
+
+if __name__ == "__main__":
+    main()
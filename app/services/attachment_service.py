@@ -0,0 +1,263 @@
+"""
+Ticket attachments stored by content hash under `attachments_dir`:
+
+    objects/ab/<sha256>             original bytes, shared by every identical upload
+    variants/ab/<sha256>.thumb.jpg  thumbnail (images only)
+    variants/ab/<sha256>.web.jpg    compressed copy for viewing (images only)
+    tmp/                            uploads in progress (same filesystem, so the final
+                                    rename into objects/ is atomic)
+
+Uploads are streamed to disk and hashed on the way. Image variants are rendered in a
+process pool and reported through `Attachment.variant_status`.
+"""
+import hashlib
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, NamedTuple, Optional
+
+from sqlalchemy import update
+from sqlmodel import Session, select
+from starlette.concurrency import run_in_threadpool
+
+from app import thumbnails
+from app.config import get_settings
+from app.database import engine
+from app.models import Attachment, Ticket
+
+logger = logging.getLogger("attachment_service")
+
+ATTACHMENT_KINDS = ("camera", "delivery_note", "other")
+CONTENT_TYPES = ("image/jpeg", "image/png", "image/webp", "application/pdf")
+IMAGE_TYPES = ("image/jpeg", "image/png", "image/webp")
+VARIANTS = ("thumb", "web")
+# Incoming chunks are gathered to about this size before each (off-loop) disk write.
+WRITE_CHUNK_BYTES = 1024 * 1024
+
+
+class AttachmentTooLarge(Exception):
+    """The upload exceeded `attachment_max_bytes`."""
+
+
+class StoredBlob(NamedTuple):
+    sha256: str
+    size_bytes: int
+
+
+def _root() -> Path:
+    return Path(get_settings().attachments_dir)
+
+
+def object_path(sha256: str) -> Path:
+    return _root() / "objects" / sha256[:2] / sha256
+
+
+def variant_path(sha256: str, variant: str) -> Path:
+    return _root() / "variants" / sha256[:2] / f"{sha256}.{variant}.jpg"
+
+
+# --- upload ----------------------------------------------------------------------------
+
+
+def _open_temp() -> BinaryIO:
+    directory = _root() / "tmp"
+    directory.mkdir(parents=True, exist_ok=True)
+    return tempfile.NamedTemporaryFile(dir=directory, prefix="upload-", delete=False)
+
+
+def _write(handle: BinaryIO, digest, data: bytes) -> None:
+    digest.update(data)
+    handle.write(data)
+
+
+def _commit_blob(handle: BinaryIO, sha256: str) -> None:
+    handle.close()
+    target = object_path(sha256)
+    if target.exists():
+        # Already stored by an earlier upload; keep the existing file.
+        os.unlink(handle.name)
+        return
+    target.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(handle.name, target)
+
+
+def _discard(handle: BinaryIO) -> None:
+    handle.close()
+    try:
+        os.unlink(handle.name)
+    except FileNotFoundError:
+        pass
+
+
+async def store_stream(chunks: AsyncIterator[bytes], max_bytes: Optional[int] = None) -> StoredBlob:
+    """
+    Write an upload to the object store without holding it in memory. Hashing and disk
+    writes run in the threadpool, a buffer of ~1 MiB at a time, off the event loop.
+    """
+    max_bytes = max_bytes or get_settings().attachment_max_bytes
+    handle = await run_in_threadpool(_open_temp)
+    digest = hashlib.sha256()
+    size = 0
+    buffer = bytearray()
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > max_bytes:
+                raise AttachmentTooLarge(f"Attachment exceeds {max_bytes} bytes")
+            buffer += chunk
+            if len(buffer) >= WRITE_CHUNK_BYTES:
+                await run_in_threadpool(_write, handle, digest, bytes(buffer))
+                buffer.clear()
+        if buffer:
+            await run_in_threadpool(_write, handle, digest, bytes(buffer))
+        if size == 0:
+            raise ValueError("Attachment is empty")
+        sha256 = digest.hexdigest()
+        await run_in_threadpool(_commit_blob, handle, sha256)
+    except BaseException:
+        await run_in_threadpool(_discard, handle)
+        raise
+    return StoredBlob(sha256, size)
+
+
+def add_attachment(
+    session: Session, ticket: Ticket, blob: StoredBlob, kind: str, filename: str, content_type: str
+) -> Attachment:
+    attachment = Attachment(
+        ticket_id=ticket.id,
+        kind=kind,
+        filename=filename,
+        content_type=content_type,
+        size_bytes=blob.size_bytes,
+        sha256=blob.sha256,
+        variant_status=_initial_variant_status(blob.sha256, content_type),
+    )
+    session.add(attachment)
+    # The legacy single-file column points at the newest attachment.
+    ticket.attachment_path = str(object_path(blob.sha256).relative_to(_root()))
+    session.add(ticket)
+    session.commit()
+    session.refresh(attachment)
+    if attachment.variant_status == "pending":
+        variant_pool.submit(blob.sha256)
+    return attachment
+
+
+def list_attachments(session: Session, ticket_id: int) -> list[Attachment]:
+    query = select(Attachment).where(Attachment.ticket_id == ticket_id).order_by(Attachment.id)
+    return list(session.exec(query).all())
+
+
+def delete_attachment(session: Session, attachment: Attachment) -> None:
+    """Delete the row; the stored files go too once no other attachment shares them."""
+    sha256 = attachment.sha256
+    session.delete(attachment)
+    session.commit()
+    if session.exec(select(Attachment.id).where(Attachment.sha256 == sha256).limit(1)).first() is None:
+        for path in (object_path(sha256), *(variant_path(sha256, variant) for variant in VARIANTS)):
+            path.unlink(missing_ok=True)
+
+
+def reference(attachment: Attachment) -> dict:
+    """How a ticket's sync payload points at an attachment (the bytes are fetched separately)."""
+    return {
+        "id": attachment.id,
+        "kind": attachment.kind,
+        "filename": attachment.filename,
+        "content_type": attachment.content_type,
+        "size_bytes": attachment.size_bytes,
+        "sha256": attachment.sha256,
+        "url": f"/api/attachments/{attachment.id}",
+    }
+
+
+# --- variants --------------------------------------------------------------------------
+
+
+def _initial_variant_status(sha256: str, content_type: str) -> str:
+    if content_type not in IMAGE_TYPES or not thumbnails.available():
+        return "none"
+    if all(variant_path(sha256, variant).exists() for variant in VARIANTS):
+        return "ready"
+    return "pending"
+
+
+def _set_variant_status(sha256: str, status: str) -> None:
+    with Session(engine) as session:
+        session.execute(
+            update(Attachment)
+            .where(Attachment.sha256 == sha256, Attachment.variant_status == "pending")
+            .values(variant_status=status)
+        )
+        session.commit()
+
+
+class VariantPool:
+    """
+    Renders image variants in worker processes, so decoding and resizing camera JPEGs
+    neither holds the GIL nor delays requests. Workers are spawned (not forked) on first
+    use; that is safe next to the server's threads and behaves the same on Windows.
+    """
+
+    def __init__(self) -> None:
+        self.settings = get_settings()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Hashes being rendered right now; a duplicate upload waits for the same job.
+        self._pending: dict[str, Future] = {}
+        # submit() runs on request threads and _finished() on the executor's callback thread.
+        self._lock = threading.Lock()
+
+    def submit(self, sha256: str) -> Future:
+        targets = []
+        sizes = {"thumb": self.settings.attachment_thumbnail_px, "web": self.settings.attachment_web_px}
+        for variant, size in sizes.items():
+            path = variant_path(sha256, variant)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            targets.append((str(path), size, self.settings.attachment_jpeg_quality))
+        with self._lock:
+            future = self._pending.get(sha256)
+            if future is not None:
+                return future
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=max(1, self.settings.attachment_workers),
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            future = self._executor.submit(thumbnails.render_variants, str(object_path(sha256)), targets)
+            self._pending[sha256] = future
+        # Outside the lock: an already finished future runs the callback right here.
+        future.add_done_callback(lambda done: self._finished(sha256, done))
+        return future
+
+    def _finished(self, sha256: str, future: Future) -> None:
+        with self._lock:
+            if self._pending.get(sha256) is future:
+                del self._pending[sha256]
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            logger.warning("Could not render variants for %s: %s", sha256, error)
+        try:
+            _set_variant_status(sha256, "failed" if error else "ready")
+        except Exception:
+            logger.exception("Could not record variant status for %s", sha256)
+
+    def resume(self, session: Session) -> None:
+        """Re-queue variants left pending by a previous run."""
+        pending = session.exec(select(Attachment.sha256).where(Attachment.variant_status == "pending")).all()
+        for sha256 in set(pending):
+            self.submit(sha256)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+variant_pool = VariantPool()
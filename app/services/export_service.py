@@ -0,0 +1,73 @@
+"""
+Streaming ticket exports. Rows are read as plain tuples through a server-side cursor
+(`stream_results` + `yield_per`) and written out one partition at a time, so memory
+use does not depend on how many tickets are exported.
+"""
+import csv
+import heapq
+import io
+import itertools
+import json
+import operator
+from typing import Iterator, Optional
+
+from sqlalchemy import Date, DateTime, String, type_coerce
+from sqlmodel import select
+
+from app.database import engine
+from app.models import Ticket
+from app.schemas import TicketFilters
+from app.services import archive_service
+from app.services.ticket_service import filter_tickets
+
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+# Timestamps are passed through as SQLite stores them ("YYYY-MM-DD HH:MM:SS.ffffff")
+# instead of being parsed into datetime objects and formatted again.
+EXPORT_COLUMNS = [
+    type_coerce(column, String).label(column.name) if isinstance(column.type, (DateTime, Date)) else column
+    for column in Ticket.__table__.columns
+]
+_ORDER_KEY = operator.itemgetter(
+    *([column.name for column in EXPORT_COLUMNS].index(name) for name in ("created_at", "id"))
+)
+# Rows fetched from SQLite and written to the response per chunk.
+PARTITION_SIZE = 2000
+
+
+def stream_tickets(filters: Optional[TicketFilters], fmt: str) -> Iterator[str]:
+    """Yield the export in chunks; opens its own connection for the life of the stream."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'; expected one of {', '.join(EXPORT_FORMATS)}")
+    names = [column.name for column in EXPORT_COLUMNS]
+    query = filter_tickets(select(*EXPORT_COLUMNS), filters).order_by(Ticket.created_at, Ticket.id)
+
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(names)
+        for rows in _partitions(query, filters):
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+    else:
+        dumps = json.JSONEncoder(separators=(",", ":")).encode
+        for rows in _partitions(query, filters):
+            yield "".join(dumps(dict(zip(names, row))) + "\n" for row in rows)
+
+
+def _partitions(query, filters: Optional[TicketFilters]) -> Iterator[list]:
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=PARTITION_SIZE).execute(query)
+        archived = archive_service.stream_archived_rows(query, filters, PARTITION_SIZE)
+        first = next(archived, None)
+        if first is None:
+            yield from result.partitions()
+            return
+        # Old tickets that are not yet archivable stay live, so both streams span the
+        # same dates and have to be merged.
+        rows = heapq.merge(result, itertools.chain([first], archived), key=_ORDER_KEY)
+        while batch := list(itertools.islice(rows, PARTITION_SIZE)):
+            yield batch
@@ -0,0 +1,254 @@
+"""
+Incremental parsers for weight indicator output formats.
+
+Each parser owns one reusable `bytearray`; `feed()` appends whatever the port
+returned, scans it in place for complete frames and drops the consumed prefix.
+Frames are located with `bytearray.find` and compiled patterns matched with
+`pos`/`endpos`, so parsing never walks or copies the buffer byte by byte.
+"""
+import codecs
+import re
+from typing import NamedTuple, Optional
+
+from app.services.weight_history import STATUS_MOTION, STATUS_OK, STATUS_OVERLOAD
+
+STX = 0x02
+ETX = 0x03
+CR = 0x0D
+LF = 0x0A
+
+UNIT_TO_KG = {b"kg": 1.0, b"t": 1000.0, b"lb": 0.45359237, b"g": 0.001}
+
+# Sign, digits, optional unit. The weight is the last number on the frame (preferring
+# one followed by a unit) so leading ID/status digits are not mistaken for it.
+_WEIGHT_FIELD = re.compile(rb"([+-])?\s*(\d+(?:\.\d*)?|\.\d+)(?![\d.])\s*(?:(kg|lb|t|g)(?![a-z]))?", re.I)
+_STATUS_FIELD = re.compile(rb"(?<![A-Za-z])(ST|US|MO|OL|OV)(?![A-Za-z])")
+_MOTION_TOKENS = {b"US", b"MO"}
+_OVERLOAD_TOKENS = {b"OL", b"OV"}
+
+
+class WeightFrame(NamedTuple):
+    weight_kg: float
+    status: int = STATUS_OK
+
+
+def parse_ascii_fields(buffer: bytearray, start: int, end: int) -> Optional[WeightFrame]:
+    """Decode the weight, unit and status tokens of an ASCII frame in buffer[start:end]."""
+    weight_match = None
+    for match in _WEIGHT_FIELD.finditer(buffer, start, end):
+        if weight_match is None or match.group(3) or not weight_match.group(3):
+            weight_match = match
+    if weight_match is None:
+        return None
+
+    sign, number, unit = weight_match.groups()
+    weight = float(number) * UNIT_TO_KG[unit.lower() if unit else b"kg"]
+    if sign == b"-" and weight:
+        weight = -weight
+
+    status = STATUS_OK
+    for token in _STATUS_FIELD.findall(buffer, start, weight_match.start()):
+        if token in _MOTION_TOKENS:
+            status = STATUS_MOTION
+        elif token in _OVERLOAD_TOKENS:
+            status = STATUS_OVERLOAD
+    return WeightFrame(weight, status)
+
+
+class IndicatorParser:
+    """Base class for incremental frame parsers."""
+
+    name = ""
+    # Bytes to write to the indicator to request a reading (request/response protocols).
+    poll_command: Optional[bytes] = None
+    # Drop the buffer if this much arrives without a complete frame (wrong protocol/baud).
+    max_buffer = 4096
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+        self.errors = 0
+
+    def feed(self, data: bytes) -> list[WeightFrame]:
+        buffer = self._buffer
+        buffer += data
+        frames: list[WeightFrame] = []
+        consumed = self._parse(buffer, frames)
+        if consumed:
+            del buffer[:consumed]
+        if len(buffer) > self.max_buffer:
+            self.errors += 1
+            buffer.clear()
+        return frames
+
+    def reset(self) -> None:
+        self._buffer.clear()
+
+    def _parse(self, buffer: bytearray, frames: list[WeightFrame]) -> int:
+        """Append complete frames found in `buffer`; return the number of bytes consumed."""
+        raise NotImplementedError
+
+
+class ContinuousParser(IndicatorParser):
+    """Line-oriented ASCII output (CR and/or LF terminated), e.g. `ST,GS,+001234.5kg`."""
+
+    name = "continuous"
+
+    def _parse(self, buffer: bytearray, frames: list[WeightFrame]) -> int:
+        start = 0
+        while True:
+            end = buffer.find(LF, start)
+            cr = buffer.find(CR, start, end if end >= 0 else len(buffer))
+            if cr >= 0:
+                end = cr
+            if end < 0:
+                return start
+            if end > start:
+                frame = parse_ascii_fields(buffer, start, end)
+                if frame is None:
+                    self.errors += 1
+                else:
+                    frames.append(frame)
+            start = end + 1
+
+
+class PolledParser(ContinuousParser):
+    """Request/response indicators: a command is written, one ASCII line comes back."""
+
+    name = "polled"
+
+    def __init__(self, poll_command: Optional[str] = None) -> None:
+        super().__init__()
+        self.poll_command = decode_command(poll_command or "W\\r\\n")
+
+
+class StxEtxParser(IndicatorParser):
+    """ASCII payload framed by STX ... ETX (a CR is also accepted as terminator)."""
+
+    name = "stx_etx"
+
+    def _parse(self, buffer: bytearray, frames: list[WeightFrame]) -> int:
+        start = 0
+        while True:
+            stx = buffer.find(STX, start)
+            if stx < 0:
+                return len(buffer)
+            end = buffer.find(ETX, stx + 1)
+            cr = buffer.find(CR, stx + 1, end if end >= 0 else len(buffer))
+            if cr >= 0:
+                end = cr
+            if end < 0:
+                return stx
+            frame = parse_ascii_fields(buffer, stx + 1, end)
+            if frame is None:
+                self.errors += 1
+            else:
+                frames.append(frame)
+            start = end + 1
+
+
+class FixedWidthParser(IndicatorParser):
+    """
+    Fixed-length frames with a sync byte and no terminator, as streamed by the common
+    XK3190-style indicators: `=` followed by seven characters with the digits reversed
+    (`=5.43210` is 01234.5 kg).
+    """
+
+    name = "fixed"
+
+    def __init__(self, frame_length: Optional[int] = None, sync: bytes = b"=", reverse: bool = True) -> None:
+        super().__init__()
+        self.frame_length = frame_length or 8
+        self.sync = sync[0]
+        self.reverse = reverse
+
+    def _parse(self, buffer: bytearray, frames: list[WeightFrame]) -> int:
+        start = 0
+        length = self.frame_length
+        while True:
+            sync = buffer.find(self.sync, start)
+            if sync < 0:
+                return len(buffer)
+            if sync + length > len(buffer):
+                return sync
+            body_start, body_end = sync + 1, sync + length
+            if self.reverse:
+                body = bytearray(buffer[body_start:body_end])
+                body.reverse()
+                frame = parse_ascii_fields(body, 0, len(body))
+            else:
+                frame = parse_ascii_fields(buffer, body_start, body_end)
+            if frame is None:
+                self.errors += 1
+                start = sync + 1
+                continue
+            frames.append(frame)
+            start = body_end
+
+
+class ToledoParser(IndicatorParser):
+    """
+    Mettler Toledo continuous output: STX, status bytes SWA/SWB/SWC, six weight digits,
+    six tare digits, CR. Decimal position comes from SWA; sign, overload, motion and
+    unit from SWB.
+    """
+
+    name = "toledo"
+    frame_length = 17
+    _DECIMALS = {0: 100.0, 1: 10.0, 2: 1.0, 3: 0.1, 4: 0.01, 5: 0.001, 6: 0.0001, 7: 0.00001}
+    _DIGITS = re.compile(rb" *(\d+)")
+
+    def _parse(self, buffer: bytearray, frames: list[WeightFrame]) -> int:
+        start = 0
+        length = self.frame_length
+        while True:
+            stx = buffer.find(STX, start)
+            if stx < 0:
+                return len(buffer)
+            if stx + length > len(buffer):
+                return stx
+            if buffer[stx + length - 1] != CR:
+                self.errors += 1
+                start = stx + 1
+                continue
+            swa, swb = buffer[stx + 1], buffer[stx + 2]
+            digits = self._DIGITS.fullmatch(buffer, stx + 4, stx + 10)
+            if digits is None:
+                self.errors += 1
+                start = stx + 1
+                continue
+            weight = int(digits.group(1)) * self._DECIMALS[swa & 0x07]
+            if not swb & 0x10:
+                weight *= UNIT_TO_KG[b"lb"]
+            if swb & 0x02:
+                weight = -weight
+            if swb & 0x04:
+                status = STATUS_OVERLOAD
+            elif swb & 0x08:
+                status = STATUS_MOTION
+            else:
+                status = STATUS_OK
+            frames.append(WeightFrame(round(weight, 6), status))
+            start = stx + length
+
+
+PARSERS: dict[str, type[IndicatorParser]] = {
+    parser.name: parser
+    for parser in (ContinuousParser, FixedWidthParser, StxEtxParser, ToledoParser, PolledParser)
+}
+
+
+def decode_command(command: str) -> bytes:
+    """Turn a settings string such as `W\\r\\n` or `\\x05` into raw bytes."""
+    return codecs.decode(command, "unicode_escape").encode("latin-1")
+
+
+def create_parser(
+    protocol: str, frame_length: Optional[int] = None, poll_command: Optional[str] = None
+) -> IndicatorParser:
+    if protocol not in PARSERS:
+        raise ValueError(f"Unknown indicator protocol '{protocol}'; expected one of {', '.join(PARSERS)}")
+    if protocol == FixedWidthParser.name:
+        return FixedWidthParser(frame_length=frame_length)
+    if protocol == PolledParser.name:
+        return PolledParser(poll_command=poll_command)
+    return PARSERS[protocol]()
@@ -0,0 +1,65 @@
+import asyncio
+import time
+from typing import Optional
+
+
+class LoopLagMonitor:
+    """
+    Measures event-loop stalls. A background task sleeps for `interval` seconds and
+    records how late it wakes up; any lateness is time the loop spent blocked in
+    synchronous code (DB calls, file I/O, CPU work) instead of serving requests.
+    """
+
+    def __init__(self, interval: float = 0.05, stall_threshold: float = 0.1) -> None:
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self._task: Optional[asyncio.Task] = None
+        self.reset()
+
+    def reset(self) -> None:
+        self.samples = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.stalled_seconds = 0.0
+
+    def start(self) -> None:
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.record(time.perf_counter() - started - self.interval)
+
+    def record(self, lag: float) -> None:
+        lag = max(0.0, lag)
+        self.samples += 1
+        self.total_lag += lag
+        self.max_lag = max(self.max_lag, lag)
+        if lag >= self.stall_threshold:
+            self.stalls += 1
+            self.stalled_seconds += lag
+
+    def stats(self) -> dict:
+        return {
+            "samples": self.samples,
+            "mean_lag_ms": round(self.total_lag / self.samples * 1000, 3) if self.samples else 0.0,
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+            "stalls": self.stalls,
+            "stalled_ms": round(self.stalled_seconds * 1000, 3),
+        }
+
+
+loop_monitor = LoopLagMonitor()
@@ -0,0 +1,98 @@
+import asyncio
+import importlib
+import logging
+from typing import TYPE_CHECKING, Optional
+
+from app.config import get_settings
+from app.database import run_maintenance
+from app.services.archive_service import run_archive
+from app.services.sync_service import sync_service
+
+if TYPE_CHECKING:
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+logger = logging.getLogger("maintenance")
+
+SCHEDULER_MODULE = "apscheduler.schedulers.asyncio"
+
+
+class MaintenanceService:
+    """
+    Periodic housekeeping jobs. The scheduler lives on the event loop; plain functions
+    such as `run_maintenance` are executed in its thread pool, off the loop.
+    """
+
+    def __init__(self) -> None:
+        self.settings = get_settings()
+        self._scheduler: Optional["AsyncIOScheduler"] = None
+        self._start_task: Optional[asyncio.Task] = None
+
+    def start_deferred(self) -> None:
+        """`start()` in the background, importing APScheduler on a worker thread meanwhile."""
+        if self._start_task is None:
+            self._start_task = asyncio.get_running_loop().create_task(self._start_when_imported())
+
+    async def _start_when_imported(self) -> None:
+        await asyncio.to_thread(importlib.import_module, SCHEDULER_MODULE)
+        self.start()
+
+    def start(self) -> None:
+        if self._scheduler is not None:
+            return
+        self._scheduler = importlib.import_module(SCHEDULER_MODULE).AsyncIOScheduler()
+        interval = self.settings.db_maintenance_interval_seconds
+        if interval > 0:
+            self._scheduler.add_job(
+                self._checkpoint, "interval", seconds=interval, id="sqlite-maintenance", coalesce=True, max_instances=1
+            )
+        if self.settings.archive_after_days > 0 and self.settings.archive_interval_seconds > 0:
+            self._scheduler.add_job(
+                self._archive,
+                "interval",
+                seconds=self.settings.archive_interval_seconds,
+                id="ticket-archive",
+                coalesce=True,
+                max_instances=1,
+            )
+        if self.settings.sync_sent_retention_days > 0 and self.settings.sync_prune_interval_seconds > 0:
+            self._scheduler.add_job(
+                self._prune,
+                "interval",
+                seconds=self.settings.sync_prune_interval_seconds,
+                id="sync-queue-prune",
+                coalesce=True,
+                max_instances=1,
+            )
+        self._scheduler.start()
+
+    def shutdown(self) -> None:
+        if self._start_task is not None:
+            self._start_task.cancel()
+            self._start_task = None
+        if self._scheduler is None:
+            return
+        self._scheduler.shutdown(wait=True)
+        self._scheduler = None
+        # Leave a compact database file behind on a clean exit.
+        self._checkpoint()
+
+    def _archive(self) -> None:
+        try:
+            run_archive()
+        except Exception:
+            logger.exception("Ticket archiving failed")
+
+    def _prune(self) -> None:
+        try:
+            sync_service.run_prune()
+        except Exception:
+            logger.exception("Sync queue pruning failed")
+
+    def _checkpoint(self) -> None:
+        try:
+            run_maintenance()
+        except Exception:
+            logger.exception("SQLite maintenance failed")
+
+
+maintenance_service = MaintenanceService()
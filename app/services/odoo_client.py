@@ -1,30 +1,149 @@
-import httpx
+import asyncio
+import time
+from typing import TYPE_CHECKING, Optional
 
 from app.config import get_settings
 
+if TYPE_CHECKING:
+    import httpx
+
+
+class RateLimiter:
+    """Token bucket allowing `rate` requests per second with bursts of `burst` (rate 0 = unlimited)."""
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._updated = time.monotonic()
+                self._tokens = 1
+            self._tokens -= 1
+
+
+class BulkNotSupported(Exception):
+    """The Odoo deployment does not expose the bulk ticket endpoint."""
+
 
 class OdooClient:
     """
     Minimal REST client for Odoo. This assumes an HTTP endpoint is exposed for
-    weighbridge tickets. Adjust the endpoint path in `send_ticket` to match the
-    Odoo deployment.
+    weighbridge tickets. Adjust the endpoint paths below to match the Odoo deployment.
+
+    The bulk endpoint receives `{"tickets": [...]}` and must answer with
+    `{"results": [...]}`, one entry per ticket in request order: either
+    `{"external_id": ...}` or `{"error": "..."}`.
+
+    One pooled `httpx.AsyncClient` is kept open between sends (keep-alive, so TCP/TLS
+    setup is paid once per connection). At most `odoo_max_concurrency` requests are in
+    flight and `odoo_rate_limit_per_second` caps the request rate.
     """
 
+    tickets_path = "/api/weighbridge/tickets"
+    bulk_path = "/api/weighbridge/tickets/bulk"
+    # After the bulk endpoint is found missing, probe it again this often.
+    bulk_recheck_seconds = 3600
+
     def __init__(self) -> None:
         self.settings = get_settings()
+        # None until the first bulk call tells us whether the endpoint exists.
+        self.bulk_supported: bool | None = None
+        self._bulk_checked_at = 0.0
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._slots = asyncio.Semaphore(max(1, self.settings.odoo_max_concurrency))
+        self._rate = RateLimiter(self.settings.odoo_rate_limit_per_second, self.settings.odoo_max_concurrency)
 
-    async def send_ticket(self, payload: dict) -> dict:
-        if not self.settings.odoo_base_url or not self.settings.odoo_api_key:
+    def open(self, transport: Optional["httpx.AsyncBaseTransport"] = None) -> None:
+        """Create the pooled client; `transport` replaces the network (benchmarks, fakes)."""
+        if self._client is not None and not self._client.is_closed:
+            return
+        # Imported on the first send: httpx is one of the slowest imports at startup.
+        import httpx
+
+        self._client = httpx.AsyncClient(
+            transport=transport,
+            timeout=self.settings.odoo_timeout_seconds,
+            limits=httpx.Limits(
+                max_connections=max(1, self.settings.odoo_max_concurrency),
+                max_keepalive_connections=max(1, self.settings.odoo_max_concurrency),
+                keepalive_expiry=self.settings.odoo_keepalive_seconds,
+            ),
+        )
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def bulk_available(self) -> bool:
+        if self.bulk_supported is False:
+            return time.monotonic() - self._bulk_checked_at >= self.bulk_recheck_seconds
+        return True
+
+    async def send_ticket(self, payload: dict, idempotency_key: Optional[str] = None) -> dict:
+        """`idempotency_key` goes out as the `Idempotency-Key` header, so a retried send is recognised."""
+        headers = {"Idempotency-Key": idempotency_key} if idempotency_key else None
+        response = await self._post(self.tickets_path, payload, headers=headers)
+        response.raise_for_status()
+        return response.json()
+
+    async def send_tickets(self, payloads: list[dict]) -> list[dict]:
+        """
+        Send several tickets in one request; returns per-ticket results in order. A batch
+        has no single idempotency key: each ticket carries its own `idempotency_key` field.
+        """
+        response = await self._post(
+            self.bulk_path, {"tickets": payloads}, timeout=self.settings.odoo_timeout_seconds + len(payloads)
+        )
+        self._bulk_checked_at = time.monotonic()
+        if response.status_code in (404, 405, 501):
+            self.bulk_supported = False
+            raise BulkNotSupported(f"Bulk endpoint returned HTTP {response.status_code}")
+        response.raise_for_status()
+        self.bulk_supported = True
+
+        results = response.json().get("results")
+        if not isinstance(results, list):
+            raise ValueError("Bulk response is missing a results list")
+        return results
+
+    async def _post(
+        self, path: str, body: dict, timeout: Optional[float] = None, headers: Optional[dict] = None
+    ) -> "httpx.Response":
+        url = self._url(path)
+        self.open()
+        async with self._slots:
+            await self._rate.acquire()
+            return await self._client.post(
+                url,
+                json=body,
+                headers={**self._headers(), **(headers or {})},
+                timeout=timeout or self.settings.odoo_timeout_seconds,
+            )
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.settings.odoo_base_url and self.settings.odoo_api_key)
+
+    def _url(self, path: str) -> str:
+        if not self.configured:
             raise RuntimeError("Odoo connection is not configured")
+        return f"{self.settings.odoo_base_url.rstrip('/')}{path}"
 
-        url = f"{self.settings.odoo_base_url.rstrip('/')}/api/weighbridge/tickets"
-        headers = {
+    def _headers(self) -> dict:
+        return {
             "Authorization": f"Bearer {self.settings.odoo_api_key}",
             "X-ODOO-DB": self.settings.odoo_db or "",
             "X-ODOO-USER": self.settings.odoo_username or "",
         }
-
-        async with httpx.AsyncClient(timeout=15) as client:
-            response = await client.post(url, json=payload, headers=headers)
-            response.raise_for_status()
-            return response.json()
@@ -0,0 +1,153 @@
+"""
+In-memory index of open (not yet finalized) tickets keyed by normalized vehicle plate.
+
+Plates are stored in a character trie, so exact lookups cost one step per character
+and autocomplete walks only the subtree under the typed prefix. `ticket_service`
+updates the index after each commit; `rebuild` reloads it from the database at startup.
+"""
+import threading
+from datetime import datetime
+from typing import Iterable, NamedTuple, Optional
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from app.models import Ticket
+
+OPEN_STATUSES = ("weigh_in", "weigh_out")
+
+
+def normalize_plate(plate: str) -> str:
+    """Upper-case and drop spaces/dashes so 'abc-123 xy' and 'ABC123XY' match."""
+    return "".join(char for char in plate.upper() if char.isalnum())
+
+
+def backfill_plate_keys(target: Engine) -> int:
+    """Fill `Ticket.plate_key` for tickets written before the column existed."""
+    with target.begin() as conn:
+        rows = conn.execute(select(Ticket.id, Ticket.vehicle_plate).where(Ticket.plate_key.is_(None))).all()
+        if rows:
+            conn.execute(
+                update(Ticket.__table__).where(Ticket.__table__.c.id == bindparam("ticket_id")),
+                [{"ticket_id": ticket_id, "plate_key": normalize_plate(plate)} for ticket_id, plate in rows],
+            )
+    return len(rows)
+
+
+class OpenTicket(NamedTuple):
+    id: int
+    vehicle_plate: str
+    status: str
+    lane_id: int
+    direction: str
+    partner_name: str
+    product_name: str
+    gross_kg: float
+    weight_in_time: Optional[datetime]
+
+
+class _Node:
+    __slots__ = ("children", "tickets")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _Node] = {}
+        self.tickets: dict[int, OpenTicket] = {}
+
+
+class PlateIndex:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._root = _Node()
+        # ticket id -> normalized plate, so updates find the entry even if the plate changed.
+        self._plates: dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._plates)
+
+    def rebuild(self, session: Session) -> None:
+        tickets = session.exec(select(Ticket).where(Ticket.status.in_(OPEN_STATUSES))).all()
+        with self._lock:
+            self._root = _Node()
+            self._plates = {}
+            for ticket in tickets:
+                self._insert(ticket)
+
+    def update(self, ticket: Ticket) -> None:
+        """Add, refresh or drop `ticket` according to its current status."""
+        with self._lock:
+            self._remove(ticket.id)
+            if ticket.status in OPEN_STATUSES:
+                self._insert(ticket)
+
+    def lookup(self, plate: str, status: Optional[str] = None) -> list[OpenTicket]:
+        """Open tickets whose normalized plate equals `plate`."""
+        with self._lock:
+            node = self._find(normalize_plate(plate))
+            tickets = list(node.tickets.values()) if node else []
+        return [ticket for ticket in tickets if status is None or ticket.status == status]
+
+    def search(self, prefix: str, limit: int = 20) -> list[OpenTicket]:
+        """Open tickets whose normalized plate starts with `prefix`, shortest plates first."""
+        with self._lock:
+            node = self._find(normalize_plate(prefix))
+            return list(self._collect(node, limit)) if node else []
+
+    def _insert(self, ticket: Ticket) -> None:
+        key = normalize_plate(ticket.vehicle_plate)
+        node = self._root
+        for char in key:
+            node = node.children.setdefault(char, _Node())
+        node.tickets[ticket.id] = OpenTicket(
+            id=ticket.id,
+            vehicle_plate=ticket.vehicle_plate,
+            status=ticket.status,
+            lane_id=ticket.lane_id,
+            direction=ticket.direction,
+            partner_name=ticket.partner_name,
+            product_name=ticket.product_name,
+            gross_kg=ticket.gross_kg,
+            weight_in_time=ticket.weight_in_time,
+        )
+        self._plates[ticket.id] = key
+
+    def _remove(self, ticket_id: int) -> None:
+        key = self._plates.pop(ticket_id, None)
+        if key is None:
+            return
+        path = [self._root]
+        for char in key:
+            path.append(path[-1].children[char])
+        path[-1].tickets.pop(ticket_id, None)
+        # Prune branches that no longer lead to any ticket.
+        for depth in range(len(key), 0, -1):
+            node = path[depth]
+            if node.tickets or node.children:
+                break
+            del path[depth - 1].children[key[depth - 1]]
+
+    def _find(self, key: str) -> Optional[_Node]:
+        node = self._root
+        for char in key:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def _collect(self, node: _Node, limit: int) -> Iterable[OpenTicket]:
+        # Breadth-first, so exact and near-exact plates come before longer ones.
+        level = [node]
+        found = 0
+        while level and found < limit:
+            next_level = []
+            for current in level:
+                for ticket in current.tickets.values():
+                    yield ticket
+                    found += 1
+                    if found >= limit:
+                        return
+                next_level.extend(current.children.values())
+            level = next_level
+
+
+plate_index = PlateIndex()
@@ -0,0 +1,153 @@
+"""
+Daily production summaries. `DailySummary` holds counts and net weight aggregates per
+(day, product, partner, direction); `record_ticket` folds each finalized ticket in
+within the finalize transaction, so reports never scan the ticket table.
+
+Backfill or repair the table from existing tickets with:
+
+    python -m app.services.report_service rebuild
+"""
+import argparse
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy import delete, insert, literal
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, func, select
+
+from app.models import DailySummary, Ticket
+
+GROUP_COLUMNS = {
+    "day": DailySummary.day,
+    "product": DailySummary.product_name,
+    "partner": DailySummary.partner_name,
+    "direction": DailySummary.direction,
+}
+
+
+def summary_day(ticket: Ticket) -> date:
+    """Tickets count towards the (UTC) day they left the bridge."""
+    return (ticket.weight_out_time or ticket.weight_in_time or ticket.created_at).date()
+
+
+def record_ticket(session: Session, ticket: Ticket) -> None:
+    """Add a finalized ticket to its summary row; runs in the caller's transaction."""
+    now = datetime.utcnow()
+    upsert = sqlite_insert(DailySummary).values(
+        day=summary_day(ticket),
+        product_name=ticket.product_name,
+        partner_name=ticket.partner_name,
+        direction=ticket.direction,
+        ticket_count=1,
+        net_kg_total=ticket.net_kg,
+        net_kg_min=ticket.net_kg,
+        net_kg_max=ticket.net_kg,
+        updated_at=now,
+    )
+    # Two-argument min()/max() are SQLite's scalar functions.
+    session.exec(
+        upsert.on_conflict_do_update(
+            index_elements=[
+                DailySummary.day,
+                DailySummary.product_name,
+                DailySummary.partner_name,
+                DailySummary.direction,
+            ],
+            set_={
+                "ticket_count": DailySummary.ticket_count + 1,
+                "net_kg_total": DailySummary.net_kg_total + upsert.excluded.net_kg_total,
+                "net_kg_min": func.min(DailySummary.net_kg_min, upsert.excluded.net_kg_min),
+                "net_kg_max": func.max(DailySummary.net_kg_max, upsert.excluded.net_kg_max),
+                "updated_at": now,
+            },
+        )
+    )
+
+
+def summarize(
+    session: Session,
+    date_from: date,
+    date_to: date,
+    group_by: list[str],
+    product: Optional[str] = None,
+    partner: Optional[str] = None,
+    direction: Optional[str] = None,
+) -> list[dict]:
+    """Roll summary rows in [date_from, date_to] up to the requested grouping."""
+    unknown = set(group_by) - set(GROUP_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown group_by field(s) {', '.join(sorted(unknown))}; expected {', '.join(GROUP_COLUMNS)}")
+    columns = [GROUP_COLUMNS[name] for name in group_by]
+    query = select(
+        *columns,
+        func.sum(DailySummary.ticket_count).label("ticket_count"),
+        func.sum(DailySummary.net_kg_total).label("net_kg_total"),
+        func.min(DailySummary.net_kg_min).label("net_kg_min"),
+        func.max(DailySummary.net_kg_max).label("net_kg_max"),
+    ).where(DailySummary.day >= date_from, DailySummary.day <= date_to)
+    if product:
+        query = query.where(DailySummary.product_name == product)
+    if partner:
+        query = query.where(DailySummary.partner_name == partner)
+    if direction:
+        query = query.where(DailySummary.direction == direction)
+    if columns:
+        query = query.group_by(*columns).order_by(*columns)
+    rows = session.exec(query).all()
+    return [dict(row._mapping) for row in rows if row.ticket_count]
+
+
+def rebuild(session: Session) -> int:
+    """Recompute the whole summary table from finalized tickets; returns tickets counted."""
+    day = func.date(func.coalesce(Ticket.weight_out_time, Ticket.weight_in_time, Ticket.created_at))
+    grouped = (
+        select(
+            day,
+            Ticket.product_name,
+            Ticket.partner_name,
+            Ticket.direction,
+            func.count(),
+            func.sum(Ticket.net_kg),
+            func.min(Ticket.net_kg),
+            func.max(Ticket.net_kg),
+            literal(datetime.utcnow(), type_=DailySummary.__table__.c.updated_at.type),
+        )
+        .where(Ticket.status == "finalized")
+        .group_by(day, Ticket.product_name, Ticket.partner_name, Ticket.direction)
+    )
+    session.exec(delete(DailySummary))
+    session.exec(
+        insert(DailySummary).from_select(
+            [
+                "day",
+                "product_name",
+                "partner_name",
+                "direction",
+                "ticket_count",
+                "net_kg_total",
+                "net_kg_min",
+                "net_kg_max",
+                "updated_at",
+            ],
+            grouped,
+        )
+    )
+    session.commit()
+    return session.exec(select(func.coalesce(func.sum(DailySummary.ticket_count), 0))).one()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Daily summary maintenance")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+
+    from app.database import engine, init_db
+
+    init_db()
+    with Session(engine) as session:
+        count = rebuild(session)
+    print(f"Rebuilt daily summaries from {count} finalized tickets")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Raw serial traffic capture files.
+
+A capture is an append-only binary file: a header (magic + start time as a double),
+then one record per chunk read from the port: `<uint32 microseconds since previous
+chunk><uint16 length>` followed by the raw bytes. Replaying a capture feeds those
+bytes back through the same parser path a live port uses.
+"""
+import re
+import struct
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+from app.config import get_settings
+
+MAGIC = b"WBCAP1\n"
+_HEADER = struct.Struct("<d")
+_RECORD = struct.Struct("<IH")
+_MAX_DELTA_US = 0xFFFFFFFF
+_MAX_CHUNK = 0xFFFF
+_SAFE_NAME = re.compile(r"^[\w.-]+\.wbcap$")
+
+# Buffered data is flushed at least this often so a crash loses little traffic.
+FLUSH_INTERVAL_SECONDS = 1.0
+
+
+def captures_dir() -> Path:
+    path = Path(get_settings().data_dir) / "captures"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def resolve_capture(name: str) -> Path:
+    """Map a capture file name to its path, refusing anything outside the captures dir."""
+    if not _SAFE_NAME.match(name):
+        raise ValueError(f"Invalid capture file name '{name}'")
+    path = captures_dir() / name
+    if not path.is_file():
+        raise ValueError(f"Capture file '{name}' not found")
+    return path
+
+
+class CaptureWriter:
+    def __init__(self, lane_id: int) -> None:
+        stamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+        self.path = captures_dir() / f"lane{lane_id}-{stamp}.wbcap"
+        self._file: BinaryIO = open(self.path, "ab")
+        self._lock = threading.Lock()
+        self._last = time.monotonic()
+        self._last_flush = self._last
+        self._file.write(MAGIC + _HEADER.pack(time.time()))
+
+    def write(self, chunk: bytes) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if self._file.closed:
+                return
+            delta = min(int((now - self._last) * 1_000_000), _MAX_DELTA_US)
+            self._last = now
+            for start in range(0, len(chunk), _MAX_CHUNK):
+                part = chunk[start : start + _MAX_CHUNK]
+                self._file.write(_RECORD.pack(delta, len(part)))
+                self._file.write(part)
+                delta = 0
+            if now - self._last_flush >= FLUSH_INTERVAL_SECONDS:
+                self._file.flush()
+                self._last_flush = now
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+def read_capture(path: Path) -> Iterator[tuple[float, bytes]]:
+    """Yield (seconds since previous chunk, raw bytes) for every record in a capture."""
+    with open(path, "rb") as handle:
+        if handle.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path.name} is not a weighbridge capture file")
+        handle.read(_HEADER.size)
+        while True:
+            head = handle.read(_RECORD.size)
+            if len(head) < _RECORD.size:
+                return
+            delta_us, length = _RECORD.unpack(head)
+            chunk = handle.read(length)
+            if len(chunk) < length:
+                return  # truncated tail from an unclean shutdown
+            yield delta_us / 1_000_000, chunk
+
+
+def list_captures() -> list[dict]:
+    captures = []
+    for path in sorted(captures_dir().glob("*.wbcap")):
+        stat = path.stat()
+        captures.append(
+            {"name": path.name, "size_bytes": stat.st_size, "modified_at": datetime.utcfromtimestamp(stat.st_mtime)}
+        )
+    return captures
@@ -1,52 +1,143 @@
+import asyncio
+import logging
+import os
 import random
-import re
 import threading
 import time
+from concurrent.futures import Future
 from datetime import datetime
-from typing import Optional
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Optional
 
-import serial
+from sqlmodel import Session, or_, select
 
 from app.config import get_settings
-from app.schemas import SerialSettingsPayload, WeightReading
+from app.database import engine
+from app.metrics import metrics
+from app.models import SerialSettings
+from app.schemas import SerialSettingsPayload, StabilityStats, WeightReading
+from app.services.indicator_protocols import IndicatorParser, create_parser
+from app.services.serial_capture import CaptureWriter, read_capture, resolve_capture
+from app.services.stability import StabilityDetector
+from app.services.weight_broadcaster import WeightBroadcaster
+from app.services.weight_history import STATUS_OK, WeightHistory
 
+if TYPE_CHECKING:
+    import serial
 
-class SerialManager:
+logger = logging.getLogger("serial_manager")
+
+DEFAULT_LANE = 1
+READER_MODES = ("auto", "asyncio", "thread")
+
+FRAMES = metrics.counter("weighbridge_serial_frames_total", "Weight frames accepted, per lane.", ("lane",))
+PARSE_ERRORS = metrics.counter(
+    "weighbridge_serial_parse_errors_total", "Malformed or unrecognised indicator frames, per lane.", ("lane",)
+)
+READ_ERRORS = metrics.counter("weighbridge_serial_read_errors_total", "Failed serial port reads, per lane.", ("lane",))
+
+
+class LaneNotConnected(Exception):
+    """The lane has no port, simulator or replay running, so no weight can arrive."""
+
+
+class LaneReader:
     """
-    Manages serial (COM/RS232/USB-Serial) communication to read live weights.
-    A lightweight background thread keeps the latest reading cached for the API/UI.
+    Manages serial (COM/RS232/USB-Serial) communication to read live weights for one
+    weighbridge lane. The latest reading is cached for the API/UI and published to
+    streaming clients through `broadcaster`.
+
+    On POSIX, when an event loop is attached, the port is read non-blocking from the
+    loop itself (`loop.add_reader`), so frames reach asyncio consumers without a thread
+    hop. Otherwise a background thread blocks in `read()`. Every connect starts a new
+    generation; frames from an older generation are dropped, so nothing lands after
+    `disconnect()` returns.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, lane_id: int = DEFAULT_LANE, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        self.lane_id = lane_id
         self.settings = get_settings()
+        self.loop = loop
         self._config = SerialSettingsPayload(simulate=self.settings.allow_weight_simulation)
-        self._serial: Optional[serial.Serial] = None
+        self._serial: Optional["serial.Serial"] = None
+        self._parser: Optional[IndicatorParser] = None
+        self._capture: Optional[CaptureWriter] = None
         self._thread: Optional[threading.Thread] = None
         self._stop_event = threading.Event()
+        self._generation = 0
+        self._fd: Optional[int] = None
+        self._poll_handle: Optional[asyncio.TimerHandle] = None
         self._lock = threading.Lock()
         self._last_weight: Optional[float] = None
         self._last_weight_time: Optional[datetime] = None
         self._connected: bool = False
         self._source: str = "idle"
+        self.frames_received = 0
+        self._frames_metric = FRAMES.labels(lane_id)
+        self._parse_errors_metric = PARSE_ERRORS.labels(lane_id)
+        self._read_errors_metric = READ_ERRORS.labels(lane_id)
+        self.broadcaster = WeightBroadcaster()
+        self.history = WeightHistory(self.settings.weight_history_capacity)
+        self._stability = StabilityDetector(
+            window_seconds=self.settings.stable_window_seconds,
+            tolerance_kg=self.settings.stable_tolerance_kg,
+            filter=self.settings.stable_filter,
+            filter_size=self.settings.stable_filter_size,
+            min_samples=self.settings.stable_min_samples,
+        )
+        self._stable_changed = threading.Condition(self._lock)
+        # Serializes connect/disconnect on this lane without blocking readers of the cache.
+        self._control_lock = threading.RLock()
 
     def configure(self, payload: SerialSettingsPayload) -> None:
         with self._lock:
             self._config = payload
 
     def connect(self) -> None:
-        self.disconnect()
+        with self._control_lock:
+            self._connect()
+
+    def _connect(self) -> None:
+        self._disconnect()
         config = self._config
-        self._stop_event.clear()
+        stop_event = self._stop_event = threading.Event()
+        generation = self._generation
+
+        if config.replay_file:
+            path = resolve_capture(config.replay_file)
+            parser = self._parser = create_parser(config.protocol, config.frame_length, config.poll_command)
+            self._connected = False
+            self._source = "replay"
+            self._thread = threading.Thread(
+                target=self._replay_loop,
+                args=(parser, path, config.replay_speed, config.replay_loop, stop_event, generation),
+                name=f"lane-{self.lane_id}-replay",
+                daemon=True,
+            )
+            self._thread.start()
+            self._publish()
+            return
 
         if config.simulate:
             self._connected = False
             self._source = "simulated"
-            self._thread = threading.Thread(target=self._simulate_loop, daemon=True)
+            self._thread = threading.Thread(
+                target=self._simulate_loop,
+                args=(stop_event, generation),
+                name=f"lane-{self.lane_id}-simulator",
+                daemon=True,
+            )
             self._thread.start()
+            self._publish()
             return
 
         if not config.port:
             raise ValueError("Serial port is required to connect")
+        parser = self._parser = create_parser(config.protocol, config.frame_length, config.poll_command)
+        use_loop = self._use_event_loop()
+
+        # pyserial is only needed for real ports; importing it at startup is wasted time.
+        import serial
 
         try:
             self._serial = serial.Serial(
@@ -55,27 +146,60 @@ class SerialManager:
                 bytesize=config.bytesize,
                 parity=config.parity,
                 stopbits=config.stopbits,
-                timeout=self.settings.serial_read_timeout,
+                timeout=0 if use_loop else self.settings.serial_read_timeout,
             )
             self._connected = True
             self._source = "serial"
-            self._thread = threading.Thread(target=self._reader_loop, daemon=True)
-            self._thread.start()
+            capture = self._capture = CaptureWriter(self.lane_id) if config.capture else None
+            if use_loop:
+                self._call_in_loop(lambda: self._start_loop_reader(parser, capture, generation))
+            else:
+                self._thread = threading.Thread(
+                    target=self._reader_loop,
+                    args=(parser, capture, stop_event, generation),
+                    name=f"lane-{self.lane_id}-reader",
+                    daemon=True,
+                )
+                self._thread.start()
+            self._publish()
         except Exception as exc:  # serial may throw a variety of errors
             self._connected = False
+            if self._serial and self._serial.is_open:
+                self._serial.close()
             self._serial = None
+            if self._capture:
+                self._capture.close()
+                self._capture = None
             raise exc
 
     def disconnect(self) -> None:
+        with self._control_lock:
+            self._disconnect()
+
+    def _disconnect(self) -> None:
+        with self._lock:
+            # Anything still in flight from the old source is discarded from here on.
+            self._generation += 1
         self._stop_event.set()
-        if self._thread and self._thread.is_alive():
-            self._thread.join(timeout=0.5)
+        if self._fd is not None:
+            self._call_in_loop(self._stop_loop_reader)
+        if self._thread and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.settings.serial_read_timeout + 1.0)
+            if self._thread.is_alive():
+                logger.warning("Lane %s reader thread did not stop; closing port anyway", self.lane_id)
         if self._serial and self._serial.is_open:
             self._serial.close()
+        if self._capture:
+            self._capture.close()
         self._serial = None
+        self._capture = None
         self._connected = False
         self._thread = None
         self._source = "idle"
+        with self._stable_changed:
+            self._stability.reset()
+            self._stable_changed.notify_all()
+        self._publish()
 
     def get_reading(self) -> WeightReading:
         with self._lock:
@@ -84,45 +208,313 @@ class SerialManager:
                 captured_at=self._last_weight_time,
                 connected=self._connected,
                 source=self._source,
+                stable=self._stability.current(time.time()) is not None,
             )
 
-    def _reader_loop(self) -> None:
-        while not self._stop_event.is_set():
-            if not self._serial or not self._serial.is_open:
+    def wait_for_stable(self, timeout: Optional[float] = None) -> Optional[StabilityStats]:
+        """
+        Block until the live weight is stable and above `stable_min_weight_kg`.
+        Returns at once if the load has already settled and frames are still arriving,
+        or None on timeout. Raises LaneNotConnected if the lane is (or goes) idle while
+        waiting.
+        """
+        timeout = self.settings.stable_timeout_seconds if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        with self._stable_changed:
+            while True:
+                state = self._stability.current(time.time())
+                if state is not None and state.weight_kg > self.settings.stable_min_weight_kg:
+                    break
+                if self._source == "idle":
+                    raise LaneNotConnected(f"Lane {self.lane_id} is not connected")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._stable_changed.wait(remaining)
+
+        return StabilityStats(
+            weight_kg=state.weight_kg,
+            mean_kg=round(state.mean_kg, 3),
+            spread_kg=round(state.spread_kg, 3),
+            stddev_kg=round(state.stddev_kg, 3),
+            samples=state.samples,
+            window_seconds=round(state.window_seconds, 3),
+            waited_seconds=round(time.monotonic() - started, 3),
+            captured_at=datetime.utcfromtimestamp(state.sampled_at),
+        )
+
+    def _use_event_loop(self) -> bool:
+        mode = self.settings.serial_reader_mode
+        if mode not in READER_MODES:
+            raise ValueError(f"Unknown serial reader mode '{mode}'; expected one of {', '.join(READER_MODES)}")
+        if mode == "thread":
+            return False
+        available = os.name == "posix" and self.loop is not None and not self.loop.is_closed()
+        if mode == "asyncio" and not available:
+            raise RuntimeError("asyncio serial reader needs POSIX and a running event loop")
+        return available
+
+    def _call_in_loop(self, fn: Callable[[], object]) -> object:
+        """Run `fn` on the attached event loop thread and wait for it to finish."""
+        loop = self.loop
+        if _running_loop() is loop:
+            return fn()
+        done: Future = Future()
+
+        def run() -> None:
+            try:
+                done.set_result(fn())
+            except BaseException as exc:
+                done.set_exception(exc)
+
+        loop.call_soon_threadsafe(run)
+        return done.result(timeout=5)
+
+    def _start_loop_reader(self, parser: IndicatorParser, capture: Optional[CaptureWriter], generation: int) -> None:
+        fd = self._serial.fileno()
+        self.loop.add_reader(fd, self._on_readable, fd, parser, capture, generation)
+        self._fd = fd
+        if parser.poll_command is not None:
+            self._poll_handle = self.loop.call_soon(self._poll_port, fd, parser)
+
+    def _stop_loop_reader(self) -> None:
+        if self._fd is not None:
+            self.loop.remove_reader(self._fd)
+            self._fd = None
+        if self._poll_handle is not None:
+            self._poll_handle.cancel()
+            self._poll_handle = None
+
+    def _on_readable(
+        self, fd: int, parser: IndicatorParser, capture: Optional[CaptureWriter], generation: int
+    ) -> None:
+        try:
+            chunk = os.read(fd, 4096)
+        except BlockingIOError:
+            return
+        except OSError as exc:
+            chunk = b""
+            self._read_errors_metric.inc()
+            logger.warning("Lane %s serial read failed: %s", self.lane_id, exc)
+        if not chunk:
+            # EOF or error: the device went away. Stop watching the fd until reconnected.
+            self._stop_loop_reader()
+            self._connected = False
+            self._publish()
+            return
+        if capture is not None:
+            capture.write(chunk)
+        self._feed(parser, chunk, generation)
+
+    def _poll_port(self, fd: int, parser: IndicatorParser) -> None:
+        try:
+            os.write(fd, parser.poll_command)
+        except OSError as exc:
+            logger.warning("Lane %s poll write failed: %s", self.lane_id, exc)
+        self._poll_handle = self.loop.call_later(self.settings.serial_poll_interval, self._poll_port, fd, parser)
+
+    def _reader_loop(
+        self,
+        parser: IndicatorParser,
+        capture: Optional[CaptureWriter],
+        stop_event: threading.Event,
+        generation: int,
+    ) -> None:
+        port = self._serial
+        next_poll = 0.0
+        failing = False
+        while not stop_event.is_set():
+            if not port.is_open:
                 break
             try:
-                raw = self._serial.readline()
-                if not raw:
+                if parser.poll_command is not None and time.monotonic() >= next_poll:
+                    port.write(parser.poll_command)
+                    next_poll = time.monotonic() + self.settings.serial_poll_interval
+                # Block for the first byte, then take everything already buffered.
+                chunk = port.read(port.in_waiting or 1)
+                if not chunk:
                     continue
-                decoded = raw.decode(errors="ignore")
-                weight = self._extract_weight(decoded)
-                if weight is not None:
-                    with self._lock:
-                        self._last_weight = weight
-                        self._last_weight_time = datetime.utcnow()
-            except Exception:
+                if capture is not None:
+                    capture.write(chunk)
+                self._feed(parser, chunk, generation)
+                failing = False
+            except Exception as exc:
+                self._read_errors_metric.inc()
+                # Log once per run of failures; the counter keeps the full tally.
+                if not failing:
+                    logger.warning("Lane %s serial read failed: %s", self.lane_id, exc)
+                    failing = True
                 time.sleep(0.2)
 
-    def _simulate_loop(self) -> None:
+    def _replay_loop(
+        self,
+        parser: IndicatorParser,
+        path: Path,
+        speed: float,
+        repeat: bool,
+        stop_event: threading.Event,
+        generation: int,
+    ) -> None:
+        """Feed a recorded capture through the parser at `speed` x real time (0 = flat out)."""
+        while not stop_event.is_set():
+            started = time.monotonic()
+            offset = 0.0
+            for delay, chunk in read_capture(path):
+                if speed > 0:
+                    # Schedule against the capture timeline so per-chunk waits do not drift.
+                    offset += delay / speed
+                    wait = started + offset - time.monotonic()
+                    if wait > 0 and stop_event.wait(wait):
+                        return
+                elif stop_event.is_set():
+                    return
+                self._feed(parser, chunk, generation)
+            if not repeat:
+                break
+        with self._lock:
+            if generation == self._generation:
+                self._source = "idle"
+        self._publish()
+
+    def _feed(self, parser: IndicatorParser, chunk: bytes, generation: int) -> None:
+        errors = parser.errors
+        for frame in parser.feed(chunk):
+            self._store_weight(frame.weight_kg, frame.status, generation)
+        if parser.errors != errors:
+            self._parse_errors_metric.inc(parser.errors - errors)
+
+    def _simulate_loop(self, stop_event: threading.Event, generation: int) -> None:
         """Produce a slow, random walk weight reading to keep UI/dev flow usable offline."""
         weight = self._last_weight or random.uniform(1200, 1500)
-        while not self._stop_event.is_set():
+        while not stop_event.is_set():
             delta = random.uniform(-2, 2)
             weight = max(0, weight + delta)
-            with self._lock:
-                self._last_weight = round(weight, 2)
-                self._last_weight_time = datetime.utcnow()
-            time.sleep(0.5)
-
-    @staticmethod
-    def _extract_weight(payload: str) -> Optional[float]:
-        # Find the first group of digits (with optional decimal) in the line.
-        match = re.search(r"(-?\d+(?:\.\d+)?)", payload)
-        if match:
-            try:
-                return float(match.group(1))
-            except ValueError:
-                return None
+            self._store_weight(round(weight, 2), STATUS_OK, generation)
+            stop_event.wait(0.5)
+
+    def _store_weight(self, weight: float, status: int, generation: int) -> None:
+        now = time.time()
+        captured_at = datetime.utcfromtimestamp(now)
+        with self._lock:
+            if generation != self._generation:
+                return
+            self.frames_received += 1
+            self._frames_metric.inc()
+            self.history.append(now, weight, status)
+            self._last_weight = weight
+            self._last_weight_time = captured_at
+            connected, source = self._connected, self._source
+            stable = self._stability.update(now, weight, status) is not None
+            self._stable_changed.notify_all()
+        self.broadcaster.publish(weight, captured_at, connected, source, stable)
+
+    def _publish(self) -> None:
+        with self._lock:
+            weight, captured_at = self._last_weight, self._last_weight_time
+            connected, source = self._connected, self._source
+            stable = self._stability.current(time.time()) is not None
+        self.broadcaster.publish(weight, captured_at, connected, source, stable)
+
+
+class SerialManager:
+    """
+    Registry of per-lane readers keyed by lane id. Every lane has its own port, thread,
+    cache, history and stability detector, so a stuck port only stalls its own lane.
+    """
+
+    def __init__(self) -> None:
+        self.settings = get_settings()
+        self._lanes: dict[int, LaneReader] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._restore_task: Optional[asyncio.Task] = None
+
+    def attach_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Let lanes read their ports from `loop` instead of dedicated threads (POSIX)."""
+        with self._lock:
+            self._loop = loop
+            for reader in self._lanes.values():
+                reader.loop = loop
+
+    def lane(self, lane_id: int = DEFAULT_LANE) -> LaneReader:
+        if lane_id < 1 or lane_id > self.settings.max_lanes:
+            raise KeyError(f"Lane {lane_id} is not configured (1-{self.settings.max_lanes})")
+        with self._lock:
+            reader = self._lanes.get(lane_id)
+            if reader is None:
+                reader = self._lanes[lane_id] = LaneReader(lane_id, self._loop)
+            return reader
+
+    def lanes(self) -> list[LaneReader]:
+        with self._lock:
+            return [self._lanes[lane_id] for lane_id in sorted(self._lanes)]
+
+    def disconnect_all(self) -> None:
+        if self._restore_task is not None:
+            self._restore_task.cancel()
+            self._restore_task = None
+        for reader in self.lanes():
+            reader.disconnect()
+
+    def start_restore(self) -> None:
+        """Reconnect the lanes that were connected when the app stopped, in the background."""
+        if self._restore_task is None or self._restore_task.done():
+            self._restore_task = asyncio.get_running_loop().create_task(self._restore_lanes())
+
+    async def _restore_lanes(self) -> None:
+        loop = asyncio.get_running_loop()
+        waiting = await loop.run_in_executor(None, _saved_lane_ids)
+        delays = {lane_id: self.settings.serial_reconnect_interval_seconds for lane_id in waiting}
+        due = {lane_id: 0.0 for lane_id in waiting}
+        while waiting:
+            for lane_id in sorted(lane_id for lane_id in waiting if due[lane_id] <= loop.time()):
+                # Re-read every attempt: an operator may have connected or disconnected meanwhile.
+                stored = await loop.run_in_executor(None, _saved_lane, lane_id)
+                reader = self.lane(lane_id)
+                if stored is None or reader.get_reading().source != "idle":
+                    waiting.discard(lane_id)
+                    continue
+                reader.configure(SerialSettingsPayload.model_validate(stored, from_attributes=True))
+                try:
+                    await loop.run_in_executor(None, reader.connect)
+                except Exception as exc:
+                    # Warn once; a port that stays away would otherwise flood the log.
+                    first = delays[lane_id] == self.settings.serial_reconnect_interval_seconds
+                    (logger.warning if first else logger.debug)(
+                        "Lane %s: reconnect to %s failed (%s); retrying", lane_id, stored.port, exc
+                    )
+                    due[lane_id] = loop.time() + delays[lane_id]
+                    delays[lane_id] = min(delays[lane_id] * 2, self.settings.serial_reconnect_max_interval_seconds)
+                    continue
+                waiting.discard(lane_id)
+                logger.info("Lane %s: reconnected to %s", lane_id, "simulator" if stored.simulate else stored.port)
+            if waiting:
+                await asyncio.sleep(max(0.0, min(due[lane_id] for lane_id in waiting) - loop.time()))
+
+
+def _saved_lane_ids() -> set[int]:
+    max_lanes = get_settings().max_lanes
+    with Session(engine) as session:
+        # last_connected_at alone marks lanes left connected before auto_connect existed.
+        query = select(SerialSettings.id).where(
+            or_(SerialSettings.auto_connect, SerialSettings.last_connected_at.is_not(None))
+        )
+        return {lane_id for lane_id in session.exec(query).all() if 1 <= lane_id <= max_lanes}
+
+
+def _saved_lane(lane_id: int) -> Optional[SerialSettings]:
+    with Session(engine) as session:
+        stored = session.get(SerialSettings, lane_id)
+        if stored is None or not (stored.auto_connect or stored.last_connected_at is not None):
+            return None
+        return stored
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
         return None
 
 
@@ -0,0 +1,156 @@
+import math
+from collections import deque
+from statistics import median_low
+from typing import NamedTuple, Optional
+
+from app.services.weight_history import STATUS_OK
+
+FILTERS = ("median", "mean", "none")
+
+
+class StabilityState(NamedTuple):
+    weight_kg: float
+    mean_kg: float
+    spread_kg: float
+    stddev_kg: float
+    samples: int
+    window_seconds: float
+    stable_since: float
+    sampled_at: float
+
+
+class StabilityDetector:
+    """
+    Incremental motion detector for the live sample stream. Raw samples pass through
+    a short moving filter (median by default) and the scale counts as stable once the
+    filtered value has stayed within `tolerance_kg` for at least `window_seconds`.
+
+    Each update is O(1) amortized: the window keeps running sums plus monotonic
+    min/max queues instead of rescanning samples. A gap of more than `window_seconds`
+    between samples starts over, and `current()` drops a state that has gone that long
+    without a sample, so a silent indicator never reads as a settled load.
+    """
+
+    def __init__(
+        self,
+        window_seconds: float,
+        tolerance_kg: float,
+        filter: str = "median",
+        filter_size: int = 5,
+        min_samples: int = 3,
+    ) -> None:
+        if filter not in FILTERS:
+            raise ValueError(f"Unknown stability filter '{filter}'; expected one of {', '.join(FILTERS)}")
+        self.window_seconds = window_seconds
+        self.tolerance_kg = tolerance_kg
+        self.filter = filter
+        self.min_samples = max(1, min_samples)
+        self._raw: deque[float] = deque(maxlen=max(1, filter_size) if filter != "none" else 1)
+        self._window: deque[tuple[int, float, float]] = deque()
+        self._mins: deque[tuple[int, float]] = deque()
+        self._maxs: deque[tuple[int, float]] = deque()
+        self._seq = 0
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._stable_since: Optional[float] = None
+        self._last_sample: Optional[float] = None
+        self.state: Optional[StabilityState] = None
+
+    def reset(self) -> None:
+        self._raw.clear()
+        self._last_sample = None
+        self._clear_window()
+
+    def current(self, now: float) -> Optional[StabilityState]:
+        """The stable state as of `now`, or None if no sample has arrived for a full window."""
+        state = self.state
+        if state is None or now - state.sampled_at > self.window_seconds:
+            return None
+        return state
+
+    def update(self, timestamp: float, weight: float, status: int = STATUS_OK) -> Optional[StabilityState]:
+        """Feed one sample; returns the stable state or None while the load is moving."""
+        if self._last_sample is not None and timestamp - self._last_sample > self.window_seconds:
+            # The stream stalled; samples from before the gap say nothing about the load now.
+            self.reset()
+        self._last_sample = timestamp
+        if status != STATUS_OK:
+            # The indicator itself reports motion/overload; never call that stable.
+            self._clear_window()
+            return None
+
+        value = self._filtered(weight)
+        self._push(timestamp, value)
+
+        spread = self._maxs[0][1] - self._mins[0][1]
+        if spread > self.tolerance_kg:
+            # Restart the window from the current value once the band is broken.
+            self._clear_window()
+            self._push(timestamp, value)
+            return None
+
+        count = len(self._window)
+        span = timestamp - self._window[0][1]
+        if count < self.min_samples or span < self.window_seconds:
+            self.state = None
+            return None
+
+        if self._stable_since is None:
+            self._stable_since = timestamp
+        mean = self._sum / count
+        variance = max(0.0, self._sum_sq / count - mean * mean)
+        self.state = StabilityState(
+            weight_kg=value,
+            mean_kg=mean,
+            spread_kg=spread,
+            stddev_kg=math.sqrt(variance),
+            samples=count,
+            window_seconds=span,
+            stable_since=self._stable_since,
+            sampled_at=timestamp,
+        )
+        return self.state
+
+    def _filtered(self, weight: float) -> float:
+        raw = self._raw
+        raw.append(weight)
+        if self.filter == "median":
+            return median_low(raw)
+        if self.filter == "mean":
+            return sum(raw) / len(raw)
+        return weight
+
+    def _push(self, timestamp: float, value: float) -> None:
+        self._seq += 1
+        seq = self._seq
+        window = self._window
+        window.append((seq, timestamp, value))
+        self._sum += value
+        self._sum_sq += value * value
+        while self._mins and self._mins[-1][1] >= value:
+            self._mins.pop()
+        self._mins.append((seq, value))
+        while self._maxs and self._maxs[-1][1] <= value:
+            self._maxs.pop()
+        self._maxs.append((seq, value))
+
+        # Keep one sample at or beyond the window edge so the span covers the full window.
+        cutoff = timestamp - self.window_seconds
+        while len(window) > 1 and window[1][1] <= cutoff:
+            _, _, old = window.popleft()
+            self._sum -= old
+            self._sum_sq -= old * old
+        oldest = window[0][0]
+        while self._mins[0][0] < oldest:
+            self._mins.popleft()
+        while self._maxs[0][0] < oldest:
+            self._maxs.popleft()
+
+    def _clear_window(self) -> None:
+        self._window.clear()
+        self._mins.clear()
+        self._maxs.clear()
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._stable_since = None
+        self.state = None
@@ -1,30 +1,66 @@
 import asyncio
+import hashlib
 import json
 import logging
-from datetime import datetime
-from typing import Optional
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Optional, Sequence, TypeVar
 
-from sqlmodel import Session, select
+from sqlalchemy import delete, update
+from sqlalchemy.orm import defer
+from sqlmodel import Session, func, select
 
 from app.config import get_settings
 from app.database import engine
-from app.models import SyncQueue, Ticket
-from app.services.odoo_client import OdooClient
+from app.metrics import metrics
+from app.models import Attachment, SyncQueue, SyncQueueCount, Ticket
+from app.schemas import SyncStats
+from app.services import attachment_service
+from app.services.odoo_client import BulkNotSupported, OdooClient
 
 logger = logging.getLogger("sync_service")
 
+# Queue rows the loop still tries to send; "sent" and "dead" rows are left alone.
+RETRYABLE_STATUSES = ("pending", "failed")
+# Rows not yet accepted by Odoo; a ticket has at most one, which re-queueing updates in place.
+UNSENT_STATUSES = ("pending", "failed", "dead")
+QUEUE_STATUSES = ("pending", "failed", "sent", "dead")
+PRUNE_BATCH_SIZE = 5000
+
+ODOO_SECONDS = metrics.histogram(
+    "weighbridge_odoo_request_seconds", "Odoo upload round trips by kind and outcome.", ("kind", "outcome")
+)
+SYNC_OUTCOMES = metrics.counter(
+    "weighbridge_sync_items_total", "Queue rows processed, by resulting status.", ("status",)
+)
+SYNC_DEDUPLICATED = metrics.counter(
+    "weighbridge_sync_deduplicated_total",
+    "Payloads not uploaded on their own: coalesced into a queued row, or unchanged since the last send.",
+    ("reason",),
+)
+
+T = TypeVar("T")
+
 
 class SyncService:
     def __init__(self) -> None:
         self.settings = get_settings()
         self.client = OdooClient()
         self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._pass_lock: Optional[asyncio.Lock] = None
+        self._db_executor: Optional[ThreadPoolExecutor] = None
 
     def start(self) -> None:
         if self._task and not self._task.done():
             return
-        loop = asyncio.get_event_loop()
-        self._task = loop.create_task(self._run_loop())
+        # The HTTP client (and httpx) is only loaded by the first send.
+        self._loop = asyncio.get_event_loop()
+        self._wake = asyncio.Event()
+        self._task = self._loop.create_task(self._run_loop())
 
     async def shutdown(self) -> None:
         if self._task:
@@ -33,58 +69,352 @@ class SyncService:
                 await self._task
             except asyncio.CancelledError:
                 pass
+        await self.client.aclose()
+        if self._db_executor is not None:
+            self._db_executor.shutdown(wait=True)
+            self._db_executor = None
+
+    def wake(self) -> None:
+        """Run the next sync pass now instead of waiting for the next due row."""
+        if self._loop is None or self._wake is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._wake.set)
+        except RuntimeError:
+            # Event loop already closed (shutdown); the row is picked up on next start.
+            pass
 
     async def _run_loop(self) -> None:
         while True:
+            self._wake.clear()
             try:
-                await self.sync_pending()
+                next_due = await self.sync_pending()
             except Exception:
                 logger.exception("Sync loop encountered an error")
-            await asyncio.sleep(self.settings.sync_interval_seconds)
+                next_due = None
+            try:
+                await asyncio.wait_for(self._wake.wait(), self._sleep_seconds(next_due))
+            except asyncio.TimeoutError:
+                pass
+
+    def _sleep_seconds(self, next_due: Optional[datetime]) -> float:
+        # With nothing scheduled, still look again every sync_interval_seconds in case
+        # rows were queued or revived outside this process.
+        idle = float(self.settings.sync_interval_seconds)
+        if next_due is None:
+            return idle
+        return min(idle, max(0.0, (next_due - datetime.utcnow()).total_seconds()))
+
+    async def sync_pending(self, force: bool = False) -> Optional[datetime]:
+        """
+        Send every queue row that is due (all pending/failed rows when `force` is set).
+        Returns when the next scheduled retry falls due, or None if nothing is waiting.
+
+        Database work runs on the single `sync-db` thread so the event loop keeps serving
+        requests; each batch's results are written while other batches are still in flight.
+        """
+        if self._pass_lock is None:
+            self._pass_lock = asyncio.Lock()
+        async with self._pass_lock:
+            if not self.client.configured:
+                # Leave rows untouched; attempts are not burnt while sync is disabled.
+                return None
+            due = await self._run_db(self._load_due, force)
+
+            # Batches/items go out concurrently; the client bounds in-flight requests and rate.
+            batch_size = self.settings.sync_batch_size
+            if batch_size > 1:
+                jobs = [
+                    self._process_batch(due[start : start + batch_size]) for start in range(0, len(due), batch_size)
+                ]
+            else:
+                jobs = [self._process_item(item) for item in due]
+            await asyncio.gather(*jobs)
+
+            return await self._run_db(self._next_due)
 
-    async def sync_pending(self) -> None:
+    async def _run_db(self, fn: Callable[..., T], *args) -> T:
+        if self._db_executor is None:
+            self._db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sync-db")
+        return await asyncio.get_running_loop().run_in_executor(self._db_executor, fn, *args)
+
+    def _load_due(self, force: bool) -> list[SyncQueue]:
+        with Session(engine, expire_on_commit=False) as session:
+            query = select(SyncQueue).where(SyncQueue.status.in_(RETRYABLE_STATUSES))
+            if not force:
+                query = query.where(SyncQueue.next_attempt_at <= datetime.utcnow())
+            # Rows leave the session detached; their results are written by `_save`.
+            due = list(session.exec(query.order_by(SyncQueue.next_attempt_at)).all())
+            if not due:
+                return due
+
+            synced = dict(
+                session.exec(
+                    select(Ticket.id, Ticket.synced_payload_hash).where(
+                        Ticket.id.in_({item.ticket_id for item in due})
+                    )
+                ).all()
+            )
+            newest = {}
+            for item in due:
+                newest[item.ticket_id] = max(item.id, newest.get(item.ticket_id, item.id))
+            send = []
+            for item in due:
+                if item.id != newest[item.ticket_id]:
+                    # Several rows for one ticket were only ever queued by older releases.
+                    session.delete(item)
+                    SYNC_DEDUPLICATED.labels("coalesced").inc()
+                    continue
+                if item.payload_hash is None:
+                    # Queued before payloads were hashed.
+                    payload = json.loads(item.payload)
+                    item.payload, item.payload_hash = canonical_payload(payload)
+                    item.idempotency_key = idempotency_key(
+                        payload.get("ticket_no"), item.ticket_id, item.payload_hash, synced.get(item.ticket_id)
+                    )
+                    session.add(item)
+                if item.payload_hash == synced.get(item.ticket_id):
+                    # Odoo already has exactly this content (e.g. a dead row retried after a newer send).
+                    item.status, item.last_error, item.next_attempt_at = "sent", None, None
+                    item.last_attempt_at = datetime.utcnow()
+                    session.add(item)
+                    SYNC_DEDUPLICATED.labels("unchanged").inc()
+                else:
+                    send.append(item)
+            session.commit()
+            return send
+
+    def _next_due(self) -> Optional[datetime]:
         with Session(engine) as session:
-            pending = session.exec(
-                select(SyncQueue).where(SyncQueue.status == "pending").order_by(SyncQueue.created_at)
-            ).all()
+            return session.exec(
+                select(func.min(SyncQueue.next_attempt_at)).where(SyncQueue.status.in_(RETRYABLE_STATUSES))
+            ).one()
 
-            for item in pending:
-                await self._process_item(session, item)
+    def _save(self, items: list[SyncQueue], external_ids: dict[int, str]) -> None:
+        with Session(engine) as session:
+            for item in items:
+                # Only if the row still holds the payload that went out: when it was coalesced
+                # with a newer payload meanwhile, that one is pending and must still be sent.
+                written = session.execute(
+                    update(SyncQueue)
+                    .where(SyncQueue.id == item.id, SyncQueue.payload_hash == item.payload_hash)
+                    .values(
+                        status=item.status,
+                        attempts=item.attempts,
+                        last_error=item.last_error,
+                        last_attempt_at=item.last_attempt_at,
+                        next_attempt_at=item.next_attempt_at,
+                    )
+                ).rowcount
+                if written and item.status == "sent":
+                    ticket = session.get(Ticket, item.ticket_id)
+                    if ticket:
+                        ticket.synced_payload_hash = item.payload_hash
+                        session.add(ticket)
+            # If Odoo returns an external id, persist it for audit
+            for ticket_id, external_id in external_ids.items():
+                ticket = session.get(Ticket, ticket_id)
+                if ticket:
+                    ticket.odoo_external_id = external_id
+                    ticket.updated_at = datetime.utcnow()
+                    session.add(ticket)
+            session.commit()
 
-    async def _process_item(self, session: Session, item: SyncQueue) -> None:
+    async def _process_batch(self, items: list[SyncQueue]) -> None:
+        if not self.client.bulk_available():
+            await asyncio.gather(*(self._process_item(item) for item in items))
+            return
+
+        now = datetime.utcnow()
+        for item in items:
+            item.attempts += 1
+            item.last_attempt_at = now
+
+        external_ids: dict[int, str] = {}
+        started = time.perf_counter()
+        try:
+            results = await self.client.send_tickets(
+                [{**json.loads(item.payload), "idempotency_key": item.idempotency_key} for item in items]
+            )
+        except BulkNotSupported as exc:
+            ODOO_SECONDS.labels("bulk", "unsupported").observe(time.perf_counter() - started)
+            logger.info("Odoo bulk endpoint unavailable (%s); falling back to single sends", exc)
+            for item in items:
+                item.attempts -= 1
+            await asyncio.gather(*(self._process_item(item) for item in items))
+            return
+        except Exception as exc:
+            ODOO_SECONDS.labels("bulk", "error").observe(time.perf_counter() - started)
+            for item in items:
+                self._mark_failed(item, str(exc))
+            logger.warning("Batch sync failed for %d tickets: %s", len(items), exc)
+        else:
+            ODOO_SECONDS.labels("bulk", "ok").observe(time.perf_counter() - started)
+            for index, item in enumerate(items):
+                result = results[index] if index < len(results) else None
+                if not isinstance(result, dict):
+                    self._mark_failed(item, "No result returned for ticket in bulk response")
+                elif result.get("error"):
+                    self._mark_failed(item, str(result["error"]))
+                else:
+                    self._mark_sent(item, result, external_ids)
+        await self._run_db(self._save, items, external_ids)
+
+    async def _process_item(self, item: SyncQueue) -> None:
         item.attempts += 1
         item.last_attempt_at = datetime.utcnow()
         payload = json.loads(item.payload)
 
+        external_ids: dict[int, str] = {}
+        started = time.perf_counter()
         try:
-            result = await self.client.send_ticket(payload)
-            item.status = "sent"
-            item.last_error = None
+            result = await self.client.send_ticket(payload, item.idempotency_key)
+            ODOO_SECONDS.labels("single", "ok").observe(time.perf_counter() - started)
+            self._mark_sent(item, result, external_ids)
+        except Exception as exc:
+            ODOO_SECONDS.labels("single", "error").observe(time.perf_counter() - started)
+            self._mark_failed(item, str(exc))
+            logger.warning("Sync failed for ticket %s: %s", item.ticket_id, exc)
+        await self._run_db(self._save, [item], external_ids)
 
-            # If Odoo returns an external id, persist it for audit
-            ticket = session.get(Ticket, item.ticket_id)
-            if ticket and isinstance(result, dict) and result.get("external_id"):
-                ticket.odoo_external_id = str(result["external_id"])
-                ticket.updated_at = datetime.utcnow()
+    def _mark_sent(self, item: SyncQueue, result: object, external_ids: dict[int, str]) -> None:
+        item.status = "sent"
+        item.last_error = None
+        item.next_attempt_at = None
+        SYNC_OUTCOMES.labels("sent").inc()
+        if isinstance(result, dict) and result.get("external_id"):
+            external_ids[item.ticket_id] = str(result["external_id"])
 
-            session.add(item)
-            session.commit()
-        except Exception as exc:
+    def _mark_failed(self, item: SyncQueue, error: str) -> None:
+        item.last_error = error
+        if item.attempts >= self.settings.sync_max_attempts:
+            item.status = "dead"
+            item.next_attempt_at = None
+            logger.error("Giving up on ticket %s after %d attempts: %s", item.ticket_id, item.attempts, error)
+        else:
             item.status = "failed"
-            item.last_error = str(exc)
-            session.add(item)
+            item.next_attempt_at = datetime.utcnow() + timedelta(seconds=self._retry_delay(item.attempts))
+        SYNC_OUTCOMES.labels(item.status).inc()
+
+    def _retry_delay(self, attempts: int) -> float:
+        # Exponential backoff with "equal jitter": half the delay is fixed, half random,
+        # so a backlog that failed together does not retry in lockstep.
+        base = self.settings.sync_retry_base_seconds
+        delay = min(self.settings.sync_retry_max_seconds, base * 2 ** max(0, attempts - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def enqueue_ticket(self, session: Session, ticket: Ticket) -> Optional[SyncQueue]:
+        """
+        Queue the ticket's current payload. A row the ticket already has waiting is updated
+        in place (latest payload wins, with a fresh attempt budget) rather than joined by a
+        second one. Returns None, queueing nothing, when Odoo already has this exact payload.
+        """
+        attachments = session.exec(select(Attachment).where(Attachment.ticket_id == ticket.id)).all()
+        payload, payload_hash = canonical_payload(self._ticket_payload(ticket, attachments))
+        unsent = session.exec(
+            select(SyncQueue)
+            .where(SyncQueue.ticket_id == ticket.id, SyncQueue.status.in_(UNSENT_STATUSES))
+            .order_by(SyncQueue.id.desc())
+        ).all()
+
+        if payload_hash == ticket.synced_payload_hash:
+            # Odoo is already up to date; anything still queued is older content.
+            for stale in unsent:
+                session.delete(stale)
             session.commit()
-            logger.warning("Sync failed for ticket %s: %s", item.ticket_id, exc)
+            SYNC_DEDUPLICATED.labels("unchanged").inc()
+            return None
 
-    def enqueue_ticket(self, session: Session, ticket: Ticket) -> SyncQueue:
-        payload = self._ticket_payload(ticket)
-        record = SyncQueue(ticket_id=ticket.id, payload=json.dumps(payload), status="pending")
+        record, superseded = (unsent[0], unsent[1:]) if unsent else (None, ())
+        if record is not None and record.payload_hash == payload_hash and record.status != "dead":
+            return record
+        if record is None:
+            record = SyncQueue(ticket_id=ticket.id, payload=payload)
+        else:
+            SYNC_DEDUPLICATED.labels("coalesced").inc()
+        record.payload = payload
+        record.payload_hash = payload_hash
+        record.idempotency_key = idempotency_key(ticket.ticket_no, ticket.id, payload_hash, ticket.synced_payload_hash)
+        record.status = "pending"
+        record.attempts = 0
+        record.last_error = None
+        record.next_attempt_at = datetime.utcnow()
         session.add(record)
+        # Only left behind by releases that queued every call as a new row.
+        for stale in superseded:
+            session.delete(stale)
         session.commit()
         session.refresh(record)
+        self.wake()
         return record
 
-    def _ticket_payload(self, ticket: Ticket) -> dict:
+    def retry(self, session: Session, item: SyncQueue) -> SyncQueue:
+        """Put a failed or dead row back in the queue with a fresh attempt budget."""
+        item.status = "pending"
+        item.attempts = 0
+        item.next_attempt_at = datetime.utcnow()
+        session.add(item)
+        session.commit()
+        session.refresh(item)
+        self.wake()
+        return item
+
+    def list_queue(
+        self, session: Session, limit: int, status: Optional[str] = None, before_id: Optional[int] = None
+    ) -> list[SyncQueue]:
+        """Newest rows first, paged by id. The payload column is never loaded."""
+        query = select(SyncQueue).options(defer(SyncQueue.payload))
+        if status:
+            query = query.where(SyncQueue.status == status)
+        if before_id is not None:
+            query = query.where(SyncQueue.id < before_id)
+        return list(session.exec(query.order_by(SyncQueue.id.desc()).limit(limit)).all())
+
+    def stats(self, session: Session) -> SyncStats:
+        counts = {status: 0 for status in QUEUE_STATUSES}
+        last_sent_at = None
+        for row in session.exec(select(SyncQueueCount)).all():
+            counts[row.status] = row.row_count
+            if row.status == "sent":
+                last_sent_at = row.last_entered_at
+        # Only the (few) waiting rows are read, through the status index.
+        oldest = session.exec(
+            select(func.min(SyncQueue.created_at)).where(SyncQueue.status.in_(RETRYABLE_STATUSES))
+        ).one()
+        return SyncStats(
+            counts=counts,
+            total=sum(counts.values()),
+            oldest_pending_at=oldest,
+            oldest_pending_age_seconds=(datetime.utcnow() - oldest).total_seconds() if oldest else None,
+            last_sent_at=last_sent_at,
+        )
+
+    def prune_sent(self, before: datetime) -> int:
+        """Delete rows sent before `before`, a batch per transaction; returns how many went."""
+        pruned = 0
+        while True:
+            batch = (
+                select(SyncQueue.id)
+                .where(SyncQueue.status == "sent", SyncQueue.last_attempt_at < before)
+                .limit(PRUNE_BATCH_SIZE)
+            )
+            with Session(engine) as session:
+                deleted = session.execute(delete(SyncQueue).where(SyncQueue.id.in_(batch))).rowcount
+                session.commit()
+            pruned += deleted
+            if deleted < PRUNE_BATCH_SIZE:
+                break
+        if pruned:
+            logger.info("Pruned %d sent queue rows older than %s", pruned, before)
+        return pruned
+
+    def run_prune(self) -> int:
+        days = self.settings.sync_sent_retention_days
+        if days <= 0:
+            return 0
+        return self.prune_sent(datetime.utcnow() - timedelta(days=days))
+
+    def _ticket_payload(self, ticket: Ticket, attachments: Sequence[Attachment] = ()) -> dict:
         return {
             "ticket_no": ticket.ticket_no,
             "vehicle_plate": ticket.vehicle_plate,
@@ -93,6 +423,7 @@ class SyncService:
             "product_name": ticket.product_name,
             "gross_kg": ticket.gross_kg,
             "tare_kg": ticket.tare_kg,
+            "tare_source": ticket.tare_source,
             "net_kg": ticket.net_kg,
             "weight_in_time": ticket.weight_in_time.isoformat() if ticket.weight_in_time else None,
             "weight_out_time": ticket.weight_out_time.isoformat() if ticket.weight_out_time else None,
@@ -103,7 +434,35 @@ class SyncService:
             "remarks": ticket.remarks,
             "qc_status": ticket.qc_status,
             "qc_note": ticket.qc_note,
+            # References only; Odoo fetches the files from the attachment URLs.
+            "attachments": [attachment_service.reference(attachment) for attachment in attachments],
         }
 
 
+def canonical_payload(payload: dict) -> tuple[str, str]:
+    """The payload as stored and hashed (sorted keys, no whitespace) and its SHA-256."""
+    text = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return text, hashlib.sha256(text.encode()).hexdigest()
+
+
+def idempotency_key(
+    ticket_no: Optional[str], ticket_id: int, payload_hash: str, replaces: Optional[str] = None
+) -> str:
+    """
+    Ticket number plus payload hash, so a resend of an upload Odoo already processed is
+    recognised while edited content gets a new key. An update also names the hash it
+    replaces: reverting to earlier content must not look like a resend of the original.
+    """
+    key = f"{ticket_no or f'ticket-{ticket_id}'}:{payload_hash}"
+    return f"{key}:{replaces[:16]}" if replaces else key
+
+
 sync_service = SyncService()
+
+
+def _queue_depth() -> list[tuple[tuple[str], float]]:
+    with Session(engine) as session:
+        return [((row.status,), row.row_count) for row in session.exec(select(SyncQueueCount)).all()]
+
+
+metrics.gauge("weighbridge_sync_queue_rows", "Sync queue rows by status.", ("status",), collect=_queue_depth)
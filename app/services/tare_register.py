@@ -0,0 +1,115 @@
+"""
+Register of known vehicle tares, learned from physically weighed tickets so regular
+fleet trucks can be finalized in a single pass over the deck.
+"""
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+from sqlmodel import Session, select
+
+from app.config import get_settings
+from app.models import Ticket, VehicleTare
+from app.services.plate_index import normalize_plate
+
+logger = logging.getLogger("tare_register")
+
+
+class StoredTare(NamedTuple):
+    vehicle_plate: str
+    tare_kg: float
+    captured_at: datetime
+    expires_at: datetime
+    source_ticket_id: Optional[int]
+
+    def valid(self, now: Optional[datetime] = None) -> bool:
+        return (now or datetime.utcnow()) < self.expires_at
+
+
+class TareRegister:
+    """In-memory copy of the `VehicleTare` table; the table is the source of truth."""
+
+    def __init__(self) -> None:
+        self.settings = get_settings()
+        self._lock = threading.Lock()
+        self._tares: dict[str, StoredTare] = {}
+
+    def load(self, session: Session) -> None:
+        rows = session.exec(select(VehicleTare)).all()
+        with self._lock:
+            self._tares = {row.plate_key: self._entry(row) for row in rows}
+
+    def get(self, plate: str) -> Optional[StoredTare]:
+        with self._lock:
+            return self._tares.get(normalize_plate(plate))
+
+    def all(self) -> list[StoredTare]:
+        with self._lock:
+            return sorted(self._tares.values(), key=lambda tare: tare.vehicle_plate)
+
+    def stage(self, session: Session, ticket: Ticket) -> Optional[VehicleTare]:
+        """
+        Add the tare of a physically weighed ticket to `session` (the caller commits).
+        Call `remember` with the returned row once the transaction has committed.
+        """
+        if ticket.tare_source == "stored" or ticket.tare_kg <= 0:
+            return None
+        key = normalize_plate(ticket.vehicle_plate)
+        captured_at = ticket.weight_out_time or datetime.utcnow()
+        expires_at = captured_at + timedelta(days=self.settings.stored_tare_validity_days)
+
+        row = session.get(VehicleTare, key)
+        if row is not None:
+            deviation = abs(ticket.tare_kg - row.tare_kg)
+            if deviation > row.tare_kg * self.settings.stored_tare_tolerance_pct / 100:
+                # Unexpected change (modification, residue, wrong truck): keep the new value
+                # but require a second consistent weighing before trusting it.
+                logger.warning(
+                    "Tare of %s changed from %.1f to %.1f kg; re-weighing required",
+                    ticket.vehicle_plate,
+                    row.tare_kg,
+                    ticket.tare_kg,
+                )
+                expires_at = captured_at
+        else:
+            row = VehicleTare(
+                plate_key=key,
+                vehicle_plate=ticket.vehicle_plate,
+                tare_kg=ticket.tare_kg,
+                captured_at=captured_at,
+                expires_at=expires_at,
+            )
+        row.vehicle_plate = ticket.vehicle_plate
+        row.tare_kg = ticket.tare_kg
+        row.captured_at = captured_at
+        row.expires_at = expires_at
+        row.source_ticket_id = ticket.id
+        row.updated_at = datetime.utcnow()
+        session.add(row)
+        return row
+
+    def remember(self, row: VehicleTare) -> None:
+        with self._lock:
+            self._tares[row.plate_key] = self._entry(row)
+
+    def forget(self, session: Session, plate: str) -> bool:
+        key = normalize_plate(plate)
+        row = session.get(VehicleTare, key)
+        if row is not None:
+            session.delete(row)
+            session.commit()
+        with self._lock:
+            return self._tares.pop(key, None) is not None or row is not None
+
+    def _entry(self, row: VehicleTare) -> StoredTare:
+        return StoredTare(
+            vehicle_plate=row.vehicle_plate,
+            tare_kg=row.tare_kg,
+            captured_at=row.captured_at,
+            expires_at=row.expires_at,
+            source_ticket_id=row.source_ticket_id,
+        )
+
+
+tare_register = TareRegister()
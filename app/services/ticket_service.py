@@ -1,31 +1,85 @@
+import base64
 from datetime import datetime
 from typing import List, Optional
 
-from sqlmodel import Session, select
-
-from app.models import Ticket
-
-
-def generate_ticket_number(session: Session) -> str:
-    today = datetime.utcnow().strftime("%Y%m%d")
-    prefix = f"WB{today}"
-    last_ticket = session.exec(
-        select(Ticket)
-        .where(Ticket.ticket_no.like(f"{prefix}%"))
-        .order_by(Ticket.ticket_no.desc())
-        .limit(1)
-    ).first()
-
-    if last_ticket and last_ticket.ticket_no:
-        suffix = last_ticket.ticket_no.split("-")[-1]
-        try:
-            seq = int(suffix) + 1
-        except ValueError:
-            seq = 1
-    else:
-        seq = 1
-
-    return f"{prefix}-{seq:04d}"
+from sqlalchemy import tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select, update
+from sqlmodel.sql.expression import SelectOfScalar
+
+from app.config import get_settings
+from app.models import Ticket, TicketSequence
+from app.schemas import TicketFilters
+from app.services import archive_service, report_service
+from app.services.plate_index import normalize_plate, plate_index
+from app.services.tare_register import tare_register
+
+
+class OpenWeighInExists(ValueError):
+    """The vehicle already has an open weigh-in (ux_ticket_open_plate_key)."""
+
+
+class _SeqSlot:
+    """Stands in for {seq} so a number format can be rendered into its scope key."""
+
+    def __format__(self, spec: str) -> str:
+        return SEQ_PLACEHOLDER
+
+
+SEQ_PLACEHOLDER = "{seq}"
+
+
+def ticket_number_scope(number_format: str, when: datetime, lane_id: int) -> str:
+    try:
+        scope = number_format.format(date=when, lane=lane_id, seq=_SeqSlot())
+    except (KeyError, IndexError, ValueError) as exc:
+        raise ValueError(f"Invalid ticket_number_format '{number_format}': {exc}")
+    if scope.count(SEQ_PLACEHOLDER) != 1:
+        raise ValueError("ticket_number_format must contain the {seq} field exactly once")
+    return scope
+
+
+def generate_ticket_number(session: Session, lane_id: int = 1) -> str:
+    """
+    Allocate the next ticket number. The counter row for the number's scope is bumped
+    with a single upsert in the caller's transaction, so the write lock is held until
+    the ticket itself is committed and concurrent finalizations never share a number.
+    """
+    settings = get_settings()
+    now = datetime.utcnow()
+    scope = ticket_number_scope(settings.ticket_number_format, now, lane_id)
+
+    seq = session.exec(
+        update(TicketSequence)
+        .where(TicketSequence.scope == scope)
+        .values(last_value=TicketSequence.last_value + 1, updated_at=now)
+        .returning(TicketSequence.last_value)
+    ).scalar_one_or_none()
+    if seq is None:
+        # First number in this scope: continue after any tickets numbered before the
+        # counter existed. A concurrent first insert turns into an increment.
+        insert = sqlite_insert(TicketSequence).values(
+            scope=scope, last_value=_highest_issued(session, scope) + 1, updated_at=now
+        )
+        seq = session.exec(
+            insert.on_conflict_do_update(
+                index_elements=[TicketSequence.scope],
+                set_={"last_value": TicketSequence.last_value + 1, "updated_at": now},
+            ).returning(TicketSequence.last_value)
+        ).scalar_one()
+
+    return settings.ticket_number_format.format(date=now, lane=lane_id, seq=seq)
+
+
+def _highest_issued(session: Session, scope: str) -> int:
+    prefix, suffix = scope.split(SEQ_PLACEHOLDER)
+    highest = 0
+    for ticket_no in session.exec(select(Ticket.ticket_no).where(Ticket.ticket_no.startswith(prefix, autoescape=True))):
+        middle = ticket_no[len(prefix) : len(ticket_no) - len(suffix)]
+        if ticket_no.endswith(suffix) and middle.isdigit():
+            highest = max(highest, int(middle))
+    return highest
 
 
 def create_weigh_in(
@@ -36,11 +90,20 @@ def create_weigh_in(
         gross_kg=gross_kg,
         weight_in_time=weight_in_time or datetime.utcnow(),
         updated_at=datetime.utcnow(),
+        plate_key=normalize_plate(data["vehicle_plate"]),
         **data,
     )
     session.add(ticket)
-    session.commit()
+    try:
+        session.commit()
+    except IntegrityError as exc:
+        # A concurrent weigh-in for the same plate got past the plate index check first.
+        session.rollback()
+        if "ticket.plate_key" not in str(exc.orig):
+            raise
+        raise OpenWeighInExists(f"Vehicle {data['vehicle_plate']} already has an open weigh-in")
     session.refresh(ticket)
+    plate_index.update(ticket)
     return ticket
 
 
@@ -48,12 +111,14 @@ def record_weigh_out(
     session: Session, ticket: Ticket, tare_kg: float, weight_out_time: Optional[datetime]
 ) -> Ticket:
     ticket.tare_kg = tare_kg
+    ticket.tare_source = "weighed"
     ticket.weight_out_time = weight_out_time or datetime.utcnow()
     ticket.status = "weigh_out"
     ticket.updated_at = datetime.utcnow()
     session.add(ticket)
     session.commit()
     session.refresh(ticket)
+    plate_index.update(ticket)
     return ticket
 
 
@@ -68,17 +133,116 @@ def finalize_ticket(
         raise ValueError("Computed net weight is negative; check captured weights")
 
     ticket.net_kg = net
-    ticket.ticket_no = ticket.ticket_no or generate_ticket_number(session)
+    ticket.ticket_no = ticket.ticket_no or generate_ticket_number(session, ticket.lane_id)
     ticket.qc_status = qc_status or ticket.qc_status
     ticket.qc_note = qc_note or ticket.qc_note
     ticket.remarks = remarks or ticket.remarks
     ticket.status = "finalized"
     ticket.updated_at = datetime.utcnow()
     session.add(ticket)
+    learned_tare = tare_register.stage(session, ticket)
+    report_service.record_ticket(session, ticket)
     session.commit()
     session.refresh(ticket)
+    plate_index.update(ticket)
+    if learned_tare is not None:
+        tare_register.remember(learned_tare)
     return ticket
 
 
-def list_tickets(session: Session, limit: int = 50) -> List[Ticket]:
-    return session.exec(select(Ticket).order_by(Ticket.created_at.desc()).limit(limit)).all()
+def create_stored_tare_ticket(
+    session: Session, data: dict, gross_kg: float, weight_in_time: Optional[datetime]
+) -> Ticket:
+    """Weigh-in for a vehicle with a valid stored tare: the ticket is finalized in one pass."""
+    plate = data["vehicle_plate"]
+    stored = tare_register.get(plate)
+    if stored is None:
+        raise ValueError(f"No stored tare for vehicle {plate}; weigh it out on the bridge")
+    if not stored.valid():
+        raise ValueError(
+            f"Stored tare for vehicle {plate} is due for re-weighing (since {stored.expires_at:%Y-%m-%d %H:%M}); "
+            "weigh it out on the bridge"
+        )
+    if gross_kg <= stored.tare_kg * (1 + get_settings().stored_tare_tolerance_pct / 100):
+        raise ValueError(
+            f"Gross {gross_kg:.1f} kg is within tolerance of the stored tare {stored.tare_kg:.1f} kg; "
+            "vehicle appears empty"
+        )
+
+    weighed_at = weight_in_time or datetime.utcnow()
+    ticket = Ticket(
+        status="weigh_out",
+        gross_kg=gross_kg,
+        tare_kg=stored.tare_kg,
+        tare_source="stored",
+        weight_in_time=weighed_at,
+        weight_out_time=weighed_at,
+        updated_at=datetime.utcnow(),
+        plate_key=normalize_plate(plate),
+        **data,
+    )
+    session.add(ticket)
+    session.flush()
+    return finalize_ticket(session, ticket, None, None, None)
+
+
+def encode_cursor(ticket: Ticket) -> str:
+    raw = f"{ticket.created_at.isoformat()}|{ticket.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, ticket_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(ticket_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+
+def filter_tickets(query: SelectOfScalar, filters: Optional[TicketFilters]) -> SelectOfScalar:
+    if filters is None:
+        return query
+    if filters.status:
+        query = query.where(Ticket.status == filters.status)
+    if filters.direction:
+        query = query.where(Ticket.direction == filters.direction)
+    if filters.lane_id is not None:
+        query = query.where(Ticket.lane_id == filters.lane_id)
+    if filters.plate:
+        # A range rather than LIKE: SQLite's LIKE is case-insensitive and skips the index.
+        # The range finds the matching plates through ix_ticket_plate_key_created_at, but
+        # spans several keys, so those rows are sorted by created_at for each page.
+        prefix = normalize_plate(filters.plate)
+        query = query.where(Ticket.plate_key >= prefix, Ticket.plate_key < prefix + "\U0010ffff")
+    if filters.partner:
+        query = query.where(Ticket.partner_name == filters.partner)
+    if filters.product:
+        query = query.where(Ticket.product_name == filters.product)
+    if filters.created_from:
+        query = query.where(Ticket.created_at >= filters.created_from)
+    if filters.created_to:
+        query = query.where(Ticket.created_at < filters.created_to)
+    return query
+
+
+def list_tickets(
+    session: Session,
+    limit: int = 50,
+    filters: Optional[TicketFilters] = None,
+    cursor: Optional[tuple[datetime, int]] = None,
+) -> List[Ticket]:
+    """
+    Newest first. Pass the (created_at, id) of the last ticket seen to get the next page.
+    Archived months are consulted when the page reaches back into them.
+    """
+    query = filter_tickets(select(Ticket), filters)
+    if cursor is not None:
+        query = query.where(tuple_(Ticket.created_at, Ticket.id) < tuple_(*cursor))
+    query = query.order_by(Ticket.created_at.desc(), Ticket.id.desc()).limit(limit)
+    tickets = session.exec(query).all()
+    return archive_service.list_archived_tickets(session, tickets, query, limit, filters, cursor)
+
+
+def get_ticket(session: Session, ticket_id: int) -> Optional[Ticket]:
+    return session.get(Ticket, ticket_id) or archive_service.get_archived_ticket(session, ticket_id)
@@ -0,0 +1,113 @@
+import asyncio
+import threading
+from datetime import datetime
+from typing import Optional
+
+from app.schemas import WeightReading
+
+
+class WeightSubscription:
+    """
+    Single-slot mailbox for one streaming client. Only the newest reading is kept,
+    so a slow client skips intermediate frames instead of building up a backlog.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+        self._loop_thread = threading.get_ident()
+        self._event = asyncio.Event()
+        self._lock = threading.Lock()
+        self._latest: Optional[WeightReading] = None
+        self._signalled = False
+        self.closed = False
+
+    def offer(self, reading: WeightReading) -> None:
+        with self._lock:
+            self._latest = reading
+            if self._signalled or self.closed:
+                return
+            self._signalled = True
+        self._wake()
+
+    def close(self) -> None:
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+        self._wake()
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[WeightReading]:
+        """Wait for the next reading; returns None on timeout or once closed."""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        with self._lock:
+            self._event.clear()
+            self._signalled = False
+            reading, self._latest = self._latest, None
+        return reading
+
+    def _wake(self) -> None:
+        if threading.get_ident() == self._loop_thread:
+            self._event.set()
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._event.set)
+        except RuntimeError:
+            # Event loop already closed (shutdown); nothing left to wake.
+            pass
+
+
+class WeightBroadcaster:
+    """
+    Fans live readings out to streaming subscribers. Publishers (the serial reader
+    or simulator threads) call `publish` for every frame; only readings that differ
+    from the previous one are forwarded.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._subscribers: set[WeightSubscription] = set()
+        self._last_key: Optional[tuple] = None
+        self._last: Optional[WeightReading] = None
+
+    def subscribe(self) -> WeightSubscription:
+        subscription = WeightSubscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(subscription)
+            last = self._last
+        if last is not None:
+            subscription.offer(last)
+        return subscription
+
+    def unsubscribe(self, subscription: WeightSubscription) -> None:
+        subscription.close()
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(
+        self,
+        weight_kg: Optional[float],
+        captured_at: Optional[datetime],
+        connected: bool,
+        source: str,
+        stable: bool = False,
+    ) -> None:
+        key = (weight_kg, connected, source, stable)
+        with self._lock:
+            if key == self._last_key:
+                return
+            self._last_key = key
+            reading = WeightReading(
+                weight_kg=weight_kg, captured_at=captured_at, connected=connected, source=source, stable=stable
+            )
+            self._last = reading
+            subscribers = tuple(self._subscribers)
+        for subscription in subscribers:
+            subscription.offer(reading)
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
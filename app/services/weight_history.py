@@ -0,0 +1,153 @@
+import math
+import threading
+from array import array
+from bisect import bisect_left
+from typing import NamedTuple
+
+# NumPy is optional (bucketing falls back to a pure Python pass) and is imported on the
+# first history query rather than at startup, where it would cost ~0.1 s.
+np = None
+_numpy_checked = False
+
+
+def _load_numpy():
+    global np, _numpy_checked
+    if not _numpy_checked:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        np, _numpy_checked = numpy, True
+    return np
+
+
+# Raw-frame status codes stored alongside each sample.
+STATUS_OK = 0
+STATUS_MOTION = 1
+STATUS_OVERLOAD = 2
+
+
+class HistoryBucket(NamedTuple):
+    start: float
+    min_kg: float
+    max_kg: float
+    mean_kg: float
+    samples: int
+    motion_samples: int
+
+
+class WeightHistory:
+    """
+    Fixed-capacity ring buffer of (timestamp, weight, status) samples. Storage is
+    preallocated typed arrays, so appending a frame only overwrites slots in place.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = max(1, capacity)
+        self._times = array("d", bytes(8 * self.capacity))
+        self._weights = array("d", bytes(8 * self.capacity))
+        self._status = array("b", bytes(self.capacity))
+        self._next = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, timestamp: float, weight: float, status: int = STATUS_OK) -> None:
+        with self._lock:
+            index = self._next
+            self._times[index] = timestamp
+            self._weights[index] = weight
+            self._status[index] = status
+            self._next = index + 1 if index + 1 < self.capacity else 0
+            if self._size < self.capacity:
+                self._size += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._next = 0
+            self._size = 0
+
+    def snapshot(self, since: float = 0.0) -> tuple[array, array, array]:
+        """Copy out samples with timestamp >= `since`, oldest first."""
+        with self._lock:
+            if self._size < self.capacity:
+                times = self._times[: self._size]
+                weights = self._weights[: self._size]
+                status = self._status[: self._size]
+            else:
+                head = self._next
+                times = self._times[head:] + self._times[:head]
+                weights = self._weights[head:] + self._weights[:head]
+                status = self._status[head:] + self._status[:head]
+        start = bisect_left(times, since)
+        if start:
+            return times[start:], weights[start:], status[start:]
+        return times, weights, status
+
+    def buckets(self, since: float, resolution: float) -> list[HistoryBucket]:
+        """Downsample samples newer than `since` into min/max/mean buckets."""
+        times, weights, status = self.snapshot(since)
+        if not times:
+            return []
+        if _load_numpy() is not None:
+            return _buckets_numpy(times, weights, status, since, resolution)
+        return _buckets_python(times, weights, status, since, resolution)
+
+
+def _buckets_numpy(
+    times: array, weights: array, status: array, since: float, resolution: float
+) -> list[HistoryBucket]:
+    t = np.frombuffer(times, dtype=np.float64)
+    w = np.frombuffer(weights, dtype=np.float64)
+    s = np.frombuffer(status, dtype=np.int8)
+    index = np.floor((t - since) / resolution).astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, index[1:] != index[:-1]])
+    counts = np.diff(np.r_[starts, len(w)])
+    mins = np.minimum.reduceat(w, starts)
+    maxs = np.maximum.reduceat(w, starts)
+    means = np.add.reduceat(w, starts) / counts
+    motion = np.add.reduceat((s == STATUS_MOTION).astype(np.int64), starts)
+    bucket_starts = since + index[starts] * resolution
+    return [
+        HistoryBucket(*row)
+        for row in zip(
+            bucket_starts.tolist(),
+            mins.tolist(),
+            maxs.tolist(),
+            means.tolist(),
+            counts.tolist(),
+            motion.tolist(),
+        )
+    ]
+
+
+def _buckets_python(
+    times: array, weights: array, status: array, since: float, resolution: float
+) -> list[HistoryBucket]:
+    result: list[HistoryBucket] = []
+    current = None
+    low = high = total = 0.0
+    count = motion = 0
+    for timestamp, weight, flag in zip(times, weights, status):
+        index = math.floor((timestamp - since) / resolution)
+        if index != current:
+            if count:
+                result.append(
+                    HistoryBucket(since + current * resolution, low, high, total / count, count, motion)
+                )
+            current = index
+            low = high = total = weight
+            count = 1
+            motion = 1 if flag == STATUS_MOTION else 0
+            continue
+        low = min(low, weight)
+        high = max(high, weight)
+        total += weight
+        count += 1
+        if flag == STATUS_MOTION:
+            motion += 1
+    if count:
+        result.append(HistoryBucket(since + current * resolution, low, high, total / count, count, motion))
+    return result
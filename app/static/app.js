@@ -1,3 +1,6 @@
+// Each operator screen drives one weighbridge lane: open the UI as /?lane=2 for lane 2.
+const lane = Number(new URLSearchParams(location.search).get("lane")) || 1;
+
 const api = async (path, options = {}) => {
     const opts = {
         headers: { "Content-Type": "application/json" },
@@ -27,25 +30,51 @@ function toast(message, isError = false) {
     setTimeout(() => toastEl.classList.remove("show"), 2600);
 }
 
+function renderWeight(data) {
+    const value = data.weight_kg != null ? data.weight_kg.toFixed(2) : "--.-";
+    document.getElementById("live-weight").textContent = value;
+    document.getElementById("weight-meta").textContent = data.captured_at
+        ? `Updated ${new Date(data.captured_at).toLocaleTimeString()} (${data.source}${data.stable ? ", stable" : ""})`
+        : "Waiting for indicator…";
+    document.getElementById("serial-status").textContent = data.connected
+        ? `Lane ${lane} · Serial: live (${data.source})`
+        : `Lane ${lane} · Serial: ${data.source}`;
+}
+
 async function refreshWeight() {
     try {
-        const data = await api("/api/weight/live");
-        const value = data.weight_kg != null ? data.weight_kg.toFixed(2) : "--.-";
-        document.getElementById("live-weight").textContent = value;
-        document.getElementById("weight-meta").textContent = data.captured_at
-            ? `Updated ${new Date(data.captured_at).toLocaleTimeString()} (${data.source})`
-            : "Waiting for indicator…";
-        document.getElementById("serial-status").textContent = data.connected
-            ? `Serial: live (${data.source})`
-            : `Serial: ${data.source}`;
+        renderWeight(await api(`/api/weight/live?lane=${lane}`));
     } catch (err) {
         console.error(err);
     }
 }
 
+// Live weight is pushed over a WebSocket; fall back to polling while it is down.
+let weightPoll = null;
+function startWeightPolling() {
+    if (!weightPoll) weightPoll = setInterval(refreshWeight, 1000);
+}
+
+function stopWeightPolling() {
+    clearInterval(weightPoll);
+    weightPoll = null;
+}
+
+function streamWeight() {
+    if (!("WebSocket" in window)) return startWeightPolling();
+    const scheme = location.protocol === "https:" ? "wss" : "ws";
+    const socket = new WebSocket(`${scheme}://${location.host}/api/weight/ws?lane=${lane}`);
+    socket.onopen = stopWeightPolling;
+    socket.onmessage = (event) => renderWeight(JSON.parse(event.data));
+    socket.onclose = () => {
+        startWeightPolling();
+        setTimeout(streamWeight, 3000);
+    };
+}
+
 async function loadSerialSettings() {
     try {
-        const data = await api("/api/serial/settings");
+        const data = await api(`/api/serial/settings?lane=${lane}`);
         const form = document.getElementById("serial-form");
         form.port.value = data.port || "";
         form.baudrate.value = data.baudrate || 9600;
@@ -54,8 +83,8 @@ async function loadSerialSettings() {
         form.stopbits.value = data.stopbits || 1;
         form.simulate.checked = data.simulate || false;
         document.getElementById("serial-status").textContent = data.connected
-            ? `Serial: live (${data.port || data.simulate ? "simulated" : "unknown"})`
-            : "Serial: idle";
+            ? `Lane ${lane} · Serial: live (${data.port || data.simulate ? "simulated" : "unknown"})`
+            : `Lane ${lane} · Serial: idle`;
     } catch (err) {
         toast(`Could not load serial config: ${err.message}`, true);
     }
@@ -73,7 +102,7 @@ async function connectSerial(event) {
         simulate: form.simulate.checked,
     };
     try {
-        await api("/api/serial/connect", { method: "POST", body: payload });
+        await api(`/api/serial/connect?lane=${lane}`, { method: "POST", body: payload });
         toast("Serial connected");
         await loadSerialSettings();
     } catch (err) {
@@ -83,7 +112,7 @@ async function connectSerial(event) {
 
 async function disconnectSerial() {
     try {
-        await api("/api/serial/disconnect", { method: "POST" });
+        await api(`/api/serial/disconnect?lane=${lane}`, { method: "POST" });
         toast("Serial disconnected");
         await loadSerialSettings();
     } catch (err) {
@@ -102,9 +131,16 @@ async function handleWeighIn(event) {
     event.preventDefault();
     const payload = formToPayload(event.target);
     payload.gross_kg = payload.gross_kg ? Number(payload.gross_kg) : null;
+    payload.capture_mode = payload.capture_mode || "instant";
+    payload.tare_mode = payload.tare_mode || "weighed";
+    payload.lane_id = lane;
     try {
         const ticket = await api("/api/tickets/weigh-in", { method: "POST", body: payload });
-        toast(`Gross captured for ticket ${ticket.id}`);
+        if (ticket.status === "finalized") {
+            toast(`Ticket ${ticket.ticket_no} finalized with stored tare (net ${ticket.net_kg.toFixed(2)} kg)`);
+        } else {
+            toast(`Gross captured for ticket ${ticket.id}`);
+        }
         event.target.reset();
         await loadTickets();
     } catch (err) {
@@ -117,7 +153,11 @@ async function handleWeighOut(event) {
     const payload = formToPayload(event.target);
     const id = Number(payload.ticket_id);
     if (!id) return toast("Ticket ID is required", true);
-    const body = { tare_kg: payload.tare_kg ? Number(payload.tare_kg) : null };
+    const body = {
+        tare_kg: payload.tare_kg ? Number(payload.tare_kg) : null,
+        capture_mode: payload.capture_mode || "instant",
+        lane_id: lane,
+    };
     try {
         const ticket = await api(`/api/tickets/${id}/weigh-out`, { method: "POST", body });
         toast(`Tare captured for ticket ${ticket.id}`);
@@ -175,8 +215,10 @@ async function loadTickets() {
 
 async function loadQueue() {
     try {
-        const queue = await api("/api/sync/queue");
-        document.getElementById("sync-status").textContent = `Sync queue: ${queue.length}`;
+        const stats = await api("/api/sync/stats");
+        const waiting = stats.counts.pending + stats.counts.failed;
+        const dead = stats.counts.dead ? ` (${stats.counts.dead} dead)` : "";
+        document.getElementById("sync-status").textContent = `Sync queue: ${waiting}${dead}`;
     } catch (err) {
         console.error(err);
     }
@@ -205,5 +247,5 @@ loadSerialSettings();
 loadTickets();
 loadQueue();
 refreshWeight();
-setInterval(refreshWeight, 1000);
+streamWeight();
 setInterval(loadQueue, 6000);
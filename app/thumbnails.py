@@ -0,0 +1,44 @@
+"""
+Image variants for ticket attachments, rendered in worker processes.
+
+Kept outside `app.services` and free of app imports: worker processes are spawned and
+import only this module (and Pillow), not the database, serial or sync machinery.
+"""
+import importlib.util
+import os
+import tempfile
+from functools import lru_cache
+from typing import Sequence
+
+
+@lru_cache
+def available() -> bool:
+    # Pillow is optional (attachments are then stored without variants). Only look for
+    # it here; the import itself happens in the worker processes.
+    return importlib.util.find_spec("PIL") is not None
+
+
+def render_variants(source: str, targets: Sequence[tuple[str, int, int]]) -> None:
+    """
+    Write a JPEG of `source` for each (path, max edge in px, quality) in `targets`.
+    Each file is written under a unique temporary name and renamed, so readers never
+    see a partial image and concurrent renders of one source cannot collide.
+    """
+    from PIL import Image, ImageOps
+
+    largest = max(size for _, size, _ in targets)
+    with Image.open(source) as image:
+        # JPEG can decode straight to a reduced scale; far cheaper than a full decode.
+        image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        for path, size, quality in targets:
+            variant = image.copy()
+            variant.thumbnail((size, size), Image.LANCZOS)
+            fd, partial = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as handle:
+                    variant.save(handle, "JPEG", quality=quality, optimize=True, progressive=True)
+                os.replace(partial, path)
+            except BaseException:
+                os.unlink(partial)
+                raise
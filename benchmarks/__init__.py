@@ -0,0 +1,3 @@
+"""
+Standalone performance benchmarks. Run individual modules with `python -m benchmarks.<name>`.
+"""
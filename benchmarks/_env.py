@@ -0,0 +1,28 @@
+"""
+Setup shared by the benchmark scripts. The app reads its settings (and opens the
+database) once, on first import, so `scratch_data_dir` must run before any `app`
+import; scripts import the app inside `main()` for that reason.
+"""
+import argparse
+import os
+import tempfile
+
+
+def argument_parser(doc: str) -> argparse.ArgumentParser:
+    """Parser whose `--help` shows the script's docstring, usage examples included."""
+    return argparse.ArgumentParser(description=doc, formatter_class=argparse.RawDescriptionHelpFormatter)
+
+
+def scratch_data_dir(prefix: str = "wb-bench-", **settings: str) -> str:
+    """
+    Point the app at a fresh temporary data directory (database, attachments, captures,
+    archives) and apply any extra `settings` as environment variables. Returns the path.
+    """
+    data_dir = tempfile.mkdtemp(prefix=prefix)
+    os.environ.update(
+        DATA_DIR=data_dir,
+        DB_PATH=os.path.join(data_dir, "bench.db"),
+        ATTACHMENTS_DIR=os.path.join(data_dir, "attachments"),
+        **settings,
+    )
+    return data_dir
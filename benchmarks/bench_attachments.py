@@ -0,0 +1,96 @@
+"""
+Attachment upload latency with variants rendered in the process pool, compared with the
+time rendering the same variants inline would add to every request. Needs Pillow.
+
+    python -m benchmarks.bench_attachments --uploads 40 --size 4000x3000
+"""
+import io
+import json
+import os
+import time
+
+from benchmarks._env import argument_parser, scratch_data_dir
+
+
+def main() -> None:
+    parser = argument_parser(__doc__)
+    parser.add_argument("--uploads", type=int, default=40)
+    parser.add_argument("--size", default="4000x3000", help="camera image size, WIDTHxHEIGHT")
+    args = parser.parse_args()
+    width, height = (int(part) for part in args.size.split("x"))
+
+    data_dir = scratch_data_dir()
+
+    import random
+
+    from fastapi.testclient import TestClient
+    from PIL import Image
+
+    from app import thumbnails
+    from app.main import app
+    from app.services.attachment_service import variant_pool
+
+    def camera_jpeg(seed: int) -> bytes:
+        # Noise keeps every image distinct (no dedupe) and realistically hard to compress.
+        rng = random.Random(seed)
+        image = Image.frombytes("RGB", (width // 8, height // 8), rng.randbytes(width // 8 * height // 8 * 3))
+        buffer = io.BytesIO()
+        image.resize((width, height)).save(buffer, "JPEG", quality=90)
+        return buffer.getvalue()
+
+    images = [camera_jpeg(seed) for seed in range(args.uploads)]
+
+    sample = os.path.join(data_dir, "sample.jpg")
+    with open(sample, "wb") as handle:
+        handle.write(images[0])
+    targets = [(os.path.join(data_dir, "t.jpg"), 320, 80), (os.path.join(data_dir, "w.jpg"), 1600, 80)]
+    started = time.perf_counter()
+    thumbnails.render_variants(sample, targets)
+    inline_ms = (time.perf_counter() - started) * 1000
+
+    with TestClient(app) as client:
+        ticket = client.post(
+            "/api/tickets/weigh-in",
+            json={
+                "vehicle_plate": "BENCH1",
+                "direction": "in",
+                "partner_name": "Bench",
+                "product_name": "Bench",
+                "operator_name": "bench",
+                "gross_kg": 30_000,
+            },
+        ).json()
+        latencies = []
+        run_started = time.perf_counter()
+        for index, body in enumerate(images):
+            started = time.perf_counter()
+            client.post(
+                f"/api/tickets/{ticket['id']}/attachments",
+                params={"kind": "camera", "filename": f"deck-{index}.jpg"},
+                content=body,
+                headers={"Content-Type": "image/jpeg"},
+            ).raise_for_status()
+            latencies.append(time.perf_counter() - started)
+        uploaded = time.perf_counter() - run_started
+        while variant_pool._pending:
+            time.sleep(0.01)
+        all_ready = time.perf_counter() - run_started
+
+    latencies.sort()
+    print(
+        json.dumps(
+            {
+                "uploads": args.uploads,
+                "mean_image_kb": round(sum(map(len, images)) / len(images) / 1024, 1),
+                "upload_p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+                "upload_max_ms": round(latencies[-1] * 1000, 2),
+                "inline_render_ms": round(inline_ms, 2),
+                "uploads_seconds": round(uploaded, 3),
+                "variants_ready_seconds": round(all_ready, 3),
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
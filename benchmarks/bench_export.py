@@ -0,0 +1,88 @@
+"""
+Throughput and peak Python memory of the streaming ticket export at growing table
+sizes. Peak memory should stay flat as the row count grows.
+
+    python -m benchmarks.bench_export --rows 100000 500000
+"""
+import json
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from benchmarks._env import argument_parser, scratch_data_dir
+
+
+def _load(engine, start: int, count: int) -> None:
+    columns = (
+        "status, direction, lane_id, vehicle_plate, partner_name, product_name, operator_name, "
+        "gross_kg, tare_kg, net_kg, qc_status, created_at, updated_at"
+    )
+    rng = random.Random(start)
+    base = datetime(2020, 1, 1)
+    with engine.begin() as conn:
+        cursor = conn.connection.cursor()
+        rows = []
+        for n in range(start, start + count):
+            stamp = (base + timedelta(seconds=n * 90)).isoformat(" ")
+            rows.append(
+                (
+                    "finalized",
+                    "in",
+                    1,
+                    f"PLT{n:07d}",
+                    f"Partner {rng.randint(1, 300)}",
+                    f"Product {rng.randint(1, 40)}",
+                    "bench",
+                    30000.0,
+                    12000.0,
+                    18000.0,
+                    "pending",
+                    stamp,
+                    stamp,
+                )
+            )
+        cursor.executemany(f"INSERT INTO ticket ({columns}) VALUES ({', '.join('?' * 13)})", rows)
+
+
+def main() -> None:
+    parser = argument_parser(__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 500_000])
+    args = parser.parse_args()
+
+    scratch_data_dir()
+
+    from app.database import engine, init_db
+    from app.services.export_service import stream_tickets
+
+    init_db()
+    loaded = 0
+    for target in sorted(args.rows):
+        _load(engine, loaded, target - loaded)
+        loaded = target
+        for fmt in ("csv", "ndjson"):
+            started = time.perf_counter()
+            size = sum(len(chunk) for chunk in stream_tickets(None, fmt))
+            elapsed = time.perf_counter() - started
+            # Separate pass for memory: tracing allocations slows the export down a lot.
+            tracemalloc.start()
+            for _ in stream_tickets(None, fmt):
+                pass
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(
+                json.dumps(
+                    {
+                        "rows": target,
+                        "format": fmt,
+                        "seconds": round(elapsed, 2),
+                        "rows_per_second": round(target / elapsed),
+                        "mb": round(size / 1e6, 1),
+                        "peak_python_mb": round(peak / 1e6, 2),
+                    }
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
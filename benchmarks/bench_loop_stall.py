@@ -0,0 +1,74 @@
+"""
+Measure how long a sync pass blocks the event loop. A queue of finalized tickets is
+sent to an in-process fake Odoo (fixed latency per request) while a LoopLagMonitor
+samples the loop every millisecond.
+
+    python -m benchmarks.bench_loop_stall --rows 2000 --latency 0.02
+"""
+import asyncio
+import json
+import time
+
+from benchmarks._env import argument_parser, scratch_data_dir
+
+
+def main() -> None:
+    parser = argument_parser(__doc__)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.02, help="fake Odoo response time in seconds")
+    parser.add_argument("--batch-size", type=int, default=25)
+    args = parser.parse_args()
+
+    scratch_data_dir(ODOO_BASE_URL="http://odoo.invalid", ODOO_API_KEY="bench", SYNC_BATCH_SIZE=str(args.batch_size))
+
+    import httpx
+    from sqlmodel import Session
+
+    from app.database import engine, init_db
+    from app.models import SyncQueue, Ticket
+    from app.services.loop_monitor import LoopLagMonitor
+    from app.services.sync_service import sync_service
+
+    init_db()
+    with Session(engine) as session:
+        for index in range(args.rows):
+            ticket = Ticket(
+                ticket_no=f"BENCH-{index:06d}",
+                status="finalized",
+                direction="in",
+                vehicle_plate=f"BEN{index:04d}",
+                partner_name="Bench",
+                product_name="Bench",
+                operator_name="bench",
+                gross_kg=30_000,
+                tare_kg=12_000,
+                net_kg=18_000,
+            )
+            session.add(ticket)
+            session.flush()
+            session.add(SyncQueue(ticket_id=ticket.id, payload=json.dumps(sync_service._ticket_payload(ticket))))
+        session.commit()
+
+    async def fake_odoo(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(args.latency)
+        body = json.loads(request.content)
+        if "tickets" in body:
+            return httpx.Response(200, json={"results": [{"external_id": t["ticket_no"]} for t in body["tickets"]]})
+        return httpx.Response(200, json={"external_id": body["ticket_no"]})
+
+    async def run() -> dict:
+        monitor = LoopLagMonitor(interval=0.001, stall_threshold=0.01)
+        sync_service.client.open(transport=httpx.MockTransport(fake_odoo))
+        monitor.start()
+        started = time.perf_counter()
+        await sync_service.sync_pending()
+        elapsed = time.perf_counter() - started
+        await monitor.stop()
+        await sync_service.shutdown()
+        return {"rows": args.rows, "seconds": round(elapsed, 3), **monitor.stats()}
+
+    print(json.dumps(asyncio.run(run())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Recording cost of the metrics registry: nanoseconds per counter increment and histogram
+observation (cached series and label lookup per call), single-threaded and with several
+threads recording into the same series.
+
+    python -m benchmarks.bench_metrics --ops 1000000 --threads 4
+"""
+import json
+import threading
+import time
+
+from app.metrics import MetricsRegistry
+from benchmarks._env import argument_parser
+
+
+def _per_op(fn, ops: int, threads: int) -> float:
+    per_thread = ops // threads
+    workers = [threading.Thread(target=fn, args=(per_thread,)) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - started) / (per_thread * threads) * 1e9
+
+
+def bench(ops: int, threads: int) -> list[dict]:
+    registry = MetricsRegistry()
+    counter = registry.counter("bench_events_total", "events", ("lane",))
+    histogram = registry.histogram("bench_seconds", "latency", ("route", "status"))
+    series = counter.labels(1)
+    timings = histogram.labels("/api/tickets", 200)
+
+    def cached_inc(n: int) -> None:
+        for _ in range(n):
+            series.inc()
+
+    def labelled_inc(n: int) -> None:
+        for _ in range(n):
+            counter.labels(1).inc()
+
+    def cached_observe(n: int) -> None:
+        for i in range(n):
+            timings.observe((i % 1000) / 10000)
+
+    def labelled_observe(n: int) -> None:
+        for i in range(n):
+            histogram.labels("/api/tickets", 200).observe((i % 1000) / 10000)
+
+    def empty(n: int) -> None:
+        for _ in range(n):
+            pass
+
+    baseline = _per_op(empty, ops, threads)
+    results = []
+    for name, fn in (
+        ("counter.inc", cached_inc),
+        ("counter.labels().inc", labelled_inc),
+        ("histogram.observe", cached_observe),
+        ("histogram.labels().observe", labelled_observe),
+    ):
+        results.append({"op": name, "threads": threads, "ns_per_op": round(_per_op(fn, ops, threads) - baseline, 1)})
+    render_started = time.perf_counter()
+    registry.render()
+    results.append({"op": "render", "ms": round((time.perf_counter() - render_started) * 1000, 3)})
+    # Lost updates under contention would show up as a short count.
+    expected = 2 * (ops // threads) * threads
+    results.append({"op": "consistency", "expected": expected, "counted": int(series.value)})
+    return results
+
+
+def main() -> None:
+    parser = argument_parser(__doc__)
+    parser.add_argument("--ops", type=int, default=1_000_000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    for threads in sorted({1, args.threads}):
+        for result in bench(args.ops, threads):
+            print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
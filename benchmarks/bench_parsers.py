@@ -0,0 +1,60 @@
+"""
+Micro-benchmark for the indicator protocol parsers: frames parsed per second for each
+registered format, fed in serial-sized chunks.
+
+    python -m benchmarks.bench_parsers --frames 200000 --chunk 64
+"""
+import json
+import random
+import time
+
+from app.services.indicator_protocols import PARSERS, create_parser
+from benchmarks._env import argument_parser
+
+
+def _sample_frame(protocol: str, weight: int) -> bytes:
+    if protocol in ("continuous", "polled"):
+        return f"01 ST,GS,+{weight:07d}.0kg\r\n".encode()
+    if protocol == "stx_etx":
+        return f"\x02 +{weight:07d}kg G\x03".encode()
+    if protocol == "fixed":
+        return ("=" + f"{weight:05d}.0"[::-1]).encode()
+    if protocol == "toledo":
+        return b"\x02" + bytes([0x22, 0x30, 0x20]) + f"{weight:06d}000000\r".encode()
+    raise ValueError(protocol)
+
+
+def bench(protocol: str, frames: int, chunk: int) -> dict:
+    stream = b"".join(_sample_frame(protocol, random.randint(0, 60000)) for _ in range(frames))
+    chunks = [stream[i : i + chunk] for i in range(0, len(stream), chunk)]
+    parser = create_parser(protocol)
+
+    parsed = 0
+    started = time.perf_counter()
+    for data in chunks:
+        parsed += len(parser.feed(data))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "protocol": protocol,
+        "frames": parsed,
+        "errors": parser.errors,
+        "seconds": round(elapsed, 4),
+        "frames_per_second": round(parsed / elapsed),
+        "mb_per_second": round(len(stream) / elapsed / 1e6, 2),
+    }
+
+
+def main() -> None:
+    parser = argument_parser(__doc__)
+    parser.add_argument("--frames", type=int, default=200_000)
+    parser.add_argument("--chunk", type=int, default=64, help="bytes per feed() call (one serial read)")
+    parser.add_argument("--protocol", choices=sorted(PARSERS), action="append")
+    args = parser.parse_args()
+
+    for protocol in args.protocol or sorted(PARSERS):
+        print(json.dumps(bench(protocol, args.frames, args.chunk)))
+
+
+if __name__ == "__main__":
+    main()
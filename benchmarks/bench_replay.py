@@ -0,0 +1,79 @@
+"""
+Replay a serial capture through the full lane path (parser, history, stability
+detector, broadcaster) as fast as possible and report frames per second.
+
+Without --file a synthetic capture is generated: trucks ramping onto the deck,
+settling with indicator noise, and driving off.
+
+    python -m benchmarks.bench_replay --trucks 500
+    python -m benchmarks.bench_replay --file lane1-20240101-080000.wbcap --protocol continuous
+"""
+import json
+import random
+import time
+
+from benchmarks._env import argument_parser, scratch_data_dir
+
+
+def _synthetic_stream(trucks: int) -> list[bytes]:
+    chunks = []
+    for _ in range(trucks):
+        target = random.uniform(8_000, 45_000)
+        profile = [target * step / 20 for step in range(20)]
+        profile += [target + random.uniform(-10, 10) for _ in range(60)]
+        profile += [target * (20 - step) / 20 for step in range(20)]
+        for weight in profile:
+            state = "US" if weight < target * 0.95 else "ST"
+            chunks.append(f"{state},GS,+{weight:09.1f}kg\r\n".encode())
+    return chunks
+
+
+def main() -> None:
+    parser = argument_parser(__doc__)
+    parser.add_argument("--file", help="capture file name under data_dir/captures")
+    parser.add_argument("--protocol", default="continuous")
+    parser.add_argument("--trucks", type=int, default=500)
+    args = parser.parse_args()
+
+    if not args.file:
+        # A recorded capture is read from the configured data_dir; a synthetic one goes to scratch.
+        scratch_data_dir()
+
+    from app.schemas import SerialSettingsPayload
+    from app.services.serial_capture import CaptureWriter
+    from app.services.serial_manager import LaneReader
+
+    name = args.file
+    if not name:
+        writer = CaptureWriter(lane_id=1)
+        for chunk in _synthetic_stream(args.trucks):
+            writer.write(chunk)
+        writer.close()
+        name = writer.path.name
+
+    reader = LaneReader(lane_id=1)
+    reader.configure(
+        SerialSettingsPayload(protocol=args.protocol, replay_file=name, replay_speed=0, replay_loop=False)
+    )
+
+    started = time.perf_counter()
+    reader.connect()
+    while reader.get_reading().source == "replay":
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - started
+    reader.disconnect()
+
+    print(
+        json.dumps(
+            {
+                "capture": name,
+                "frames": reader.frames_received,
+                "seconds": round(elapsed, 3),
+                "frames_per_second": round(reader.frames_received / elapsed),
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
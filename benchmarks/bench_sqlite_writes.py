@@ -0,0 +1,120 @@
+"""
+Concurrent write throughput of the SQLite storage profile. Several "operator"
+threads create and update tickets while a "sync" thread marks queue rows as sent,
+first on an engine with SQLite defaults (rollback journal, synchronous=FULL), then
+on one configured like the app's engine.
+
+    python -m benchmarks.bench_sqlite_writes --threads 8 --seconds 5
+"""
+import json
+import os
+import threading
+import time
+
+from benchmarks._env import argument_parser, scratch_data_dir
+
+
+def main() -> None:
+    parser = argument_parser(__doc__)
+    parser.add_argument("--threads", type=int, default=8, help="concurrent operator threads")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    # The app's engine is not used: each profile gets its own database file in here.
+    data_dir = scratch_data_dir()
+
+    from sqlalchemy.exc import OperationalError
+    from sqlmodel import Session, SQLModel, create_engine, select
+
+    from app.config import get_settings
+    from app.database import configure_storage
+    from app.models import SyncQueue, Ticket
+
+    settings = get_settings()
+
+    def run(profile: str) -> dict:
+        url = f"sqlite:///{os.path.join(data_dir, profile + '.db')}"
+        if profile == "default":
+            engine = create_engine(url, connect_args={"check_same_thread": False})
+        else:
+            engine = create_engine(
+                url,
+                connect_args={"check_same_thread": False, "timeout": settings.sqlite_busy_timeout_ms / 1000},
+                pool_size=settings.db_pool_size,
+                max_overflow=settings.db_max_overflow,
+                pool_timeout=settings.db_pool_timeout_seconds,
+            )
+            configure_storage(engine, settings)
+        SQLModel.metadata.create_all(engine)
+
+        deadline = time.perf_counter() + args.seconds
+        counts = {"commits": 0, "locked": 0}
+        lock = threading.Lock()
+
+        def bump(key: str) -> None:
+            with lock:
+                counts[key] += 1
+
+        def operator(worker: int) -> None:
+            serial = 0
+            while time.perf_counter() < deadline:
+                serial += 1
+                try:
+                    with Session(engine) as session:
+                        ticket = Ticket(
+                            direction="in",
+                            vehicle_plate=f"T{worker}-{serial}",
+                            partner_name="Bench",
+                            product_name="Bench",
+                            operator_name=f"op{worker}",
+                            gross_kg=30_000,
+                        )
+                        session.add(ticket)
+                        session.commit()
+                        bump("commits")
+                        ticket.tare_kg = 12_000
+                        ticket.net_kg = 18_000
+                        ticket.status = "finalized"
+                        session.add(ticket)
+                        session.add(SyncQueue(ticket_id=ticket.id, payload="{}"))
+                        session.commit()
+                        bump("commits")
+                except OperationalError:
+                    bump("locked")
+
+        def syncer() -> None:
+            while time.perf_counter() < deadline:
+                try:
+                    with Session(engine) as session:
+                        rows = session.exec(select(SyncQueue).where(SyncQueue.status == "pending").limit(25)).all()
+                        for row in rows:
+                            row.status = "sent"
+                            row.attempts += 1
+                            session.add(row)
+                        session.commit()
+                        bump("commits")
+                except OperationalError:
+                    bump("locked")
+
+        threads = [threading.Thread(target=operator, args=(n,)) for n in range(args.threads)]
+        threads.append(threading.Thread(target=syncer))
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        engine.dispose()
+        return {
+            "profile": profile,
+            "commits": counts["commits"],
+            "commits_per_second": round(counts["commits"] / elapsed),
+            "locked_errors": counts["locked"],
+        }
+
+    for profile in ("default", "tuned"):
+        print(json.dumps(run(profile)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Ticket list page latency at increasing depth in a large table: keyset pagination on
+(created_at, id) as used by GET /api/tickets, next to the equivalent OFFSET query.
+
+    python -m benchmarks.bench_ticket_pages --rows 1000000
+"""
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from benchmarks._env import argument_parser, scratch_data_dir
+
+
+def main() -> None:
+    parser = argument_parser(__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    scratch_data_dir()
+
+    from sqlmodel import Session, func, select
+
+    from app.database import engine, init_db
+    from app.models import Ticket
+    from app.schemas import TicketFilters
+    from app.services import ticket_service
+
+    init_db()
+    started = time.perf_counter()
+    columns = (
+        "status, direction, lane_id, vehicle_plate, partner_name, product_name, operator_name, "
+        "gross_kg, tare_kg, net_kg, qc_status, created_at, updated_at"
+    )
+    base = datetime(2020, 1, 1)
+    rng = random.Random(7)
+    with engine.begin() as conn:
+        raw = conn.connection.cursor()
+        for chunk_start in range(0, args.rows, 50_000):
+            rows = []
+            for n in range(chunk_start, min(args.rows, chunk_start + 50_000)):
+                stamp = (base + timedelta(seconds=n * 90)).isoformat(" ")
+                rows.append(
+                    (
+                        rng.choice(("finalized",) * 8 + ("weigh_in", "weigh_out")),
+                        rng.choice(("in", "out")),
+                        rng.randint(1, 4),
+                        f"{rng.choice('ABCDEFGH')}{rng.randint(100, 999)}{rng.choice('XYZ')}",
+                        f"Partner {rng.randint(1, 300)}",
+                        f"Product {rng.randint(1, 40)}",
+                        "bench",
+                        30000.0,
+                        12000.0,
+                        18000.0,
+                        "pending",
+                        stamp,
+                        stamp,
+                    )
+                )
+            raw.executemany(f"INSERT INTO ticket ({columns}) VALUES ({', '.join('?' * 13)})", rows)
+        raw.execute("ANALYZE")
+    print(json.dumps({"rows": args.rows, "load_seconds": round(time.perf_counter() - started, 1)}))
+
+    def timed(fn) -> float:
+        best = float("inf")
+        for _ in range(args.repeat):
+            began = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - began)
+        return round(best * 1000, 3)
+
+    scenarios = {
+        "none": None,
+        "status=finalized": TicketFilters(status="finalized"),
+        "partner=Partner 42": TicketFilters(partner="Partner 42"),
+    }
+    with Session(engine) as session:
+        for name, filters in scenarios.items():
+            matching = session.exec(ticket_service.filter_tickets(select(func.count(Ticket.id)), filters)).one()
+            for fraction in (0.0, 0.1, 0.5, 0.99):
+                depth = int(matching * fraction)
+                anchor = None
+                if depth:
+                    anchor = session.exec(
+                        ticket_service.filter_tickets(select(Ticket), filters)
+                        .order_by(Ticket.created_at.desc(), Ticket.id.desc())
+                        .offset(depth - 1)
+                        .limit(1)
+                    ).one()
+                cursor = (anchor.created_at, anchor.id) if anchor else None
+                keyset = timed(
+                    lambda: ticket_service.list_tickets(session, limit=args.page_size, filters=filters, cursor=cursor)
+                )
+                offset = timed(
+                    lambda: session.exec(
+                        ticket_service.filter_tickets(select(Ticket), filters)
+                        .order_by(Ticket.created_at.desc(), Ticket.id.desc())
+                        .offset(depth)
+                        .limit(args.page_size)
+                    ).all()
+                )
+                print(json.dumps({"filter": name, "depth": depth, "keyset_ms": keyset, "offset_ms": offset}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+"""
+End-to-end benchmark: the whole app served over HTTP, a simulated indicator and a local
+fake Odoo, all in one process. Run with `python -m benchmarks.e2e --help`.
+"""
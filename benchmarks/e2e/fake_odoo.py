@@ -0,0 +1,111 @@
+"""
+Local stand-in for the Odoo weighbridge endpoints, plus a helper that serves any ASGI
+app from a background thread on a free loopback port.
+"""
+import asyncio
+import random
+import socket
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+
+@dataclass
+class FakeOdooStats:
+    # Only touched from the fake server's event loop, so no locking.
+    requests: int = 0
+    bulk_requests: int = 0
+    tickets_accepted: int = 0
+    tickets_rejected: int = 0
+    # Uploads whose idempotency key had already been accepted (answered from the first result).
+    duplicates: int = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def create_fake_odoo(
+    latency: float = 0.02, error_rate: float = 0.0, bulk: bool = True, seed: int = 0
+) -> tuple[Starlette, FakeOdooStats]:
+    """
+    `latency` seconds per request; each ticket fails with probability `error_rate`
+    (HTTP 503 for single sends, an `{"error": ...}` entry in bulk results). With
+    `bulk=False` the bulk endpoint answers 404, as on deployments without it. A ticket
+    whose idempotency key was accepted before gets the earlier result again.
+    """
+    rng = random.Random(seed)
+    stats = FakeOdooStats()
+    accepted: dict[str, dict] = {}
+
+    def outcome(ticket: dict, key: Optional[str]) -> dict:
+        if key in accepted:
+            stats.duplicates += 1
+            return accepted[key]
+        if rng.random() < error_rate:
+            stats.tickets_rejected += 1
+            return {"error": "simulated failure"}
+        stats.tickets_accepted += 1
+        result = {"external_id": f"ODOO-{ticket.get('ticket_no')}"}
+        if key:
+            accepted[key] = result
+        return result
+
+    async def single(request: Request) -> JSONResponse:
+        stats.requests += 1
+        ticket = await request.json()
+        await asyncio.sleep(latency)
+        result = outcome(ticket, request.headers.get("idempotency-key"))
+        return JSONResponse(result, status_code=503 if "error" in result else 200)
+
+    async def bulk_send(request: Request) -> JSONResponse:
+        stats.requests += 1
+        if not bulk:
+            return JSONResponse({"detail": "Not Found"}, status_code=404)
+        stats.bulk_requests += 1
+        body = await request.json()
+        await asyncio.sleep(latency)
+        return JSONResponse(
+            {"results": [outcome(ticket, ticket.get("idempotency_key")) for ticket in body["tickets"]]}
+        )
+
+    app = Starlette(
+        routes=[
+            Route("/api/weighbridge/tickets", single, methods=["POST"]),
+            Route("/api/weighbridge/tickets/bulk", bulk_send, methods=["POST"]),
+        ]
+    )
+    return app, stats
+
+
+class BackgroundServer:
+    """uvicorn serving `app` on 127.0.0.1 from its own thread and event loop."""
+
+    def __init__(self, app, name: str) -> None:
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.bind(("127.0.0.1", 0))
+        self.url = f"http://127.0.0.1:{self._socket.getsockname()[1]}"
+        config = uvicorn.Config(app, log_level="warning", access_log=False, lifespan="auto")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(
+            target=self._server.run, kwargs={"sockets": [self._socket]}, name=name, daemon=True
+        )
+
+    def start(self, timeout: float = 30.0) -> "BackgroundServer":
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self._server.started:
+            if not self._thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError(f"{self._thread.name} did not start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=30)
@@ -0,0 +1,210 @@
+"""
+End-to-end benchmark. The app is served over HTTP from this process, a temporary database
+and simulated indicators stand in for the site, and a local fake Odoo receives the sync
+traffic. `--tickets` tickets go through weigh-in (gross from the simulated indicator),
+weigh-out (tare entered by the operator) and finalize, `--concurrency` at a time. After
+the last finalize the run waits for the sync queue to drain.
+
+One JSON object is printed (and written to `--output` if given): per-step p50/p95/p99
+latency, tickets/s, queue drain time, peak RSS and the git commit, so runs can be
+compared across commits.
+
+    python -m benchmarks.e2e --tickets 500 --concurrency 8 --odoo-latency 0.02 --odoo-error-rate 0.05
+"""
+import asyncio
+import json
+import logging
+import math
+import subprocess
+import sys
+import time
+from typing import Optional
+
+import httpx
+
+from benchmarks._env import argument_parser, scratch_data_dir
+from benchmarks.e2e.fake_odoo import BackgroundServer, create_fake_odoo
+
+STEPS = ("weigh_in", "weigh_out", "finalize", "cycle")
+
+
+def percentiles(samples: list[float]) -> dict:
+    """Nearest-rank p50/p95/p99 (plus max) in milliseconds."""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def rank(p: float) -> float:
+        return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+    return {
+        "p50_ms": round(rank(50) * 1000, 2),
+        "p95_ms": round(rank(95) * 1000, 2),
+        "p99_ms": round(rank(99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2),
+    }
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def drive(base_url: str, tickets: int, concurrency: int, lanes: int) -> dict:
+    timings: dict[str, list[float]] = {step: [] for step in STEPS}
+    errors: dict[str, int] = {}
+    indexes = iter(range(tickets))
+    run_tag = f"{int(time.time()) % 100000:05d}"
+
+    async with httpx.AsyncClient(
+        base_url=base_url, timeout=120, limits=httpx.Limits(max_connections=concurrency)
+    ) as client:
+
+        async def step(name: str, path: str, body: dict) -> Optional[dict]:
+            started = time.perf_counter()
+            response = await client.post(path, json=body)
+            timings[name].append(time.perf_counter() - started)
+            if response.status_code != 200:
+                key = f"{name}:{response.status_code}"
+                errors[key] = errors.get(key, 0) + 1
+                return None
+            return response.json()
+
+        async def worker() -> None:
+            # The shared iterator hands every ticket index to exactly one worker.
+            for index in indexes:
+                started = time.perf_counter()
+                ticket = await step(
+                    "weigh_in",
+                    "/api/tickets/weigh-in",
+                    {
+                        "lane_id": 1 + index % lanes,
+                        "vehicle_plate": f"E2E{run_tag}{index:06d}",
+                        "direction": "in",
+                        "partner_name": f"Partner {index % 20}",
+                        "product_name": f"Product {index % 5}",
+                        "operator_name": "bench",
+                    },
+                )
+                if ticket is None:
+                    continue
+                tare = round(ticket["gross_kg"] * 0.4, 1)
+                if await step("weigh_out", f"/api/tickets/{ticket['id']}/weigh-out", {"tare_kg": tare}) is None:
+                    continue
+                if await step("finalize", f"/api/tickets/{ticket['id']}/finalize", {}) is None:
+                    continue
+                timings["cycle"].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    completed = len(timings["cycle"])
+    return {
+        "completed": completed,
+        "seconds": round(elapsed, 3),
+        "tickets_per_second": round(completed / elapsed, 2) if elapsed else None,
+        "latency": {step: percentiles(samples) for step, samples in timings.items()},
+        "errors": errors,
+    }
+
+
+async def wait_for_drain(base_url: str, timeout: float) -> dict:
+    """Poll the queue counters until nothing is pending or failed (dead rows count as done)."""
+    started = time.perf_counter()
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while True:
+            counts = (await client.get("/api/sync/stats")).json()["counts"]
+            waiting = counts["pending"] + counts["failed"]
+            elapsed = time.perf_counter() - started
+            if waiting == 0 or elapsed >= timeout:
+                return {
+                    "drain_seconds": round(elapsed, 3),
+                    "drained": waiting == 0,
+                    "queue": counts,
+                }
+            await asyncio.sleep(0.05)
+
+
+def main() -> None:
+    parser = argument_parser(__doc__)
+    parser.add_argument("--tickets", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8, help="tickets in flight at once")
+    parser.add_argument("--lanes", type=int, default=2, help="simulated indicators, tickets spread round-robin")
+    parser.add_argument("--odoo-latency", type=float, default=0.02, help="fake Odoo seconds per request")
+    parser.add_argument("--odoo-error-rate", type=float, default=0.0, help="share of tickets Odoo rejects")
+    parser.add_argument("--no-bulk", action="store_true", help="fake Odoo without the bulk endpoint")
+    parser.add_argument("--sync-batch-size", type=int, default=25)
+    parser.add_argument("--retry-base", type=float, default=0.1, help="SYNC_RETRY_BASE_SECONDS for the run")
+    parser.add_argument("--drain-timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the result JSON to this file")
+    args = parser.parse_args()
+
+    odoo_app, odoo_stats = create_fake_odoo(args.odoo_latency, args.odoo_error_rate, not args.no_bulk, args.seed)
+    odoo = BackgroundServer(odoo_app, "fake-odoo").start()
+
+    scratch_data_dir(
+        "wb-e2e-",
+        ODOO_BASE_URL=odoo.url,
+        ODOO_API_KEY="bench",
+        SYNC_BATCH_SIZE=str(args.sync_batch_size),
+        SYNC_RETRY_BASE_SECONDS=str(args.retry_base),
+        SYNC_RETRY_MAX_SECONDS=str(max(args.retry_base, 1.0)),
+        SYNC_MAX_ATTEMPTS="50",
+        ALLOW_WEIGHT_SIMULATION="true",
+        MAX_LANES=str(max(8, args.lanes)),
+    )
+    from app.main import app
+
+    logging.getLogger().setLevel(logging.WARNING)
+    server = BackgroundServer(app, "weighbridge-app").start()
+    try:
+        with httpx.Client(base_url=server.url) as client:
+            for lane in range(1, args.lanes + 1):
+                client.post("/api/serial/connect", params={"lane": lane}, json={"simulate": True}).raise_for_status()
+            # Wait for every simulated indicator to publish a first reading.
+            while any(lane["last_weight_kg"] is None for lane in client.get("/api/serial/lanes").json()):
+                time.sleep(0.05)
+
+        load = asyncio.run(drive(server.url, args.tickets, args.concurrency, args.lanes))
+        drain = asyncio.run(wait_for_drain(server.url, args.drain_timeout))
+    finally:
+        server.stop()
+        odoo.stop()
+
+    result = {
+        "commit": git_commit(),
+        "config": {
+            "tickets": args.tickets,
+            "concurrency": args.concurrency,
+            "lanes": args.lanes,
+            "odoo_latency": args.odoo_latency,
+            "odoo_error_rate": args.odoo_error_rate,
+            "odoo_bulk": not args.no_bulk,
+            "sync_batch_size": args.sync_batch_size,
+        },
+        **load,
+        **drain,
+        "odoo": odoo_stats.as_dict(),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    text = json.dumps(result)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(text + "\n")
@@ -0,0 +1,73 @@
+import importlib
+import os
+import tempfile
+
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, create_engine
+
+# Settings and the engine are read once at import, so point them at a scratch data
+# directory before any test module imports the app.
+_DATA_DIR = tempfile.mkdtemp(prefix="wb-tests-")
+os.environ.update(
+    DATA_DIR=_DATA_DIR,
+    DB_PATH=os.path.join(_DATA_DIR, "weighbridge.db"),
+    ATTACHMENTS_DIR=os.path.join(_DATA_DIR, "attachments"),
+    ODOO_BASE_URL="",
+)
+
+# Modules that bind the process-wide engine at import time.
+ENGINE_MODULES = (
+    "app.database",
+    "app.services.archive_service",
+    "app.services.export_service",
+    "app.services.sync_service",
+)
+
+
+def memory_engine():
+    """A private in-memory database; StaticPool keeps every session on its one connection."""
+    return create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    """A fresh, fully migrated in-memory database standing in for the app's engine."""
+    from app.database import install_sync_counters, migrate_schema, upgrade_data
+    from app.services.plate_index import plate_index
+
+    engine = memory_engine()
+    migrate_schema(engine)
+    upgrade_data(engine)
+    install_sync_counters(engine)
+    for name in ENGINE_MODULES:
+        monkeypatch.setattr(importlib.import_module(name), "engine", engine)
+    with Session(engine) as session:
+        plate_index.rebuild(session)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session(engine):
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture
+def client(engine):
+    """The API without its lifespan (no serial restore, sync loop or scheduler)."""
+    from fastapi.testclient import TestClient
+
+    from app.database import get_session
+    from app.main import app
+
+    def override_session():
+        with Session(engine) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override_session
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.pop(get_session, None)
@@ -0,0 +1,148 @@
+import pytest
+
+from app.services.indicator_protocols import (
+    ContinuousParser,
+    FixedWidthParser,
+    PolledParser,
+    StxEtxParser,
+    ToledoParser,
+    WeightFrame,
+    create_parser,
+)
+from app.services.weight_history import STATUS_MOTION, STATUS_OK, STATUS_OVERLOAD
+
+
+def feed_split(parser, stream: bytes, size: int) -> list[WeightFrame]:
+    """Feed `stream` in `size`-byte chunks, as a port returning partial reads would."""
+    frames = []
+    for offset in range(0, len(stream), size):
+        frames.extend(parser.feed(stream[offset:offset + size]))
+    return frames
+
+
+def toledo_frame(weight: int, swa: int = 0x22, swb: int = 0x30) -> bytes:
+    return b"\x02" + bytes((swa, swb, 0x20)) + f"{weight:6d}".encode() + b"000000\r"
+
+
+CONTINUOUS = b"ST,GS,+001234.5kg\r\nUS,GS,+001240.0kg\r\nOL,GS,+099999kg\r\nST,GS,-000012.0kg\r\n"
+CONTINUOUS_FRAMES = [
+    WeightFrame(1234.5, STATUS_OK),
+    WeightFrame(1240.0, STATUS_MOTION),
+    WeightFrame(99999.0, STATUS_OVERLOAD),
+    WeightFrame(-12.0, STATUS_OK),
+]
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, len(CONTINUOUS)])
+def test_continuous_frames_survive_any_chunking(size):
+    parser = ContinuousParser()
+
+    assert feed_split(parser, CONTINUOUS, size) == CONTINUOUS_FRAMES
+    assert parser.errors == 0
+
+
+def test_continuous_keeps_a_partial_line_for_the_next_read():
+    parser = ContinuousParser()
+
+    assert parser.feed(b"ST,GS,+0012") == []
+    assert parser.feed(b"34.5kg\r") == [WeightFrame(1234.5, STATUS_OK)]
+    # The LF of a CRLF pair is only a blank line, not a malformed frame.
+    assert parser.feed(b"\n") == []
+    assert parser.errors == 0
+
+
+def test_continuous_units_and_leading_id_digits():
+    parser = ContinuousParser()
+
+    frames = parser.feed(b"01 ST 12.5 t\r\nID7 2000 lb\r\n")
+
+    assert frames[0] == WeightFrame(12500.0, STATUS_OK)
+    assert frames[1].weight_kg == pytest.approx(907.18474)
+
+
+def test_continuous_counts_garbage_lines_as_errors():
+    parser = ContinuousParser()
+
+    assert parser.feed(b"NO WEIGHT HERE\r\nST,GS,+000500kg\r\n") == [WeightFrame(500.0, STATUS_OK)]
+    assert parser.errors == 1
+
+
+def test_overflowing_buffer_is_dropped_and_counted():
+    parser = ContinuousParser()
+
+    assert parser.feed(b"9" * (parser.max_buffer + 1)) == []
+    assert parser.errors == 1
+    assert parser.feed(b"ST,GS,+000100kg\r\n") == [WeightFrame(100.0, STATUS_OK)]
+
+
+@pytest.mark.parametrize("size", [1, 4, 64])
+def test_stx_etx_skips_noise_between_frames(size):
+    stream = b"\xff\x02ST +01500kg\x03noise\x02US +01510kg\r\x02+015"
+    parser = StxEtxParser()
+
+    assert feed_split(parser, stream, size) == [WeightFrame(1500.0, STATUS_OK), WeightFrame(1510.0, STATUS_MOTION)]
+    assert parser.feed(b"20kg\x03") == [WeightFrame(1520.0, STATUS_OK)]
+
+
+@pytest.mark.parametrize("size", [1, 5, 24])
+def test_fixed_width_reverses_digits(size):
+    parser = FixedWidthParser()
+
+    frames = feed_split(parser, b"=5.43210=0.00510=5.43210", size)
+
+    assert frames == [WeightFrame(1234.5, STATUS_OK), WeightFrame(1500.0, STATUS_OK), WeightFrame(1234.5, STATUS_OK)]
+
+
+def test_fixed_width_resyncs_after_a_bad_frame():
+    parser = FixedWidthParser()
+
+    assert parser.feed(b"=ABCDEFG=5.43210") == [WeightFrame(1234.5, STATUS_OK)]
+    assert parser.errors == 1
+
+
+@pytest.mark.parametrize("size", [1, 6, 17, 100])
+def test_toledo_status_bytes(size):
+    stream = (
+        toledo_frame(12340)
+        + toledo_frame(12360, swb=0x38)  # motion
+        + toledo_frame(500, swb=0x32)  # negative
+        + toledo_frame(999999, swb=0x34)  # overload
+        + toledo_frame(12345, swa=0x23)  # one decimal
+    )
+    parser = ToledoParser()
+
+    assert feed_split(parser, stream, size) == [
+        WeightFrame(12340.0, STATUS_OK),
+        WeightFrame(12360.0, STATUS_MOTION),
+        WeightFrame(-500.0, STATUS_OK),
+        WeightFrame(999999.0, STATUS_OVERLOAD),
+        WeightFrame(1234.5, STATUS_OK),
+    ]
+    assert parser.errors == 0
+
+
+def test_toledo_pounds_are_converted():
+    parser = ToledoParser()
+
+    (frame,) = parser.feed(toledo_frame(1000, swb=0x20))
+
+    assert frame.weight_kg == pytest.approx(453.59237)
+
+
+def test_toledo_rejects_a_frame_without_cr():
+    parser = ToledoParser()
+    broken = toledo_frame(100)[:-1] + b"X"
+
+    assert parser.feed(broken + toledo_frame(200)) == [WeightFrame(200.0, STATUS_OK)]
+    assert parser.errors == 1
+
+
+def test_create_parser():
+    assert isinstance(create_parser("continuous"), ContinuousParser)
+    assert create_parser("fixed", frame_length=10).frame_length == 10
+    polled = create_parser("polled", poll_command="\\x05")
+    assert isinstance(polled, PolledParser)
+    assert polled.poll_command == b"\x05"
+    assert create_parser("polled").poll_command == b"W\r\n"
+    with pytest.raises(ValueError):
+        create_parser("bogus")
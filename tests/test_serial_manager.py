@@ -0,0 +1,131 @@
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from app.services.serial_manager import LaneNotConnected, LaneReader
+from app.services.stability import StabilityDetector
+from app.services.weight_history import STATUS_MOTION, STATUS_OK
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_700_000_000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def reader():
+    reader = LaneReader(lane_id=1)
+    reader._stability = StabilityDetector(window_seconds=1.0, tolerance_kg=5.0, filter="none", min_samples=3)
+    # Frames are pushed straight into the reader as if a port were open.
+    reader._source = "serial"
+    reader._connected = True
+    return reader
+
+
+def push(reader, clock, weights, step=0.1, status=STATUS_OK):
+    for weight in weights:
+        reader._store_weight(weight, status, reader._generation)
+        clock.now += step
+
+
+def test_idle_lane_raises_instead_of_waiting():
+    reader = LaneReader(lane_id=2)
+
+    with pytest.raises(LaneNotConnected):
+        reader.wait_for_stable(timeout=5)
+
+
+def test_times_out_when_no_frames_arrive(reader):
+    started = time.monotonic()
+
+    assert reader.wait_for_stable(timeout=0.05) is None
+    assert time.monotonic() - started < 1
+
+
+def test_times_out_while_the_load_is_moving(reader, clock):
+    push(reader, clock, [1000.0, 1050.0, 1100.0, 1150.0, 1200.0] * 3)
+
+    assert reader.wait_for_stable(timeout=0.05) is None
+    assert reader.get_reading().stable is False
+
+
+def test_returns_a_settled_load_with_its_sample_time(reader, clock):
+    push(reader, clock, [1500.0] * 12)
+    sampled = clock.now - 0.1
+    clock.now += 0.5  # the wait starts a little after the last frame
+
+    stats = reader.wait_for_stable(timeout=5)
+
+    assert stats is not None
+    assert stats.weight_kg == 1500.0
+    assert stats.window_seconds >= 1.0
+    assert stats.captured_at == datetime.utcfromtimestamp(sampled)
+    assert stats.captured_at == reader.get_reading().captured_at
+    assert reader.get_reading().stable is True
+
+
+def test_motion_frames_are_not_stable(reader, clock):
+    push(reader, clock, [1500.0] * 12, status=STATUS_MOTION)
+
+    assert reader.wait_for_stable(timeout=0.05) is None
+
+
+def test_below_minimum_weight_is_not_captured(reader, clock, monkeypatch):
+    monkeypatch.setattr(reader.settings, "stable_min_weight_kg", 100.0)
+    push(reader, clock, [20.0] * 12)
+
+    assert reader.get_reading().stable is True
+    assert reader.wait_for_stable(timeout=0.05) is None
+
+
+def test_a_silent_indicator_does_not_stay_stable(reader, clock):
+    push(reader, clock, [1500.0] * 12)
+    assert reader.get_reading().stable is True
+
+    # The port stays open but no frame arrives for longer than the window.
+    clock.now += 2.0
+
+    assert reader.get_reading().stable is False
+    assert reader.wait_for_stable(timeout=0.05) is None
+
+
+def test_wakes_up_when_the_load_settles(reader):
+    reader._stability = StabilityDetector(window_seconds=0.2, tolerance_kg=5.0, filter="none", min_samples=3)
+
+    def indicator():
+        for _ in range(10):
+            reader._store_weight(2500.0, STATUS_OK, reader._generation)
+            time.sleep(0.05)
+
+    thread = threading.Thread(target=indicator)
+    thread.start()
+    try:
+        stats = reader.wait_for_stable(timeout=5)
+    finally:
+        thread.join()
+
+    assert stats is not None
+    assert stats.weight_kg == 2500.0
+    assert 0.1 < stats.waited_seconds < 5
+
+
+def test_disconnect_while_waiting_raises(reader):
+    timer = threading.Timer(0.05, reader.disconnect)
+    timer.start()
+    try:
+        with pytest.raises(LaneNotConnected):
+            reader.wait_for_stable(timeout=5)
+    finally:
+        timer.join()
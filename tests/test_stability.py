@@ -0,0 +1,128 @@
+import pytest
+
+from app.services.stability import StabilityDetector
+from app.services.weight_history import STATUS_MOTION, STATUS_OK
+
+
+def feed(detector, samples, start=0.0, step=0.1, status=STATUS_OK):
+    """Feed weights `step` seconds apart from `start`; returns the last result and next timestamp."""
+    state = None
+    timestamp = start
+    for weight in samples:
+        state = detector.update(timestamp, weight, status)
+        timestamp = round(timestamp + step, 6)
+    return state, timestamp
+
+
+def test_becomes_stable_after_a_full_window_within_tolerance():
+    detector = StabilityDetector(window_seconds=1.0, tolerance_kg=5.0, filter="none", min_samples=3)
+
+    state, _ = feed(detector, [1000.0, 1002.0, 998.0, 1001.0, 999.0, 1000.0, 1003.0, 1000.0, 1001.0, 1000.0])
+    assert state is None  # 0.9 s of samples: not a full window yet
+
+    state = detector.update(1.0, 1001.0)
+    assert state is not None
+    assert state.weight_kg == 1001.0
+    assert state.spread_kg == 5.0
+    assert state.samples == 11
+    assert state.window_seconds == pytest.approx(1.0)
+    assert state.mean_kg == pytest.approx(11005.0 / 11)
+    assert state.stable_since == 1.0
+    assert state.sampled_at == 1.0
+
+
+def test_leaving_the_band_restarts_the_window():
+    detector = StabilityDetector(window_seconds=1.0, tolerance_kg=5.0, filter="none", min_samples=3)
+    state, now = feed(detector, [1000.0] * 12)
+    assert state is not None
+
+    assert detector.update(now, 1020.0) is None
+    assert detector.state is None
+    restarted = now
+    state, now = feed(detector, [1020.0] * 9, start=round(now + 0.1, 6))
+    assert state is None
+    state = detector.update(now, 1020.0)
+    assert state is not None
+    assert state.weight_kg == 1020.0
+    assert state.stable_since == now == pytest.approx(restarted + 1.0)
+
+
+def test_stable_since_holds_while_the_load_stays_put():
+    detector = StabilityDetector(window_seconds=0.5, tolerance_kg=5.0, filter="none", min_samples=3)
+
+    feed(detector, [500.0] * 6)
+    state, _ = feed(detector, [500.0] * 20, start=0.6)
+
+    assert state.stable_since == 0.5
+    # Old samples slide out of the window, so the span stays near the window length.
+    assert state.window_seconds == pytest.approx(0.5)
+    assert state.samples == 6
+
+
+def test_median_filter_ignores_single_spikes():
+    detector = StabilityDetector(window_seconds=1.0, tolerance_kg=2.0, filter="median", filter_size=5, min_samples=3)
+
+    state, now = feed(detector, [1000.0] * 5 + [1400.0] + [1000.0] * 5)
+
+    assert state is not None
+    assert state.weight_kg == 1000.0
+    assert state.spread_kg == 0.0
+
+    unfiltered = StabilityDetector(window_seconds=1.0, tolerance_kg=2.0, filter="none", min_samples=3)
+    assert feed(unfiltered, [1000.0] * 5 + [1400.0] + [1000.0] * 5)[0] is None
+
+
+def test_indicator_motion_status_is_never_stable():
+    detector = StabilityDetector(window_seconds=1.0, tolerance_kg=5.0, filter="none", min_samples=3)
+    state, now = feed(detector, [1000.0] * 12)
+    assert state is not None
+
+    assert detector.update(now, 1000.0, STATUS_MOTION) is None
+    assert detector.state is None
+    state, _ = feed(detector, [1000.0] * 10, start=round(now + 0.1, 6), status=STATUS_MOTION)
+    assert state is None
+
+
+def test_min_samples_applies_even_over_a_long_span():
+    detector = StabilityDetector(window_seconds=0.5, tolerance_kg=5.0, filter="none", min_samples=4)
+
+    state, _ = feed(detector, [700.0] * 3, step=0.4)
+
+    assert state is None
+
+
+def test_current_drops_a_state_with_no_recent_sample():
+    detector = StabilityDetector(window_seconds=1.0, tolerance_kg=5.0, filter="none", min_samples=3)
+    state, _ = feed(detector, [1000.0] * 12)
+    assert state.sampled_at == 1.1
+
+    assert detector.current(1.5) is state
+    assert detector.current(2.1) is state
+    assert detector.current(2.2) is None
+    assert detector.state is state
+
+
+def test_a_gap_in_the_stream_starts_over():
+    detector = StabilityDetector(window_seconds=1.0, tolerance_kg=5.0, filter="median", min_samples=2)
+    feed(detector, [1000.0] * 12)
+
+    # With min_samples=2, one fresh sample plus a pre-gap one would otherwise look stable.
+    assert detector.update(5.0, 1000.0) is None
+    state, _ = feed(detector, [1000.0] * 11, start=5.1)
+    assert state is not None
+    assert state.stable_since == 6.0
+
+
+def test_reset_clears_everything():
+    detector = StabilityDetector(window_seconds=1.0, tolerance_kg=5.0, filter="none", min_samples=3)
+    feed(detector, [1000.0] * 12)
+
+    detector.reset()
+
+    assert detector.state is None
+    assert detector.update(1.2, 1000.0) is None
+
+
+def test_unknown_filter_is_rejected():
+    with pytest.raises(ValueError):
+        StabilityDetector(window_seconds=1.0, tolerance_kg=5.0, filter="kalman")
@@ -0,0 +1,258 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import Session, select
+
+from app.models import SyncQueue, SyncQueueCount, Ticket
+from app.services.odoo_client import BulkNotSupported
+from app.services.sync_service import SyncService
+
+
+class StubOdoo:
+    """Stands in for OdooClient: records what was sent and fails the first `failures` sends."""
+
+    configured = True
+
+    def __init__(self, failures: int = 0, bulk: bool = False) -> None:
+        self.failures = failures
+        self.bulk = bulk
+        self.sent: list[tuple[dict, str]] = []
+
+    def bulk_available(self) -> bool:
+        return self.bulk
+
+    async def send_ticket(self, payload: dict, idempotency_key=None) -> dict:
+        self.sent.append((payload, idempotency_key))
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("Odoo unreachable")
+        return {"external_id": f"odoo-{payload['ticket_no']}"}
+
+    async def send_tickets(self, payloads: list[dict]) -> list[dict]:
+        if not self.bulk:
+            raise BulkNotSupported("Bulk endpoint returned HTTP 404")
+        results = []
+        for payload in payloads:
+            self.sent.append((payload, payload["idempotency_key"]))
+            results.append({"external_id": f"odoo-{payload['ticket_no']}"})
+        return results
+
+    async def aclose(self) -> None:
+        pass
+
+
+@pytest.fixture
+def service(engine, monkeypatch):
+    service = SyncService()
+    service.client = StubOdoo()
+    monkeypatch.setattr(service.settings, "sync_batch_size", 1)
+    monkeypatch.setattr(service.settings, "sync_max_attempts", 3)
+    yield service
+    asyncio.run(service.shutdown())
+
+
+def make_ticket(session, ticket_no="WB20240105-0001", **changes):
+    ticket = Ticket(
+        ticket_no=ticket_no,
+        status="finalized",
+        direction="inbound",
+        vehicle_plate="KA01AB1234",
+        partner_name="Quarry Ltd",
+        product_name="Gravel",
+        operator_name="Sam",
+        gross_kg=30000.0,
+        tare_kg=12000.0,
+        net_kg=18000.0,
+        **changes,
+    )
+    session.add(ticket)
+    session.commit()
+    session.refresh(ticket)
+    return ticket
+
+
+def queue_rows(engine) -> list[SyncQueue]:
+    with Session(engine) as session:
+        return list(session.exec(select(SyncQueue).order_by(SyncQueue.id)).all())
+
+
+def edit(session, ticket, **changes):
+    for name, value in changes.items():
+        setattr(ticket, name, value)
+    session.add(ticket)
+    session.commit()
+    session.refresh(ticket)
+
+
+def run_pass(service, force=True):
+    return asyncio.run(service.sync_pending(force=force))
+
+
+def test_repeated_enqueues_coalesce_into_one_pending_row(service, session, engine):
+    ticket = make_ticket(session)
+
+    first = service.enqueue_ticket(session, ticket)
+    edit(session, ticket, remarks="Tarpaulin torn")
+    second = service.enqueue_ticket(session, ticket)
+    edit(session, ticket, remarks="Tarpaulin replaced")
+    third = service.enqueue_ticket(session, ticket)
+
+    assert first.id == second.id == third.id
+    (row,) = queue_rows(engine)
+    assert row.status == "pending"
+    assert '"remarks":"Tarpaulin replaced"' in row.payload
+    assert row.idempotency_key.startswith(f"WB20240105-0001:{row.payload_hash}")
+
+    # The same content again is not a change at all.
+    assert service.enqueue_ticket(session, ticket).id == row.id
+    assert len(queue_rows(engine)) == 1
+    counts = dict(session.exec(select(SyncQueueCount.status, SyncQueueCount.row_count)).all())
+    assert counts["pending"] == 1
+
+
+def test_idempotency_key_is_stable_across_retries(service, session, engine):
+    service.client = StubOdoo(failures=2)
+    ticket = make_ticket(session)
+    queued = service.enqueue_ticket(session, ticket)
+
+    for _ in range(3):
+        run_pass(service)
+
+    keys = [key for _, key in service.client.sent]
+    assert keys == [queued.idempotency_key] * 3
+    (row,) = queue_rows(engine)
+    assert row.status == "sent"
+    assert row.attempts == 3
+    session.refresh(ticket)
+    assert ticket.synced_payload_hash == row.payload_hash
+    assert ticket.odoo_external_id == "odoo-WB20240105-0001"
+
+    # Odoo already holds this content: nothing is queued again.
+    assert service.enqueue_ticket(session, ticket) is None
+    assert [row.status for row in queue_rows(engine)] == ["sent"]
+
+
+def test_an_edit_after_sending_gets_a_new_key(service, session, engine):
+    ticket = make_ticket(session)
+    sent_key = service.enqueue_ticket(session, ticket).idempotency_key
+    run_pass(service)
+    session.refresh(ticket)
+
+    edit(session, ticket, remarks="Re-weighed")
+    update = service.enqueue_ticket(session, ticket)
+
+    assert update.status == "pending"
+    assert update.idempotency_key != sent_key
+    assert update.idempotency_key.endswith(ticket.synced_payload_hash[:16])
+
+
+def test_failures_back_off_then_dead_letter(service, session, engine):
+    service.client = StubOdoo(failures=10)
+    ticket = make_ticket(session)
+    service.enqueue_ticket(session, ticket)
+
+    before = datetime.utcnow()
+    run_pass(service)
+    (row,) = queue_rows(engine)
+    assert row.status == "failed"
+    assert row.attempts == 1
+    assert row.last_error == "Odoo unreachable"
+    # First retry after base/2 .. base seconds (equal jitter).
+    base = service.settings.sync_retry_base_seconds
+    assert before + timedelta(seconds=base / 2) <= row.next_attempt_at <= datetime.utcnow() + timedelta(seconds=base)
+
+    # Not due yet, so an ordinary pass leaves it alone.
+    assert run_pass(service, force=False) == row.next_attempt_at
+    assert len(service.client.sent) == 1
+
+    run_pass(service)
+    run_pass(service)
+    (row,) = queue_rows(engine)
+    assert row.status == "dead"
+    assert row.attempts == 3
+    assert row.next_attempt_at is None
+
+    # Dead rows are never picked up again on their own.
+    assert run_pass(service) is None
+    assert len(service.client.sent) == 3
+
+    # A manual retry gives it a fresh budget; a later enqueue reuses the same row.
+    service.client.failures = 0
+    with Session(engine) as other:
+        service.retry(other, other.get(SyncQueue, row.id))
+    run_pass(service)
+    (row,) = queue_rows(engine)
+    assert row.status == "sent"
+    assert row.attempts == 1
+
+
+def test_enqueue_revives_a_dead_row_in_place(service, session, engine):
+    service.client = StubOdoo(failures=10)
+    ticket = make_ticket(session)
+    service.enqueue_ticket(session, ticket)
+    for _ in range(3):
+        run_pass(service)
+    assert [row.status for row in queue_rows(engine)] == ["dead"]
+
+    edit(session, ticket, remarks="Fixed partner")
+    service.enqueue_ticket(session, ticket)
+
+    (row,) = queue_rows(engine)
+    assert row.status == "pending"
+    assert row.attempts == 0
+
+
+def test_retry_delay_grows_and_is_capped(service, monkeypatch):
+    monkeypatch.setattr(service.settings, "sync_retry_base_seconds", 10.0)
+    monkeypatch.setattr(service.settings, "sync_retry_max_seconds", 60.0)
+
+    for attempts, full in ((1, 10.0), (2, 20.0), (3, 40.0), (4, 60.0), (12, 60.0)):
+        delays = [service._retry_delay(attempts) for _ in range(50)]
+        assert all(full / 2 <= delay <= full for delay in delays)
+
+
+def test_bulk_send_carries_each_idempotency_key(service, session, engine, monkeypatch):
+    monkeypatch.setattr(service.settings, "sync_batch_size", 10)
+    service.client = StubOdoo(bulk=True)
+    keys = [
+        service.enqueue_ticket(session, make_ticket(session, ticket_no=f"WB20240105-000{n}")).idempotency_key
+        for n in range(1, 4)
+    ]
+
+    run_pass(service)
+
+    assert sorted(key for _, key in service.client.sent) == sorted(keys)
+    assert [row.status for row in queue_rows(engine)] == ["sent"] * 3
+
+
+def test_rows_from_older_releases_are_coalesced_when_loaded(service, session, engine):
+    ticket = make_ticket(session)
+    # Older releases queued every change as a new row, without hashes or keys.
+    for remarks in ("first", "second"):
+        payload = f'{{"ticket_no": "{ticket.ticket_no}", "remarks": "{remarks}"}}'
+        session.add(SyncQueue(ticket_id=ticket.id, payload=payload))
+    session.commit()
+
+    run_pass(service)
+
+    (row,) = queue_rows(engine)
+    assert row.status == "sent"
+    assert service.client.sent == [({"remarks": "second", "ticket_no": ticket.ticket_no}, row.idempotency_key)]
+    assert row.idempotency_key == f"{ticket.ticket_no}:{row.payload_hash}"
+
+
+def test_queue_pages_stop_at_the_last_row(client, session):
+    for n in range(1, 5):
+        session.add(SyncQueue(ticket_id=make_ticket(session, ticket_no=f"WB-{n}").id, payload="{}"))
+    session.commit()
+
+    pages, cursor = [], None
+    while True:
+        response = client.get("/api/sync/queue", params={"limit": 2, **({"cursor": cursor} if cursor else {})})
+        pages.append([item["id"] for item in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert pages == [[4, 3], [2, 1]]
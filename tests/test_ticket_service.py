@@ -0,0 +1,233 @@
+import logging
+from datetime import datetime
+
+import pytest
+from sqlalchemy import inspect
+from sqlmodel import Session, SQLModel, select
+
+from app import database
+from app.config import get_settings
+from app.models import Ticket, TicketSequence
+from app.services import archive_service, ticket_service
+from app.services.plate_index import plate_index
+from tests.conftest import memory_engine
+
+WEIGH_IN = {
+    "lane_id": 1,
+    "direction": "inbound",
+    "partner_name": "Quarry Ltd",
+    "product_name": "Gravel",
+    "operator_name": "Sam",
+}
+
+
+def weigh_in(session, plate, gross_kg=30000.0):
+    return ticket_service.create_weigh_in(session, {**WEIGH_IN, "vehicle_plate": plate}, gross_kg, None)
+
+
+def finalize(session, ticket, tare_kg=12000.0):
+    ticket_service.record_weigh_out(session, ticket, tare_kg, None)
+    return ticket_service.finalize_ticket(session, ticket, None, None, None)
+
+
+# --- one open weigh-in per vehicle ----------------------------------------------------
+
+
+def test_second_open_weigh_in_is_rejected_with_409(client):
+    body = {**WEIGH_IN, "vehicle_plate": "KA 01 AB 1234", "gross_kg": 30000.0}
+
+    first = client.post("/api/tickets/weigh-in", json=body)
+    second = client.post("/api/tickets/weigh-in", json={**body, "vehicle_plate": "ka-01-ab-1234"})
+
+    assert first.status_code == 200
+    assert second.status_code == 409
+    assert "already has an open weigh-in" in second.json()["detail"]
+
+
+def test_database_rejects_a_weigh_in_that_slips_past_the_plate_index(client, monkeypatch):
+    body = {**WEIGH_IN, "vehicle_plate": "KA01AB1234", "gross_kg": 30000.0}
+    assert client.post("/api/tickets/weigh-in", json=body).status_code == 200
+    # As if a concurrent request checked the index before the first one committed.
+    monkeypatch.setattr(plate_index, "lookup", lambda plate, status=None: [])
+
+    response = client.post("/api/tickets/weigh-in", json=body)
+
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Vehicle KA01AB1234 already has an open weigh-in"
+
+
+def test_create_weigh_in_raises_open_weigh_in_exists(session):
+    weigh_in(session, "MH 12 XY 9876")
+
+    with pytest.raises(ticket_service.OpenWeighInExists):
+        weigh_in(session, "mh12xy9876")
+
+    # The failed insert is rolled back and the session stays usable.
+    assert session.exec(select(Ticket.vehicle_plate)).all() == ["MH 12 XY 9876"]
+    assert weigh_in(session, "MH 12 XY 0001").id is not None
+
+
+def test_a_finalized_ticket_frees_the_plate(session):
+    first = finalize(session, weigh_in(session, "DL 3C 4455"))
+    assert first.status == "finalized"
+
+    second = weigh_in(session, "DL 3C 4455")
+
+    assert second.id != first.id
+    assert second.status == "weigh_in"
+
+
+def test_init_db_leaves_the_version_unset_while_duplicates_remain(monkeypatch, caplog):
+    engine = memory_engine()
+    # An older database: the tables exist, but neither plate keys nor the unique index.
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        for _ in range(2):
+            session.add(Ticket(status="weigh_in", vehicle_plate="TN 22 Q 7", gross_kg=25000.0, **WEIGH_IN))
+        session.commit()
+    monkeypatch.setattr(database, "engine", engine)
+
+    with caplog.at_level(logging.WARNING, logger="database"):
+        database.init_db()
+
+    assert "several open weigh-ins" in caplog.text
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA user_version").scalar() == 0
+        assert conn.exec_driver_sql("SELECT DISTINCT plate_key FROM ticket").scalars().all() == ["TN22Q7"]
+    assert "ux_ticket_open_plate_key" not in {index["name"] for index in inspect(engine).get_indexes("ticket")}
+
+    # Once the extra weigh-in is dealt with, the next start completes the upgrade.
+    with Session(engine) as session:
+        extra = session.get(Ticket, 2)
+        extra.status = "cancelled"
+        session.add(extra)
+        session.commit()
+    database.init_db()
+
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA user_version").scalar() == database.schema_fingerprint()
+    assert "ux_ticket_open_plate_key" in {index["name"] for index in inspect(engine).get_indexes("ticket")}
+
+
+# --- ticket numbers ---------------------------------------------------------------------
+
+
+class FrozenDatetime(datetime):
+    now_value = datetime(2024, 1, 5, 9, 30)
+
+    @classmethod
+    def utcnow(cls):
+        return cls.now_value
+
+
+@pytest.fixture
+def frozen_now(monkeypatch):
+    monkeypatch.setattr(ticket_service, "datetime", FrozenDatetime)
+    monkeypatch.setattr(FrozenDatetime, "now_value", datetime(2024, 1, 5, 9, 30))
+    return FrozenDatetime
+
+
+@pytest.fixture
+def number_format(monkeypatch):
+    settings = get_settings()
+
+    def use(number_format):
+        monkeypatch.setattr(settings, "ticket_number_format", number_format)
+
+    use("WB{date:%Y%m%d}-{seq:04d}")
+    return use
+
+
+def allocate(session, lane_id=1):
+    number = ticket_service.generate_ticket_number(session, lane_id)
+    session.commit()
+    return number
+
+
+def test_default_format_counts_per_day(session, frozen_now, number_format):
+    assert [allocate(session) for _ in range(3)] == ["WB20240105-0001", "WB20240105-0002", "WB20240105-0003"]
+
+    frozen_now.now_value = datetime(2024, 1, 6, 0, 0, 1)
+    assert allocate(session) == "WB20240106-0001"
+    assert allocate(session, lane_id=2) == "WB20240106-0002"
+
+    scopes = dict(session.exec(select(TicketSequence.scope, TicketSequence.last_value)).all())
+    assert scopes == {"WB20240105-{seq}": 3, "WB20240106-{seq}": 2}
+
+
+def test_per_lane_monthly_format(session, frozen_now, number_format):
+    number_format("L{lane}/{date:%Y-%m}/{seq:05d}")
+
+    assert allocate(session, lane_id=1) == "L1/2024-01/00001"
+    assert allocate(session, lane_id=2) == "L2/2024-01/00001"
+    assert allocate(session, lane_id=1) == "L1/2024-01/00002"
+
+    # Same month, so the lane counters carry on; a new month restarts them.
+    frozen_now.now_value = datetime(2024, 1, 31, 23, 59)
+    assert allocate(session, lane_id=2) == "L2/2024-01/00002"
+    frozen_now.now_value = datetime(2024, 2, 1)
+    assert allocate(session, lane_id=1) == "L1/2024-02/00001"
+    assert allocate(session, lane_id=2) == "L2/2024-02/00001"
+
+
+def test_counter_seeds_from_existing_tickets(session, frozen_now, number_format):
+    # Numbered before the sequence table existed; only same-scope, all-digit ones count.
+    for ticket_no in ("WB20240105-0007", "WB20240105-0012", "WB20240105-00X9", "WB20240104-0099", "WB20240105-0003"):
+        session.add(Ticket(ticket_no=ticket_no, status="finalized", vehicle_plate="X", **WEIGH_IN))
+    session.commit()
+
+    assert allocate(session) == "WB20240105-0013"
+    assert allocate(session) == "WB20240105-0014"
+
+
+def test_seeding_treats_like_wildcards_literally(session, frozen_now, number_format):
+    number_format("T_{date:%Y}%{seq}")
+    session.add(Ticket(ticket_no="TX2024%50", status="finalized", vehicle_plate="X", **WEIGH_IN))
+    session.add(Ticket(ticket_no="T_2024%4", status="finalized", vehicle_plate="Y", **WEIGH_IN))
+    session.commit()
+
+    assert allocate(session) == "T_2024%5"
+
+
+def test_format_needs_exactly_one_seq_field(session, number_format):
+    number_format("WB{date:%Y%m%d}")
+    with pytest.raises(ValueError, match="exactly once"):
+        ticket_service.generate_ticket_number(session)
+
+    number_format("WB{day}-{seq}")
+    with pytest.raises(ValueError, match="Invalid ticket_number_format"):
+        ticket_service.generate_ticket_number(session)
+
+
+# --- listing ------------------------------------------------------------------------------
+
+
+def list_pages(client, limit, **params):
+    pages, cursor = [], None
+    while True:
+        page_params = {"limit": limit, **params, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/tickets", params=page_params)
+        assert response.status_code == 200
+        pages.append([ticket["vehicle_plate"] for ticket in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return pages
+
+
+def test_ticket_pages_span_live_and_archived_tickets(client, session, monkeypatch, tmp_path):
+    monkeypatch.setattr(get_settings(), "data_dir", str(tmp_path))
+    for n, created_at in enumerate(
+        [datetime(2023, 1, 10), datetime(2023, 1, 11), datetime(2023, 2, 3), datetime(2024, 5, 1), datetime(2024, 5, 2)]
+    ):
+        session.add(
+            Ticket(status="finalized", vehicle_plate=f"P{n}", plate_key=f"P{n}", created_at=created_at, **WEIGH_IN)
+        )
+    session.commit()
+    assert archive_service.archive_before(datetime(2024, 1, 1)) == 3
+    assert len(session.exec(select(Ticket)).all()) == 2
+
+    assert list_pages(client, 2) == [["P4", "P3"], ["P2", "P1"], ["P0"]]
+    # An exact multiple of the page size ends on a full page, not an empty one.
+    assert list_pages(client, 5) == [["P4", "P3", "P2", "P1", "P0"]]
+    assert list_pages(client, 1, plate="p") == [["P4"], ["P3"], ["P2"], ["P1"], ["P0"]]
+    assert list_pages(client, 3, created_to="2024-01-01T00:00:00") == [["P2", "P1", "P0"]]